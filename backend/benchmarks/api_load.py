@@ -0,0 +1,203 @@
+"""
+Load test of the API on the seeded benchmark dataset (see benchmarks/dataset.py).
+
+Each scenario runs a fixed number of operations with N concurrent virtual users and reports
+throughput and p50/p95/p99 latency:
+  catalog        anonymous product list pages and category list
+  product        anonymous product detail
+  search         product search by name as a customer
+  checkout       a customer fills the cart (POST /cart/bulk) and checks out
+  order_history  a customer reads their latest orders
+  workflows      a staff member opens their workflow dashboard
+
+By default the app runs in-process through httpx's ASGI transport (no network, measures
+the application and database); with --url the requests go over HTTP to a running server,
+which must share DATABASE_URL and SECRET_KEY with this process so the tokens are valid.
+
+Results are written as JSON to benchmarks/results/<commit>.json (or --output); pass an
+earlier file to --compare to print the change per scenario.
+
+Run from the backend directory, e.g.:
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.dataset --scale 0.1
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.api_load --requests 500 --concurrency 8
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.api_load --compare benchmarks/results/abc1234.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+import httpx
+from sqlalchemy import func, select
+from auth import create_access_token
+from database import engine
+from models.product import Product
+from models.category import Category
+from models.user import User, RoleEnum
+from benchmarks import dataset
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+SCENARIOS = ["catalog", "product", "search", "checkout", "order_history", "workflows"]
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def load_context() -> dict:
+    """Ids and tokens of the seeded users and catalog."""
+    with engine.connect() as connection:
+        def usernames(role):
+            return list(connection.execute(
+                select(User.username).where(User.role == role, User.username.like("bench_%")).order_by(User.id)
+            ).scalars())
+        expires = timedelta(hours=2)
+        return {
+            "products": connection.execute(select(func.count()).select_from(Product)).scalar(),
+            "categories": connection.execute(select(func.count()).select_from(Category)).scalar(),
+            "customers": [create_access_token({"sub": name}, expires) for name in usernames(RoleEnum.customer)],
+            "staff": [create_access_token({"sub": name}, expires) for name in usernames(RoleEnum.staff)],
+        }
+
+def auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+async def catalog(client, rng, context, worker):
+    if rng.random() < 0.1:
+        return [await client.get("/categories/")]
+    skip = rng.randint(0, max(context["products"] - 50, 0))
+    return [await client.get("/products/", params={"skip": skip, "limit": 50})]
+
+async def product(client, rng, context, worker):
+    return [await client.get(f"/products/{rng.randint(1, context['products'])}")]
+
+async def search(client, rng, context, worker):
+    query = rng.choice(dataset.ADJECTIVES + dataset.NOUNS)
+    return [await client.get("/products/search/", params={"query": query, "limit": 20}, headers=auth(rng.choice(context["customers"])))]
+
+async def checkout(client, rng, context, worker):
+    # One customer per virtual user, so concurrent checkouts never share a cart
+    customers = context["customers"]
+    headers = auth(customers[worker % len(customers)])
+    items = [{"product_id": product_id, "quantity": rng.randint(1, 3)} for product_id in rng.sample(range(1, context["products"] + 1), 3)]
+    filled = await client.post("/cart/bulk", json=items, headers=headers)
+    if filled.status_code >= 400:
+        return [filled]
+    return [filled, await client.post("/cart/checkout", headers=headers)]
+
+async def order_history(client, rng, context, worker):
+    return [await client.get("/orders/", params={"limit": 20}, headers=auth(rng.choice(context["customers"])))]
+
+async def workflows(client, rng, context, worker):
+    return [await client.get("/workflows/", params={"limit": 20}, headers=auth(rng.choice(context["staff"])))]
+
+async def run_scenario(client: httpx.AsyncClient, name: str, context: dict, requests: int, concurrency: int, seed: int) -> dict:
+    operation = globals()[name]
+    latencies, errors = [], {}
+    remaining = iter(range(requests))
+
+    async def virtual_user(worker: int):
+        rng = random.Random(seed * 1000 + worker)
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                responses = await operation(client, rng, context, worker)
+                failed = next((str(r.status_code) for r in responses if r.status_code >= 400), None)
+            except httpx.HTTPError as e:
+                failed = type(e).__name__
+            latencies.append((time.perf_counter() - start) * 1000)
+            if failed:
+                errors[failed] = errors.get(failed, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(virtual_user(worker) for worker in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "operations": requests,
+        "errors": errors,
+        "throughput_ops": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+async def run(args, context: dict) -> dict:
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60.0, limits=httpx.Limits(max_connections=args.concurrency))
+    else:
+        from main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60.0)
+    results = {}
+    async with client:
+        for name in args.scenarios:
+            # Warm-up: fills the pool, the statement caches and the price timeline reads
+            await run_scenario(client, name, context, min(args.warmup, args.requests), args.concurrency, args.seed + 1)
+            results[name] = await run_scenario(client, name, context, args.requests, args.concurrency, args.seed)
+            print(f"{name:<14} {results[name]['throughput_ops']:>9} ops/s  p50 {results[name]['p50_ms']:>8} ms  "
+                  f"p95 {results[name]['p95_ms']:>8} ms  p99 {results[name]['p99_ms']:>8} ms  errors {results[name]['errors']}")
+    return results
+
+def compare(results: dict, baseline: dict):
+    print(f"\nchange vs {baseline.get('commit', 'baseline')} (positive throughput / negative latency is better)")
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        def change(key):
+            return f"{(current[key] - previous[key]) / previous[key] * 100:+.1f}%" if previous[key] else "n/a"
+        print(f"{name:<14} throughput {change('throughput_ops'):>8}  p50 {change('p50_ms'):>8}  p95 {change('p95_ms'):>8}  p99 {change('p99_ms'):>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server (default: in-process ASGI transport)")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=1000, help="operations per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--warmup", type=int, default=50, help="untimed operations before each scenario")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scale", type=float, default=1.0, help="dataset scale used when the database is not seeded yet")
+    parser.add_argument("--reseed", action="store_true", help="rebuild the dataset even if it exists")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    if args.reseed or not dataset.is_seeded():
+        dataset.seed(args.scale, args.seed)
+    context = load_context()
+    scenarios = asyncio.run(run(args, context))
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "date": datetime.utcnow().isoformat(timespec="seconds"),
+        "database": engine.dialect.name,
+        "mode": "http" if args.url else "in-process",
+        "products": context["products"],
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "scenarios": scenarios,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {output}")
+    if baseline:
+        compare(results, baseline)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""
+Reproducible benchmark dataset with production-like volumes.
+
+At scale 1.0: 10k customers, 100 staff, 100k products in 100 categories, 100k discounts,
+1M orders (2-3 items each), and 10k workflows with 10 steps, viewers and responsible users
+(plus 100 templates). Lower scales shrink every volume proportionally, e.g. --scale 0.01 for
+a quick run. The same --seed always produces the same rows.
+
+Run from the backend directory against a scratch database, e.g.:
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.dataset --scale 0.1
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from database import Base, engine, SessionLocal
+from migrations import runner
+from models.user import User, RoleEnum
+from models.category import Category
+from models.product import Product
+from models.discount import Discount, DiscountStatus
+from models.order import Order, order_product
+from models.workflow import (
+    Workflow, WorkflowStep, WorkflowStepTemplate,
+    workflow_viewers, workflow_responsible_users, workflow_step_responsible_users, workflow_participants,
+)
+from crud.pricing import rebuild_price_timeline
+from crud.workflow import participant_rows
+
+CHUNK = 10_000
+ADJECTIVES = ["red", "blue", "green", "steel", "wooden", "compact", "deluxe", "smart", "classic", "portable"]
+NOUNS = ["chair", "lamp", "kettle", "drill", "backpack", "monitor", "jacket", "speaker", "table", "bottle"]
+STEP_STATUSES = ["Pending"] * 5 + ["InProgress"] * 2 + ["Completed"] * 3
+WORKFLOW_STATUSES = ["Draft", "Active", "Active", "Active", "Completed"]
+
+def volumes(scale: float) -> dict:
+    def scaled(n, minimum=1):
+        return max(minimum, int(n * scale))
+    return {
+        "customers": scaled(10_000, 10),
+        "staff": scaled(100, 5),
+        "categories": scaled(100, 5),
+        "products": scaled(100_000, 50),
+        "discounts": scaled(100_000, 50),
+        "orders": scaled(1_000_000, 100),
+        "workflows": scaled(10_000, 20),
+        "templates": scaled(100, 2),
+        "steps_per_workflow": 10,
+    }
+
+def _insert(connection, table, rows):
+    for start in range(0, len(rows), CHUNK):
+        connection.execute(table.insert(), rows[start:start + CHUNK])
+
+def reset_schema():
+    """Drop every table and recreate the schema through the migrations."""
+    runner.load_models()
+    Base.metadata.drop_all(bind=engine)
+    runner.schema_migrations.drop(bind=engine, checkfirst=True)
+    runner.upgrade(engine, echo=lambda *_: None)
+
+def seed(scale: float = 1.0, seed_value: int = 42, log=print) -> dict:
+    """Reset the database and fill it with the benchmark dataset. Returns the volumes used."""
+    rng = random.Random(seed_value)
+    sizes = volumes(scale)
+    started = time.perf_counter()
+    reset_schema()
+    now = datetime.utcnow().replace(microsecond=0)
+
+    with engine.begin() as connection:
+        users = [{
+            "id": 1, "username": "bench_admin", "email": "bench_admin@example.com", "hashed_password": "-",
+            "national_id": "bench_admin", "role": RoleEnum.admin.name, "is_active": True,
+        }]
+        for i in range(sizes["staff"]):
+            users.append({
+                "id": 2 + i, "username": f"bench_staff_{i}", "email": f"bench_staff_{i}@example.com", "hashed_password": "-",
+                "national_id": f"bench_staff_{i}", "role": RoleEnum.staff.name, "is_active": True,
+            })
+        first_customer = 2 + sizes["staff"]
+        for i in range(sizes["customers"]):
+            users.append({
+                "id": first_customer + i, "username": f"bench_customer_{i}", "email": f"bench_customer_{i}@example.com",
+                "hashed_password": "-", "national_id": f"bench_customer_{i}", "role": RoleEnum.customer.name, "is_active": True,
+                "state": "State", "city": "City", "address": "Street 1", "phone_number": "000",
+            })
+        _insert(connection, User.__table__, users)
+        staff_ids = list(range(2, first_customer))
+        customer_ids = list(range(first_customer, first_customer + sizes["customers"]))
+        log(f"users: {len(users)}")
+
+        _insert(connection, Category.__table__, [
+            {"id": i, "name": f"category {i}", "description": f"Category {i}"} for i in range(1, sizes["categories"] + 1)
+        ])
+        prices = {}
+        products = []
+        for i in range(1, sizes["products"] + 1):
+            prices[i] = round(rng.uniform(1, 500), 2)
+            products.append({
+                "id": i, "name": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}", "description": "Benchmark product",
+                "price": prices[i], "stock": 1_000_000, "owner_id": 1, "category_id": rng.randint(1, sizes["categories"]),
+                "minimum_order": 1,
+            })
+        _insert(connection, Product.__table__, products)
+        log(f"products: {len(products)}")
+
+        statuses = [DiscountStatus.ACTIVE.value] * 7 + [DiscountStatus.EXPIRED.value, DiscountStatus.DISABLED.value, DiscountStatus.USED.value]
+        discounts = []
+        for i in range(sizes["discounts"]):
+            discounts.append({
+                "code": f"BENCH{i}" if rng.random() < 0.05 else None,
+                "percent": rng.choice([5, 10, 15, 20]),
+                # Always product-bound: a discount covering every product can only apply to one item per order
+                "product_id": rng.randint(1, sizes["products"]),
+                "customer_id": rng.choice(customer_ids) if rng.random() < 0.4 else None,
+                "submitted_by_user_id": 1,
+                "status": rng.choice(statuses),
+                "usage_count": 0,
+                "submission_date": now,
+            })
+        _insert(connection, Discount.__table__, discounts)
+        log(f"discounts: {len(discounts)}")
+
+        orders, items = [], []
+        for order_id in range(1, sizes["orders"] + 1):
+            chosen = rng.sample(range(1, sizes["products"] + 1), rng.randint(2, 3))
+            total = 0.0
+            for product_id in chosen:
+                quantity = rng.randint(1, 3)
+                total += prices[product_id] * quantity
+                items.append({"order_id": order_id, "product_id": product_id, "quantity": quantity, "discounted_price": prices[product_id]})
+            orders.append({
+                "id": order_id, "user_id": rng.choice(customer_ids), "total_amount": round(total, 2),
+                "status": rng.choice(["Pending", "Completed", "Shipped"]), "state": "State", "city": "City",
+                "address": "Street 1", "phone_number": "000", "created_at": now - timedelta(minutes=rng.randint(0, 525_600)),
+            })
+            if len(orders) >= CHUNK:
+                connection.execute(Order.__table__.insert(), orders)
+                connection.execute(order_product.insert(), items)
+                orders, items = [], []
+        if orders:
+            connection.execute(Order.__table__.insert(), orders)
+            connection.execute(order_product.insert(), items)
+        log(f"orders: {sizes['orders']}")
+
+        workflows, template_steps, steps = [], [], []
+        viewers, responsible, step_responsible = [], [], []
+        template_step_ids = {}
+        next_template_step_id = 1
+        for template_id in range(1, sizes["templates"] + 1):
+            workflows.append({
+                "id": template_id, "title": f"template {template_id}", "creator_id": 1, "approver_id": 1, "status": "Active",
+                "is_template": True, "uploaded_files": [], "created_at": now, "updated_at": now,
+            })
+            ids = list(range(next_template_step_id, next_template_step_id + sizes["steps_per_workflow"]))
+            next_template_step_id += len(ids)
+            template_step_ids[template_id] = ids
+            for number, step_id in enumerate(ids, start=1):
+                template_steps.append({
+                    "id": step_id, "workflow_id": template_id, "step_number": number, "description": f"Template step {number}",
+                    "is_mandatory": number % 3 == 0, "default_expected_duration": rng.randint(1, 10),
+                    "next_step_on_success": step_id + 1 if number < len(ids) else None,
+                    "next_step_on_failure": None, "created_at": now, "updated_at": now,
+                })
+        step_id = 1
+        for workflow_id in range(sizes["templates"] + 1, sizes["templates"] + sizes["workflows"] + 1):
+            template_id = rng.randint(1, sizes["templates"])
+            members = rng.sample(staff_ids, min(len(staff_ids), 5))
+            workflows.append({
+                "id": workflow_id, "title": f"workflow {workflow_id}", "creator_id": members[0], "approver_id": members[1],
+                "status": rng.choice(WORKFLOW_STATUSES), "is_template": False, "parent_workflow_id": None,
+                "uploaded_files": [], "created_at": now - timedelta(days=rng.randint(0, 365)), "updated_at": now,
+            })
+            viewers.extend({"workflow_id": workflow_id, "user_id": user_id} for user_id in members[2:])
+            responsible.extend({"workflow_id": workflow_id, "user_id": user_id} for user_id in members[3:])
+            for number, template_step_id in enumerate(template_step_ids[template_id], start=1):
+                status = rng.choice(STEP_STATUSES)
+                expected_duration = rng.randint(1, 10)
+                steps.append({
+                    "id": step_id, "workflow_id": workflow_id, "step_number": number, "description": f"Step {number}",
+                    "status": status, "is_mandatory": number % 3 == 0, "is_additional": False,
+                    "template_step_id": template_step_id, "expected_duration": expected_duration, "uploaded_files": [],
+                    "created_at": now, "updated_at": now, "completed_at": now if status == "Completed" else None,
+                    "due_at": now + timedelta(days=expected_duration),
+                })
+                step_responsible.extend(
+                    {"workflow_step_id": step_id, "user_id": user_id} for user_id in rng.sample(members, 2)
+                )
+                step_id += 1
+        _insert(connection, Workflow.__table__, workflows)
+        _insert(connection, WorkflowStepTemplate.__table__, template_steps)
+        _insert(connection, WorkflowStep.__table__, steps)
+        _insert(connection, workflow_viewers, viewers)
+        _insert(connection, workflow_responsible_users, responsible)
+        _insert(connection, workflow_step_responsible_users, step_responsible)
+        connection.execute(workflow_participants.insert().from_select(["workflow_id", "user_id", "role"], participant_rows()))
+        log(f"workflows: {len(workflows)} with {len(steps)} steps")
+
+    db = SessionLocal()
+    try:
+        rows = rebuild_price_timeline(db)
+    finally:
+        db.close()
+    log(f"price timeline rows: {rows}")
+    log(f"seeded in {time.perf_counter() - started:.1f}s")
+    return sizes
+
+def is_seeded() -> bool:
+    """Check if the database already holds a benchmark dataset."""
+    runner.load_models()
+    try:
+        with engine.connect() as connection:
+            return bool(connection.execute(select(func.count()).select_from(User.__table__).where(User.username == "bench_admin")).scalar())
+    except Exception:
+        return False
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    seed(args.scale, args.seed)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Concurrency check for discount code redemption.
+
+Many threads place orders with the same limited discount code at the same time;
+the run exits with status 1 if the code was redeemed more often than usage_limit or
+per_customer_limit allow, counted both on the redemption counters and on the order rows,
+or if an order failed with anything but a limit rejection.
+
+Run from the backend directory against a scratch database, e.g.:
+    DATABASE_URL=sqlite:///./stress.db python -m benchmarks.discount_redemption_stress
+"""
+import argparse
+import sys
+import threading
+from collections import Counter
+from fastapi import HTTPException
+from database import Base, engine, SessionLocal
+from models.user import User
+from models.category import Category
+from models.product import Product
+from models.discount import Discount, DiscountStatus, DiscountUsage
+from models.order import Order, order_product
+from sqlalchemy import func
+import models.cart  # noqa: F401 - registers the carts table
+import schemas.order as order_schemas
+from crud.order import create_order
+
+def seed(db, customers: int, usage_limit: int, per_customer_limit: int):
+    admin = User(username="stress_admin", email="stress_admin@example.com", hashed_password="-", national_id="stress_admin")
+    db.add(admin)
+    db.flush()
+    users = []
+    for i in range(customers):
+        user = User(username=f"stress_{i}", email=f"stress_{i}@example.com", hashed_password="-", national_id=f"stress_{i}")
+        db.add(user)
+        users.append(user)
+    category = Category(name="stress", description="stress")
+    db.add(category)
+    db.flush()
+    product = Product(name="stress", price=100.0, stock=1_000_000, owner_id=admin.id, category_id=category.id)
+    db.add(product)
+    db.flush()
+    discount = Discount(
+        code="HAMMER",
+        percent=10,
+        submitted_by_user_id=admin.id,
+        status=DiscountStatus.ACTIVE.value,
+        usage_limit=usage_limit,
+        per_customer_limit=per_customer_limit,
+    )
+    db.add(discount)
+    db.commit()
+    return [u.id for u in users], product.id, discount.id
+
+def place_orders(user_id: int, product_id: int, attempts: int, barrier: threading.Barrier, results: Counter, lock: threading.Lock):
+    barrier.wait()
+    for _ in range(attempts):
+        db = SessionLocal()
+        try:
+            order = order_schemas.OrderCreate(
+                user_id=user_id,
+                items=[order_schemas.OrderItemCreate(product_id=product_id, quantity=1)],
+                discount_code="HAMMER",
+            )
+            create_order(db, order=order, user_id=user_id)
+            outcome = "redeemed"
+        except (ValueError, HTTPException):
+            outcome = "rejected"
+        except Exception:
+            db.rollback()
+            outcome = "error"
+        finally:
+            db.close()
+        with lock:
+            results[outcome] += 1
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--attempts", type=int, default=10, help="orders placed per thread")
+    parser.add_argument("--customers", type=int, default=8)
+    parser.add_argument("--usage-limit", type=int, default=20)
+    parser.add_argument("--per-customer-limit", type=int, default=3)
+    args = parser.parse_args()
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user_ids, product_id, discount_id = seed(db, args.customers, args.usage_limit, args.per_customer_limit)
+    db.close()
+
+    results = Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(args.threads)
+    threads = [
+        threading.Thread(
+            target=place_orders,
+            args=(user_ids[i % len(user_ids)], product_id, args.attempts, barrier, results, lock)
+        )
+        for i in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db = SessionLocal()
+    discount = db.query(Discount).filter(Discount.id == discount_id).one()
+    usages = {u.user_id: u.uses for u in db.query(DiscountUsage).filter(DiscountUsage.discount_id == discount_id)}
+    orders = db.query(Order).count()
+    # Orders that actually got the code, per customer, independent of the counters under test
+    discounted_orders = dict(
+        db.query(Order.user_id, func.count(func.distinct(Order.id)))
+        .join(order_product, order_product.c.order_id == Order.id)
+        .filter(order_product.c.discount_id == discount_id)
+        .group_by(Order.user_id)
+        .all()
+    )
+    db.close()
+
+    print(f"attempts={args.threads * args.attempts} {dict(results)}")
+    print(f"usage_count={discount.usage_count} status={discount.status} orders={orders} per_customer={usages}")
+
+    failures = []
+    if discount.usage_count > args.usage_limit:
+        failures.append(f"usage_count {discount.usage_count} exceeds usage_limit {args.usage_limit}")
+    if sum(discounted_orders.values()) > args.usage_limit:
+        failures.append(f"{sum(discounted_orders.values())} orders got the code, usage_limit is {args.usage_limit}")
+    for user_id in set(usages) | set(discounted_orders):
+        uses = max(usages.get(user_id, 0), discounted_orders.get(user_id, 0))
+        if uses > args.per_customer_limit:
+            failures.append(f"customer {user_id} redeemed the code {uses} times, per_customer_limit is {args.per_customer_limit}")
+    if discount.usage_count != results["redeemed"] or orders != results["redeemed"]:
+        failures.append("usage_count/orders do not match successful redemptions")
+    if discount.usage_count >= args.usage_limit and discount.status != DiscountStatus.USED.value:
+        failures.append("exhausted code was not marked as used")
+    if results["error"]:
+        failures.append(f"{results['error']} orders failed with an unexpected error")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK: usage limits held")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Discount resolution latency with and without the composite discount indexes.
+
+Seeds a scratch database with 100k discounts, then times get_applicable_discount
+(the four precedence queries) and get_applicable_discounts (bulk) for random
+product/user pairs, first without and then with the indexes from migration 0003.
+
+Run from the backend directory against a scratch database, e.g.:
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.discount_resolution
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from sqlalchemy import text
+from database import Base, engine, SessionLocal
+from migrations.runner import load_models, Operations
+from models.user import User
+from models.category import Category
+from models.product import Product
+from models.discount import Discount, DiscountStatus
+from crud.discount import get_applicable_discount, get_applicable_discounts
+
+INDEXES = {
+    "ix_discounts_status_product_customer": ["status", "product_id", "customer_id"],
+    "ix_discounts_status_customer_product": ["status", "customer_id", "product_id"],
+}
+
+def seed(discounts: int, products: int, users: int, rng: random.Random):
+    load_models()
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {"id": i, "username": f"bench_{i}", "email": f"bench_{i}@example.com", "hashed_password": "-", "national_id": f"bench_{i}"}
+            for i in range(1, users + 1)
+        ])
+        connection.execute(Category.__table__.insert(), [{"id": 1, "name": "bench", "description": "bench"}])
+        connection.execute(Product.__table__.insert(), [
+            {"id": i, "name": f"product {i}", "price": 100.0, "stock": 100, "owner_id": 1, "category_id": 1}
+            for i in range(1, products + 1)
+        ])
+        statuses = [DiscountStatus.ACTIVE.value] * 7 + [DiscountStatus.EXPIRED.value, DiscountStatus.DISABLED.value, DiscountStatus.USED.value]
+        rows = []
+        for i in range(discounts):
+            kind = rng.random()
+            product_id = rng.randint(1, products) if kind < 0.75 else None
+            customer_id = rng.randint(1, users) if 0.45 < kind < 0.995 else None
+            rows.append({
+                "code": f"CODE{i}" if rng.random() < 0.05 else None,
+                "percent": rng.choice([5, 10, 15, 20]),
+                "product_id": product_id,
+                "customer_id": customer_id,
+                "submitted_by_user_id": 1,
+                "status": rng.choice(statuses),
+                "usage_count": 0,
+            })
+        for start in range(0, len(rows), 10_000):
+            connection.execute(Discount.__table__.insert(), rows[start:start + 10_000])
+
+def set_indexes(enabled: bool):
+    with engine.begin() as connection:
+        op = Operations(connection)
+        for name, columns in INDEXES.items():
+            if enabled:
+                op.create_index("discounts", name, columns)
+            else:
+                op.drop_index("discounts", name)
+        if op.dialect == "mysql":
+            op.execute("ANALYZE TABLE discounts")
+        else:
+            op.execute("ANALYZE")
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def measure(samples: int, products: int, users: int, rng: random.Random):
+    db = SessionLocal()
+    single, bulk = [], []
+    try:
+        for _ in range(samples):
+            product_id = rng.randint(1, products)
+            user_id = rng.randint(1, users) if rng.random() < 0.5 else None
+            start = time.perf_counter()
+            get_applicable_discount(db, product_id, user_id)
+            single.append((time.perf_counter() - start) * 1000)
+        for _ in range(max(1, samples // 20)):
+            product_ids = rng.sample(range(1, products + 1), 50)
+            start = time.perf_counter()
+            get_applicable_discounts(db, product_ids, rng.randint(1, users))
+            bulk.append((time.perf_counter() - start) * 1000)
+    finally:
+        db.close()
+    summary = lambda values: {
+        "p50_ms": round(statistics.median(values), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "samples": len(values),
+    }
+    return {"get_applicable_discount": summary(single), "get_applicable_discounts_50": summary(bulk)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--discounts", type=int, default=100_000)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--samples", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    seed(args.discounts, args.products, args.users, rng)
+
+    results = {"dialect": engine.dialect.name, "discounts": args.discounts}
+    for label, enabled in (("before", False), ("after", True)):
+        set_indexes(enabled)
+        results[label] = measure(args.samples, args.products, args.users, random.Random(args.seed))
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Response serialization cost per endpoint on the benchmark dataset (see benchmarks/dataset.py).
+
+For the rows each hot list endpoint returns, times three ways of turning them into JSON:
+  stdlib     response_model validation, jsonable_encoder and json.dumps (FastAPI's
+             encoding path for a custom response class)
+  pydantic   response_model validation and Pydantic's dump_json (FastAPI's default fast path)
+  orm        responses.orm_response: no validation, fields read from the rows, orjson
+and the plain-dict encoding of FastJSONResponse against json.dumps. Database time is excluded.
+
+Run from the backend directory, e.g.:
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.dataset --scale 0.1
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.serialization
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from typing import List
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import func, select
+from database import SessionLocal
+from migrations.runner import load_models
+from models.order import Order
+import crud.order as order_crud
+import crud.product as product_crud
+import crud.workflow as workflow_crud
+import schemas.order as order_schemas
+import schemas.product as product_schemas
+import schemas.workflow as workflow_schemas
+from responses import dumps, orm_response
+
+def timed(func, repeat: int) -> float:
+    func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def endpoints(db) -> dict:
+    """Rows returned by each endpoint, fetched once through the same CRUD calls."""
+    busiest_customer = db.execute(
+        select(Order.user_id).group_by(Order.user_id).order_by(func.count().desc()).limit(1)
+    ).scalar()
+    return {
+        "GET /products/?limit=100": (product_crud.get_products(db, limit=100), List[product_schemas.Product]),
+        "GET /products/search/?query=lamp": (
+            product_crud.search_products_by_name(db, query="lamp", limit=100, user_id=busiest_customer), List[product_schemas.Product]
+        ),
+        "GET /orders/?limit=100": (order_crud.get_orders(db, user_id=busiest_customer, limit=100), List[order_schemas.Order]),
+        "GET /workflows/?limit=100 (admin)": (workflow_crud.get_workflows(db, limit=100), List[workflow_schemas.WorkflowListItem]),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    load_models()
+    db = SessionLocal()
+    results = {}
+    try:
+        for name, (rows, response_model) in endpoints(db).items():
+            adapter = TypeAdapter(response_model)
+            timings = {
+                "rows": len(rows),
+                "stdlib_ms": timed(lambda: json.dumps(jsonable_encoder(adapter.validate_python(rows, from_attributes=True))).encode(), args.repeat),
+                "pydantic_ms": timed(lambda: adapter.dump_json(adapter.validate_python(rows, from_attributes=True)), args.repeat),
+                "orm_ms": timed(lambda: orm_response(rows, response_model).body, args.repeat),
+            }
+            results[name] = {key: round(value, 3) for key, value in timings.items()}
+            results[name]["speedup_vs_pydantic"] = round(timings["pydantic_ms"] / timings["orm_ms"], 2)
+            results[name]["speedup_vs_stdlib"] = round(timings["stdlib_ms"] / timings["orm_ms"], 2)
+
+        plain = jsonable_encoder(TypeAdapter(List[product_schemas.Product]).validate_python(
+            product_crud.get_products(db, limit=100), from_attributes=True
+        ))
+        json_ms, orjson_ms = timed(lambda: json.dumps(plain).encode(), args.repeat), timed(lambda: dumps(plain), args.repeat)
+        results["plain dict (100 products)"] = {
+            "json_ms": round(json_ms, 3), "orjson_ms": round(orjson_ms, 3), "speedup": round(json_ms / orjson_ms, 2),
+        }
+    finally:
+        db.close()
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
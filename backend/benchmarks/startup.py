@@ -0,0 +1,91 @@
+"""
+Worker startup time: import time of main.py and time from process start to the first response.
+
+Each run starts a fresh uvicorn worker serving main:app, then polls /health/live (first
+response) and /health/ready (pool warmed up). A separate interpreter measures the bare
+`import main` time. The schema must already be migrated, as in the container where
+init_db.py runs before the workers.
+
+Run from the backend directory, e.g.:
+    DATABASE_URL=sqlite:///./bench.db python -m migrations upgrade
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+
+def measure_import() -> float:
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1]) * 1000
+
+def wait_for(client: httpx.Client, url: str, deadline: float) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            if client.get(url).status_code == 200:
+                return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(f"{url} did not answer in time")
+
+def measure_first_response(port: int, timeout: float) -> dict:
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            live = wait_for(client, f"{base_url}/health/live", start + timeout)
+            ready = wait_for(client, f"{base_url}/health/ready", start + timeout)
+    finally:
+        process.terminate()
+        process.wait()
+    return {"first_response_ms": (live - start) * 1000, "ready_ms": (ready - start) * 1000}
+
+def summary(values: list) -> dict:
+    return {
+        "p50_ms": round(statistics.median(values), 1),
+        "min_ms": round(min(values), 1),
+        "max_ms": round(max(values), 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for a worker to become ready")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    imports, first_responses, ready = [], [], []
+    for _ in range(args.runs):
+        imports.append(measure_import())
+        timings = measure_first_response(args.port, args.timeout)
+        first_responses.append(timings["first_response_ms"])
+        ready.append(timings["ready_ms"])
+
+    results = {
+        "database": os.getenv("DATABASE_URL", "mysql").split(":", 1)[0],
+        "runs": args.runs,
+        "import_main": summary(imports),
+        "first_response": summary(first_responses),
+        "ready": summary(ready),
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
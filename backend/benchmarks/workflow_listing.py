@@ -0,0 +1,165 @@
+"""
+Workflow listing: rows fetched and latency of the old cartesian joinedload against batched loading.
+
+Seeds a scratch database with workflows at a realistic fan-out (by default 20 steps with
+5 responsible users each, 5 viewers and 5 responsible users per workflow), then loads pages
+of workflows, as an admin and as a participant, three ways:
+  joinedload    every relationship joined into one statement (the previous listing)
+  selectinload  crud.workflow.get_workflows(with_relations=True): one query per relationship
+  listing       crud.workflow.get_workflows(): only the workflow rows WorkflowListItem renders
+Rows fetched are counted by re-running every statement the load issued.
+
+Run from the backend directory against a scratch database, e.g.:
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.workflow_listing
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+from database import engine, SessionLocal
+from models.user import User, RoleEnum
+from models.workflow import (
+    Workflow, WorkflowStep, workflow_viewers, workflow_responsible_users, workflow_step_responsible_users, workflow_participants,
+)
+from crud.workflow import get_workflows, participant_filter, participant_rows
+from benchmarks.dataset import reset_schema
+
+def seed(workflows: int, steps: int, step_users: int, viewers: int, responsible: int, users: int):
+    reset_schema()
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "-", "national_id": f"user{i}",
+             "role": (RoleEnum.admin if i == 1 else RoleEnum.staff).name, "is_active": True}
+            for i in range(1, users + 1)
+        ])
+        workflow_rows, step_rows, viewer_rows, responsible_rows, step_user_rows = [], [], [], [], []
+        step_id = 1
+        for workflow_id in range(1, workflows + 1):
+            workflow_rows.append({
+                "id": workflow_id, "title": f"workflow {workflow_id}", "creator_id": rng.randint(2, users),
+                "approver_id": rng.randint(2, users), "status": "Active", "is_template": False, "uploaded_files": [],
+                "created_at": now, "updated_at": now,
+            })
+            viewer_rows.extend({"workflow_id": workflow_id, "user_id": u} for u in rng.sample(range(2, users + 1), viewers))
+            responsible_rows.extend({"workflow_id": workflow_id, "user_id": u} for u in rng.sample(range(2, users + 1), responsible))
+            for number in range(1, steps + 1):
+                step_rows.append({
+                    "id": step_id, "workflow_id": workflow_id, "step_number": number, "description": f"Step {number}",
+                    "status": "Pending", "is_mandatory": False, "is_additional": False, "uploaded_files": [],
+                    "created_at": now, "updated_at": now,
+                })
+                step_user_rows.extend({"workflow_step_id": step_id, "user_id": u} for u in rng.sample(range(2, users + 1), step_users))
+                step_id += 1
+        for table, rows in [
+            (Workflow.__table__, workflow_rows), (WorkflowStep.__table__, step_rows), (workflow_viewers, viewer_rows),
+            (workflow_responsible_users, responsible_rows), (workflow_step_responsible_users, step_user_rows),
+        ]:
+            connection.execute(table.insert(), rows)
+        connection.execute(workflow_participants.insert().from_select(["workflow_id", "user_id", "role"], participant_rows()))
+
+def joinedload_listing(db, limit: int, participant_id: int = None):
+    """The listing as it was: every relationship joined into one statement."""
+    query = db.query(Workflow).options(
+        joinedload(Workflow.creator),
+        joinedload(Workflow.approver),
+        joinedload(Workflow.viewers),
+        joinedload(Workflow.responsible_users),
+        joinedload(Workflow.steps).joinedload(WorkflowStep.responsible_users),
+        joinedload(Workflow.template_steps),
+    )
+    if participant_id:
+        query = query.filter(participant_filter(participant_id))
+    return query.order_by(Workflow.id).limit(limit).all()
+
+class StatementLog:
+    """Statements run on the engine while active."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+def rows_fetched(statements: list) -> int:
+    connection = engine.raw_connection()
+    try:
+        total = 0
+        for statement, parameters in statements:
+            cursor = connection.cursor()
+            cursor.execute(statement, parameters)
+            total += len(cursor.fetchall())
+            cursor.close()
+        return total
+    finally:
+        connection.close()
+
+def measure(load, repeat: int) -> dict:
+    db = SessionLocal()
+    try:
+        with StatementLog() as log:
+            load(db)
+        db.expunge_all()
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            load(db)
+            samples.append((time.perf_counter() - start) * 1000)
+            db.expunge_all()
+    finally:
+        db.close()
+    return {
+        "statements": len(log.statements),
+        "rows_fetched": rows_fetched(log.statements),
+        "p50_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(sorted(samples)[int(len(samples) * 0.95) - 1], 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workflows", type=int, default=2000)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--step-users", type=int, default=5)
+    parser.add_argument("--viewers", type=int, default=5)
+    parser.add_argument("--responsible", type=int, default=5)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--page", type=int, default=20, help="workflows per page")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    seed(args.workflows, args.steps, args.step_users, args.viewers, args.responsible, args.users)
+    participant = 2
+    strategies = {
+        "joinedload": lambda db, pid: joinedload_listing(db, args.page, pid),
+        "selectinload": lambda db, pid: get_workflows(db, limit=args.page, participant_id=pid, with_relations=True),
+        "listing": lambda db, pid: get_workflows(db, limit=args.page, participant_id=pid),
+    }
+    fan_out = ("workflows", "steps", "step_users", "viewers", "responsible", "users")
+    results = {"page": args.page, "fan_out": {name: getattr(args, name) for name in fan_out}}
+    for viewer, participant_id in [("admin", None), ("participant", participant)]:
+        results[viewer] = {}
+        for name, load in strategies.items():
+            results[viewer][name] = measure(lambda db: load(db, participant_id), args.repeat)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
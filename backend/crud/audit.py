@@ -0,0 +1,143 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+from models.audit import WorkflowAuditEntry
+from typing import Iterator, List, Optional
+from datetime import date, datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bookkeeping columns left out of the diffs (deadlines and escalations are maintained by the scheduler)
+IGNORED_FIELDS = {"updated_at", "due_at", "escalated_at", "template_version"}
+
+def jsonable(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def snapshot(obj, **extra) -> dict:
+    """Column values of a model instance (plus extra fields such as related ids), JSON-ready."""
+    state = {
+        attr.key: jsonable(getattr(obj, attr.key))
+        for attr in inspect(obj).mapper.column_attrs if attr.key not in IGNORED_FIELDS
+    }
+    state.update({key: jsonable(value) for key, value in extra.items()})
+    return state
+
+def diff(before: dict, after: dict) -> dict:
+    """Changed fields only, as {field: [old, new]}."""
+    return {key: [before.get(key), value] for key, value in after.items() if before.get(key) != value}
+
+def _compact(state: dict) -> dict:
+    return {key: value for key, value in state.items() if value not in (None, [], "")}
+
+def record(
+    db: Session,
+    workflow_id: int,
+    entity: str,
+    entity_id: int,
+    action: str,
+    changes: dict,
+    user_id: int = None,
+    now: datetime = None
+) -> Optional[WorkflowAuditEntry]:
+    """
+    Add an audit entry to the session, so it commits (or rolls back) with the change it describes.
+    Updates that changed nothing are not recorded.
+    """
+    if action == "update" and not changes:
+        return None
+    entry = WorkflowAuditEntry(
+        created_at=now or datetime.utcnow(),
+        workflow_id=workflow_id,
+        entity=entity,
+        entity_id=entity_id,
+        action=action,
+        user_id=user_id,
+        changes=changes if action == "update" else _compact(changes)
+    )
+    db.add(entry)
+    return entry
+
+def record_many(db: Session, entries: List[dict], user_id: int = None, now: datetime = None):
+    """Insert many create/delete entries ({workflow_id, entity, entity_id, action, changes}) with one executemany."""
+    if not entries:
+        return
+    now = now or datetime.utcnow()
+    db.execute(WorkflowAuditEntry.__table__.insert(), [
+        dict(entry, changes=_compact(entry["changes"]), created_at=now, user_id=user_id) for entry in entries
+    ])
+
+def iter_audit_log(
+    db: Session,
+    workflow_id: int = None,
+    since: datetime = None,
+    until: datetime = None,
+    batch_size: int = 1000
+) -> Iterator[WorkflowAuditEntry]:
+    """
+    Audit entries in id order, read batch_size at a time by keyset on id, so an export of any
+    size holds one batch in memory. The created_at bounds let MySQL prune month partitions.
+    """
+    last_id = 0
+    while True:
+        query = db.query(WorkflowAuditEntry).filter(WorkflowAuditEntry.id > last_id)
+        if workflow_id:
+            query = query.filter(WorkflowAuditEntry.workflow_id == workflow_id)
+        if since:
+            query = query.filter(WorkflowAuditEntry.created_at >= since)
+        if until:
+            query = query.filter(WorkflowAuditEntry.created_at < until)
+        batch = query.order_by(WorkflowAuditEntry.id).limit(batch_size).all()
+        for entry in batch:
+            yield entry
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1].id
+        db.expunge_all()
+
+def get_audit_log(db: Session, workflow_id: int, after_id: int = None, limit: int = 100) -> List[WorkflowAuditEntry]:
+    """History of one workflow, oldest first, by keyset on id."""
+    query = db.query(WorkflowAuditEntry).filter(WorkflowAuditEntry.workflow_id == workflow_id)
+    if after_id:
+        query = query.filter(WorkflowAuditEntry.id > after_id)
+    return query.order_by(WorkflowAuditEntry.id).limit(limit).all()
+
+def _month_start(day: date, months: int = 0) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+def partition_clause(month: date) -> str:
+    """Monthly range partition holding the entries created before the next month."""
+    return f"PARTITION p{month:%Y%m} VALUES LESS THAN (TO_DAYS('{_month_start(month, 1):%Y-%m-%d}'))"
+
+def ensure_audit_partitions(db: Session, months_ahead: int = 3, today: date = None) -> List[str]:
+    """
+    Scheduler job (MySQL): split the catch-all p_future partition of workflow_audit_log so there is
+    one partition per month up to months_ahead months from now. Old months can then be archived
+    or dropped per partition. Returns the partitions created.
+    """
+    if db.get_bind().dialect.name != "mysql":
+        return []
+    existing = set(db.execute(text(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'workflow_audit_log' AND PARTITION_NAME IS NOT NULL"
+    )).scalars())
+    if "p_future" not in existing:
+        return []
+    this_month = _month_start(today or datetime.utcnow().date())
+    months = [_month_start(this_month, offset) for offset in range(months_ahead + 1)]
+    missing = [month for month in months if f"p{month:%Y%m}" not in existing]
+    # Partitions are only split off p_future, after the last existing month
+    latest = max((name for name in existing if name != "p_future"), default="")
+    missing = [month for month in missing if f"p{month:%Y%m}" > latest]
+    if not missing:
+        return []
+    db.execute(text(
+        "ALTER TABLE workflow_audit_log REORGANIZE PARTITION p_future INTO ("
+        + ", ".join(partition_clause(month) for month in missing)
+        + ", PARTITION p_future VALUES LESS THAN MAXVALUE)"
+    ))
+    created = [f"p{month:%Y%m}" for month in missing]
+    logger.info(f"Audit log partitions created: {', '.join(created)}")
+    return created
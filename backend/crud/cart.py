@@ -1,14 +1,28 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_
+from sqlalchemy.dialects import mysql, sqlite
+from typing import List, Optional
 from models.cart import Cart
+from models.order import Order, order_product
+from models.product import Product
+from models.user import User
 import schemas.cart as cart_schemas
-from crud.product import get_product
+from crud.product import get_product_stock, get_product_stocks
+from crud.discount import (
+    get_applicable_discounts,
+    calculate_discounted_price,
+    best_discount,
+    get_redeemable_discount,
+    redeem_discount
+)
+from crud.order import is_factor_of_rate, discount_applies_to_product, get_order
 
 def create_cart_item(db: Session, cart: cart_schemas.CartCreate, user_id: int):
     # Check if product exists and has enough stock
-    product = get_product(db, cart.product_id)
-    if not product:
+    stock = get_product_stock(db, cart.product_id)
+    if stock is None:
         raise ValueError("Product not found")
-    if product.stock < cart.quantity:
+    if stock < cart.quantity:
         raise ValueError("Not enough stock available")
     
     # Check if item already exists in cart
@@ -32,6 +46,47 @@ def create_cart_item(db: Session, cart: cart_schemas.CartCreate, user_id: int):
 def get_cart_items(db: Session, user_id: int, skip: int = 0, limit: int = 100):
     return db.query(Cart).filter(Cart.user_id == user_id).offset(skip).limit(limit).all()
 
+def get_cart_view(db: Session, user_id: int, skip: int = 0, limit: int = 100):
+    """
+    Retrieve the user's cart priced for display.
+    Cart rows are loaded with their product and category in one joined query and discounts
+    are resolved with a single bulk lookup, which also prices the nested products.
+    """
+    cart_items = (
+        db.query(Cart)
+        .options(joinedload(Cart.product, innerjoin=True).joinedload(Product.category, innerjoin=True))
+        .filter(Cart.user_id == user_id)
+        .order_by(Cart.id)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    discounts = get_applicable_discounts(db, {item.product_id for item in cart_items}, user_id)
+
+    lines = []
+    subtotal = 0.0
+    total = 0.0
+    for item in cart_items:
+        product = item.product
+        product.discount = discounts.get(product.id)
+        product.effective_price = calculate_discounted_price(product.price, product.discount)
+        line_total = product.price * item.quantity
+        discounted_line_total = calculate_discounted_price(line_total, product.discount)
+        lines.append(cart_schemas.CartLine(
+            id=item.id,
+            user_id=item.user_id,
+            product_id=item.product_id,
+            quantity=item.quantity,
+            product=product,
+            unit_price=product.price,
+            line_total=line_total,
+            discounted_line_total=discounted_line_total
+        ))
+        subtotal += line_total
+        total += discounted_line_total
+
+    return cart_schemas.CartView(items=lines, subtotal=subtotal, total=total)
+
 def get_cart_item(db: Session, cart_id: int, user_id: int):
     return db.query(Cart).filter(Cart.id == cart_id, Cart.user_id == user_id).first()
 
@@ -40,8 +95,8 @@ def update_cart_item(db: Session, cart_id: int, user_id: int, quantity: int):
     if not cart_item:
         raise ValueError("Cart item not found")
     
-    product = get_product(db, cart_item.product_id)
-    if product.stock < quantity:
+    stock = get_product_stock(db, cart_item.product_id)
+    if stock is None or stock < quantity:
         raise ValueError("Not enough stock available")
     
     cart_item.quantity = quantity
@@ -49,6 +104,117 @@ def update_cart_item(db: Session, cart_id: int, user_id: int, quantity: int):
     db.refresh(cart_item)
     return cart_item
 
+def replace_cart(db: Session, user_id: int, items: List[cart_schemas.CartCreate]):
+    """
+    Replace the whole cart of the user with the given items.
+    The difference with the current cart is applied as set operations:
+    one bulk delete, one bulk insert and one bulk update, committed together.
+    Items with a quantity of 0 or less are removed from the cart.
+    """
+    desired = {}
+    for item in items:
+        desired[item.product_id] = desired.get(item.product_id, 0) + item.quantity
+    desired = {product_id: quantity for product_id, quantity in desired.items() if quantity > 0}
+
+    stocks = get_product_stocks(db, desired)
+    for product_id, quantity in desired.items():
+        if product_id not in stocks:
+            raise ValueError(f"Product with id {product_id} not found")
+        if stocks[product_id] < quantity:
+            raise ValueError(f"Not enough stock available for product {product_id}")
+
+    existing = {}
+    duplicate_ids = []
+    for row in db.query(Cart.id, Cart.product_id, Cart.quantity).filter(Cart.user_id == user_id):
+        if row.product_id in existing:
+            duplicate_ids.append(row.id)
+        else:
+            existing[row.product_id] = row
+
+    to_delete = [existing[product_id].id for product_id in existing.keys() - desired.keys()] + duplicate_ids
+    to_insert = desired.keys() - existing.keys()
+    to_update = [
+        product_id for product_id in desired.keys() & existing.keys()
+        if existing[product_id].quantity != desired[product_id]
+    ]
+
+    try:
+        if to_delete:
+            db.query(Cart).filter(Cart.id.in_(to_delete)).delete(synchronize_session=False)
+        if to_insert:
+            db.bulk_insert_mappings(Cart, [
+                {"user_id": user_id, "product_id": product_id, "quantity": desired[product_id]}
+                for product_id in to_insert
+            ])
+        if to_update:
+            db.bulk_update_mappings(Cart, [
+                {"id": existing[product_id].id, "quantity": desired[product_id]}
+                for product_id in to_update
+            ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return get_cart_items(db, user_id, limit=None)
+
+def _upsert_cart_rows(db: Session, rows: List[dict]):
+    """
+    Insert cart rows, adding the quantity to existing (user_id, product_id) rows.
+    Relies on the uq_carts_user_product unique constraint.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        stmt = sqlite.insert(Cart).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Cart.user_id, Cart.product_id],
+            set_={"quantity": Cart.quantity + stmt.excluded.quantity}
+        )
+    else:
+        # INSERT ... ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)
+        stmt = mysql.insert(Cart).values(rows)
+        stmt = stmt.on_duplicate_key_update(quantity=Cart.quantity + stmt.inserted.quantity)
+    db.execute(stmt)
+
+def add_cart_items(db: Session, user_id: int, items: List[cart_schemas.CartCreate]):
+    """
+    Add several items to the cart at once, e.g. to merge a guest cart after login.
+    Stock is validated for all products (against the merged quantity) with one query
+    and the lines are upserted with a single statement.
+    """
+    incoming = {}
+    for item in items:
+        if item.quantity <= 0:
+            raise ValueError(f"Quantity for product {item.product_id} must be positive")
+        incoming[item.product_id] = incoming.get(item.product_id, 0) + item.quantity
+    if not incoming:
+        return get_cart_items(db, user_id, limit=None)
+
+    rows = (
+        db.query(Product.id, Product.stock, Cart.quantity)
+        .outerjoin(Cart, and_(Cart.product_id == Product.id, Cart.user_id == user_id))
+        .filter(Product.id.in_(incoming))
+        .all()
+    )
+    found = {row.id: row for row in rows}
+    for product_id, quantity in incoming.items():
+        row = found.get(product_id)
+        if not row:
+            raise ValueError(f"Product with id {product_id} not found")
+        if row.stock < (row.quantity or 0) + quantity:
+            raise ValueError(f"Not enough stock available for product {product_id}")
+
+    try:
+        _upsert_cart_rows(db, [
+            {"user_id": user_id, "product_id": product_id, "quantity": quantity}
+            for product_id, quantity in incoming.items()
+        ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return get_cart_items(db, user_id, limit=None)
+
 def delete_cart_item(db: Session, cart_id: int, user_id: int):
     cart_item = get_cart_item(db, cart_id, user_id)
     if not cart_item:
@@ -56,4 +222,100 @@ def delete_cart_item(db: Session, cart_id: int, user_id: int):
     
     db.delete(cart_item)
     db.commit()
-    return {"message": "Item removed from cart"}
\ No newline at end of file
+    return {"message": "Item removed from cart"}
+
+def checkout_cart(db: Session, user_id: int, checkout: Optional[cart_schemas.CartCheckout] = None):
+    """
+    Convert the user's cart into an order.
+    Cart rows and products are loaded (and locked) in one query each, discounts are resolved in
+    one bulk lookup, and the order, its items, the stock updates, the discount code redemption
+    and the removal of the ordered cart rows are committed together. As in order creation, each
+    product gets the better of the discount code and its automatic discount, and the code is
+    only redeemed if some product used it.
+    """
+    checkout = checkout or cart_schemas.CartCheckout()
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise ValueError("User not found")
+
+    # Locked until the order is committed, so a concurrent quantity change waits for the checkout
+    cart_items = db.query(Cart).filter(Cart.user_id == user_id).with_for_update().all()
+    if not cart_items:
+        raise ValueError("Cart is empty")
+
+    quantities = {}
+    for item in cart_items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+
+    code_discount = None
+    if checkout.discount_code:
+        code_discount = get_redeemable_discount(db, checkout.discount_code, user_id)
+        if not any(discount_applies_to_product(code_discount, product_id) for product_id in quantities):
+            raise ValueError("Discount code does not apply to any product in this order")
+
+    try:
+        products = {
+            product.id: product
+            for product in db.query(Product).filter(Product.id.in_(quantities)).with_for_update().all()
+        }
+        discounts = get_applicable_discounts(db, quantities, user_id)
+
+        db_order = Order(
+            user_id=user_id,
+            total_amount=0.0,
+            status="Pending",
+            state=checkout.state or user.state,
+            city=checkout.city or user.city,
+            address=checkout.address or user.address,
+            phone_number=checkout.phone_number or user.phone_number,
+        )
+        db.add(db_order)
+        db.flush()
+
+        order_items = []
+        used_discount_ids = set()
+        final_amount = 0.0
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if not product:
+                raise ValueError(f"Product with id {product_id} not found")
+            if product.stock < quantity:
+                raise ValueError(f"Insufficient stock for product {product.name}")
+            if product.rate is not None and not is_factor_of_rate(quantity, product.rate):
+                raise ValueError(f"Quantity {quantity} is not a factor of the product's rate {product.rate}")
+
+            discount = best_discount(
+                product.price * quantity,
+                discounts.get(product_id),
+                code_discount if discount_applies_to_product(code_discount, product_id) else None
+            )
+            discount_id = discount["id"] if discount else None
+            # Same rule as order creation: a discount can only be used once per order
+            if discount_id and discount_id in used_discount_ids and discount is not code_discount:
+                raise ValueError("This discount can only be used once per order")
+            if discount_id:
+                used_discount_ids.add(discount_id)
+
+            discounted_price = calculate_discounted_price(product.price * quantity, discount)
+            order_items.append({
+                "order_id": db_order.id,
+                "product_id": product_id,
+                "quantity": quantity,
+                "discount_id": discount_id,
+                "discounted_price": discounted_price
+            })
+            product.stock -= quantity
+            final_amount += discounted_price
+
+        db.execute(order_product.insert(), order_items)
+        if code_discount and code_discount["id"] in used_discount_ids:
+            redeem_discount(db, code_discount["id"], user_id)
+        db_order.total_amount = final_amount
+        # Only the rows ordered: lines added while checking out stay in the cart
+        db.query(Cart).filter(Cart.id.in_([item.id for item in cart_items])).delete(synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return get_order(db, db_order.id, user_id)
@@ -1,8 +1,10 @@
 from sqlalchemy.orm import Session
-from models.discount import Discount, DiscountStatus
+from sqlalchemy import or_, and_
+from sqlalchemy.dialects import mysql, sqlite
+from models.discount import Discount, DiscountStatus, DiscountUsage
 from schemas.discount import DiscountCreate, DiscountUpdate
-from typing import Optional, Dict  # Added for Python 3.9 compatibility
-from datetime import datetime
+from typing import Optional, Dict, Iterable  # Added for Python 3.9 compatibility
+from datetime import datetime, timezone
 
 def get_discount(db: Session, discount_id: int):
     """Retrieve a discount by its ID."""
@@ -30,8 +32,19 @@ def get_discounts(
     
     return query.offset(skip).limit(limit).all()
 
+def _to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Store window bounds as naive UTC, like the rest of the timestamps."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 def create_discount(db: Session, discount: DiscountCreate):
-    """Create a new discount."""
+    """Create a new discount. Discounts whose window starts in the future are stored as scheduled."""
+    discount.starts_at = _to_naive_utc(discount.starts_at)
+    discount.ends_at = _to_naive_utc(discount.ends_at)
+    status = discount.status or DiscountStatus.ACTIVE.value  # Default to "active"
+    if status == DiscountStatus.ACTIVE.value and discount.starts_at and discount.starts_at > datetime.utcnow():
+        status = DiscountStatus.SCHEDULED.value
     db_discount = Discount(
         code=discount.code,
         percent=discount.percent,
@@ -39,7 +52,11 @@ def create_discount(db: Session, discount: DiscountCreate):
         product_id=discount.product_id,
         customer_id=discount.customer_id,
         submitted_by_user_id=discount.submitted_by_user_id,
-        status=discount.status or DiscountStatus.ACTIVE.value,  # Default to "active"
+        status=status,
+        usage_limit=discount.usage_limit,
+        per_customer_limit=discount.per_customer_limit,
+        starts_at=discount.starts_at,
+        ends_at=discount.ends_at,
         submission_date=datetime.utcnow()  # Explicitly set (optional, since default is in model)
     )
     db.add(db_discount)
@@ -52,6 +69,9 @@ def update_discount(db: Session, discount_id: int, discount: DiscountUpdate):
     db_discount = db.query(Discount).filter(Discount.id == discount_id).first()
     if db_discount:
         update_data = discount.dict(exclude_unset=True)
+        for key in ("starts_at", "ends_at"):
+            if key in update_data:
+                update_data[key] = _to_naive_utc(update_data[key])
         for key, value in update_data.items():
             setattr(db_discount, key, value)
         db.commit()
@@ -68,9 +88,30 @@ def delete_discount(db: Session, discount_id: int):
         return db_discount
     return None
 
+def in_discount_window(now: datetime = None):
+    """SQL condition matching discounts whose [starts_at, ends_at) window contains now."""
+    now = now or datetime.utcnow()
+    return and_(
+        or_(Discount.starts_at.is_(None), Discount.starts_at <= now),
+        or_(Discount.ends_at.is_(None), Discount.ends_at > now)
+    )
+
+def discount_to_dict(discount: Discount) -> Dict:
+    """Convert a Discount row to the dictionary format used by product responses."""
+    return {
+        "id": discount.id,
+        "code": discount.code,
+        "percent": discount.percent,
+        "max_discount": discount.max_discount,
+        "status": discount.status,
+        "product_id": discount.product_id
+    }
+
 def get_applicable_discount(db: Session, product_id: int, user_id: int = None) -> Optional[Dict]:
     """
     Find the most specific applicable ACTIVE discount for a product.
+    Only automatic discounts (without a code) are considered; coded discounts
+    must be redeemed explicitly, see redeem_discount.
     Returns discount details as a dictionary or None if no active discount is found.
     
     Args:
@@ -83,8 +124,10 @@ def get_applicable_discount(db: Session, product_id: int, user_id: int = None) -
     """
     # Base query for active discounts
     base_query = db.query(Discount).filter(
-        Discount.status == DiscountStatus.ACTIVE.value
-    )
+        Discount.status == DiscountStatus.ACTIVE.value,
+        Discount.code.is_(None),
+        in_discount_window()
+    ).order_by(Discount.id)
 
     if user_id:
         # 1. Check user-specific discount for this product
@@ -93,13 +136,7 @@ def get_applicable_discount(db: Session, product_id: int, user_id: int = None) -
             Discount.product_id == product_id
         ).first()
         if discount:
-            return {
-                "id": discount.id,
-                "code": discount.code,
-                "percent": discount.percent,
-                "max_discount": discount.max_discount,
-                "status": discount.status
-            }
+            return discount_to_dict(discount)
         
         # 2. Check user-specific general discount (no product_id)
         discount = base_query.filter(
@@ -107,13 +144,7 @@ def get_applicable_discount(db: Session, product_id: int, user_id: int = None) -
             Discount.product_id.is_(None)
         ).first()
         if discount:
-            return {
-                "id": discount.id,
-                "code": discount.code,
-                "percent": discount.percent,
-                "max_discount": discount.max_discount,
-                "status": discount.status
-            }
+            return discount_to_dict(discount)
 
     # 3. Check product-specific discount
     discount = base_query.filter(
@@ -121,13 +152,7 @@ def get_applicable_discount(db: Session, product_id: int, user_id: int = None) -
         Discount.customer_id.is_(None)
     ).first()
     if discount:
-        return {
-            "id": discount.id,
-            "code": discount.code,
-            "percent": discount.percent,
-            "max_discount": discount.max_discount,
-            "status": discount.status
-        }
+        return discount_to_dict(discount)
 
     # 4. Check general discount (no product_id and no customer_id)
     discount = base_query.filter(
@@ -135,12 +160,147 @@ def get_applicable_discount(db: Session, product_id: int, user_id: int = None) -
         Discount.customer_id.is_(None)
     ).first()
     if discount:
-        return {
-            "id": discount.id,
-            "code": discount.code,
-            "percent": discount.percent,
-            "max_discount": discount.max_discount,
-            "status": discount.status
-        }
-
-    return None
\ No newline at end of file
+        return discount_to_dict(discount)
+
+    return None
+
+def get_applicable_discounts(db: Session, product_ids: Iterable[int], user_id: int = None) -> Dict[int, Optional[Dict]]:
+    """
+    Bulk version of get_applicable_discount.
+    Loads every ACTIVE automatic discount that could apply to the given products in a single query
+    and resolves them with the same precedence rules:
+    user+product, user general, product, general.
+
+    Args:
+        db: SQLAlchemy database session
+        product_ids: IDs of the products to resolve discounts for
+        user_id: Optional user ID to check for user-specific discounts
+
+    Returns:
+        Dictionary mapping each product ID to its discount details or None
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+
+    # One branch per precedence level so each can use the composite status/product/customer indexes
+    branches = [
+        and_(Discount.product_id.in_(product_ids), Discount.customer_id.is_(None)),
+        and_(Discount.product_id.is_(None), Discount.customer_id.is_(None)),
+    ]
+    if user_id:
+        branches += [
+            and_(Discount.customer_id == user_id, Discount.product_id.in_(product_ids)),
+            and_(Discount.customer_id == user_id, Discount.product_id.is_(None)),
+        ]
+
+    candidates = db.query(Discount).filter(
+        Discount.status == DiscountStatus.ACTIVE.value,
+        or_(*branches),
+        in_discount_window()
+    ).order_by(Discount.id).all()
+
+    # Keep the first automatic discount per (is_customer_specific, product_id) bucket.
+    # Coded discounts are skipped here rather than in SQL: a "code IS NULL" predicate makes
+    # planners pick the unique code index over the composite ones.
+    buckets = {}
+    for discount in candidates:
+        if discount.code is not None:
+            continue
+        buckets.setdefault((discount.customer_id is not None, discount.product_id), discount)
+
+    resolved = {}
+    for product_id in product_ids:
+        resolved[product_id] = None
+        for key in ((True, product_id), (True, None), (False, product_id), (False, None)):
+            if key in buckets:
+                resolved[product_id] = discount_to_dict(buckets[key])
+                break
+    return resolved
+
+def calculate_discounted_price(base_price: float, discount: Optional[Dict]) -> float:
+    """Apply a resolved discount (as returned by get_applicable_discount) to a base price."""
+    if not discount:
+        return base_price
+    discount_amount = (discount["percent"] / 100) * base_price
+    if discount["max_discount"] is not None:
+        discount_amount = min(discount_amount, discount["max_discount"])
+    return base_price - discount_amount
+
+def best_discount(base_price: float, *discounts: Optional[Dict]) -> Optional[Dict]:
+    """The discount giving the lowest price on base_price (the first one on a tie), or None."""
+    return min(
+        (discount for discount in discounts if discount),
+        key=lambda discount: calculate_discounted_price(base_price, discount),
+        default=None
+    )
+
+def get_redeemable_discount(db: Session, code: str, user_id: int) -> Dict:
+    """
+    Look up a discount code for redemption by the given user.
+    This is only a fast pre-check; limits are enforced atomically by redeem_discount.
+
+    Raises:
+        ValueError: If the code is unknown, inactive, reserved for another customer or exhausted
+    """
+    discount = get_discount_by_code(db, code)
+    now = datetime.utcnow()
+    if not discount or discount.status != DiscountStatus.ACTIVE.value:
+        raise ValueError("Invalid or inactive discount code")
+    if (discount.starts_at and discount.starts_at > now) or (discount.ends_at and discount.ends_at <= now):
+        raise ValueError("Invalid or inactive discount code")
+    if discount.customer_id is not None and discount.customer_id != user_id:
+        raise ValueError("This discount code is not available for this user")
+    if discount.usage_limit is not None and discount.usage_count >= discount.usage_limit:
+        raise ValueError("Discount code has reached its usage limit")
+    return discount_to_dict(discount)
+
+def _ensure_discount_usage_row(db: Session, discount_id: int, user_id: int):
+    """Create the per-customer usage counter if it does not exist yet (INSERT IGNORE)."""
+    values = {"discount_id": discount_id, "user_id": user_id, "uses": 0}
+    if db.get_bind().dialect.name == "sqlite":
+        stmt = sqlite.insert(DiscountUsage).values(values).on_conflict_do_nothing()
+    else:
+        stmt = mysql.insert(DiscountUsage).values(values).prefix_with("IGNORE")
+    db.execute(stmt)
+
+def redeem_discount(db: Session, discount_id: int, user_id: int):
+    """
+    Consume one use of a discount code for the user.
+    Limits are enforced with conditional UPDATEs, so concurrent orders can never exceed
+    usage_limit or per_customer_limit. Must run inside the order transaction; the caller
+    commits or rolls back.
+
+    Raises:
+        ValueError: If the code is no longer active or a limit has been reached
+    """
+    claimed = db.query(Discount).filter(
+        Discount.id == discount_id,
+        Discount.status == DiscountStatus.ACTIVE.value,
+        in_discount_window(),
+        or_(Discount.usage_limit.is_(None), Discount.usage_count < Discount.usage_limit)
+    ).update({Discount.usage_count: Discount.usage_count + 1}, synchronize_session=False)
+    if claimed != 1:
+        raise ValueError("Discount code has reached its usage limit")
+
+    per_customer_limit = db.query(Discount.per_customer_limit).filter(Discount.id == discount_id).scalar()
+    _ensure_discount_usage_row(db, discount_id, user_id)
+    usage_query = db.query(DiscountUsage).filter(
+        DiscountUsage.discount_id == discount_id,
+        DiscountUsage.user_id == user_id
+    )
+    if per_customer_limit is not None:
+        usage_query = usage_query.filter(DiscountUsage.uses < per_customer_limit)
+    claimed = usage_query.update(
+        {DiscountUsage.uses: DiscountUsage.uses + 1, DiscountUsage.last_used_at: datetime.utcnow()},
+        synchronize_session=False
+    )
+    if claimed != 1:
+        raise ValueError("You have reached the usage limit for this discount code")
+
+    # Mark exhausted codes as used
+    db.query(Discount).filter(
+        Discount.id == discount_id,
+        Discount.usage_limit.isnot(None),
+        Discount.usage_count >= Discount.usage_limit
+    ).update({Discount.status: DiscountStatus.USED.value}, synchronize_session=False)
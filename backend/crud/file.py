@@ -1,3 +1,4 @@
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 from models.file import FileUpload
 from models.user import User
@@ -5,10 +6,8 @@ import schemas.file as file_schemas
 from fastapi import HTTPException, status
 import os
 import uuid
-from typing import List
-from PIL import Image
+from typing import Dict, List
 from io import BytesIO
-import imghdr
 
 def save_file_to_disk(file_path: str, file_content: bytes):
     """Helper function to save file to disk"""
@@ -32,6 +31,9 @@ def optimize_image_content(
     Returns:
         tuple: (optimized_bytes, new_content_type, new_extension)
     """
+    # Imported here so API workers don't load Pillow until an image is uploaded
+    from PIL import Image
+
     try:
         with Image.open(BytesIO(file_content)) as img:
             # Determine output format - use WebP unless it's a PNG with transparency
@@ -83,6 +85,8 @@ def create_file(
     
     # Optimize if it's an image and optimization is enabled
     if optimize_images and content_type.startswith('image/'):
+        import imghdr
+
         try:
             # Verify it's actually an image file
             image_type = imghdr.what(None, h=file_content)
@@ -130,6 +134,33 @@ def get_file(db: Session, file_id: int) -> FileUpload:
         )
     return file
 
+def get_files_by_entries(db: Session, entries: List[str]) -> Dict[str, FileUpload]:
+    """
+    Resolve file references as stored in uploaded_files (download URLs ending in the file id,
+    file ids, or stored filenames and paths) to their FileUpload rows, with one query.
+    Entries matching no file are left out.
+    """
+    ids, filenames = {}, {}
+    for entry in entries:
+        if not isinstance(entry, str) or not entry.strip():
+            continue
+        key = entry.split("?")[0].rstrip("/").rsplit("/", 1)[-1]
+        if key.isdigit():
+            ids[entry] = int(key)
+        else:
+            filenames[entry] = key
+    if not ids and not filenames:
+        return {}
+    files = db.query(FileUpload).filter(or_(
+        FileUpload.id.in_(set(ids.values())),
+        FileUpload.filename.in_(set(filenames.values()))
+    )).all()
+    by_id = {file.id: file for file in files}
+    by_filename = {file.filename: file for file in files}
+    resolved = {entry: by_id[file_id] for entry, file_id in ids.items() if file_id in by_id}
+    resolved.update({entry: by_filename[filename] for entry, filename in filenames.items() if filename in by_filename})
+    return resolved
+
 def get_all_files(db: Session, skip: int = 0, limit: int = 100) -> List[FileUpload]:
     """Get all public files (admin only)"""
     return db.query(FileUpload)\
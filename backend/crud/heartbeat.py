@@ -0,0 +1,14 @@
+from sqlalchemy.orm import Session
+from models.heartbeat import ReplicationHeartbeat
+from datetime import datetime
+
+def write_heartbeat(db: Session) -> datetime:
+    """Refresh the replication heartbeat on the primary; replicas measure their lag against it."""
+    now = datetime.utcnow()
+    updated = db.query(ReplicationHeartbeat).filter(ReplicationHeartbeat.id == 1).update(
+        {ReplicationHeartbeat.beat_at: now}, synchronize_session=False
+    )
+    if not updated:
+        db.add(ReplicationHeartbeat(id=1, beat_at=now))
+    db.commit()
+    return now
@@ -8,7 +8,13 @@ import schemas.order as order_schemas
 from fastapi import HTTPException, status
 from typing import List, Optional
 from datetime import datetime
-from crud.discount import get_applicable_discount  # Import the discount function
+from crud.discount import (  # Import the discount functions
+    get_applicable_discount,
+    calculate_discounted_price,
+    best_discount,
+    get_redeemable_discount,
+    redeem_discount
+)
 
 def is_factor_of_rate(quantity: int, rate: float) -> bool:
     """
@@ -18,20 +24,30 @@ def is_factor_of_rate(quantity: int, rate: float) -> bool:
         return True  # If rate is 0, any quantity is allowed
     return quantity % rate == 0
 
+def discount_applies_to_product(discount: Optional[dict], product_id: int) -> bool:
+    """
+    Check if a resolved discount covers the given product.
+    """
+    return bool(discount) and discount["product_id"] in (None, product_id)
+
 def apply_discount_to_item(
     db: Session,
     product_id: int,
     user_id: int,
-    quantity: int
+    quantity: int,
+    code_discount: Optional[dict] = None
 ) -> tuple:
     """
     Helper function to apply discounts to an order item using get_applicable_discount.
+    For the products a redeemed discount code covers, the better of the code and the automatic
+    discount is applied; the automatic one on a tie.
     
     Args:
         db (Session): Database session
         product_id (int): ID of the product
         user_id (int): ID of the user
         quantity (int): Quantity of the product
+        code_discount (Optional[dict]): Discount code being redeemed with the order
     
     Returns:
         tuple: (discount_id, discounted_price)
@@ -47,18 +63,15 @@ def apply_discount_to_item(
         )
     
     base_price = product.price * quantity
-    discounted_price = base_price
-    discount_id = None
     
     # Use get_applicable_discount from crud.discount
-    discount = get_applicable_discount(db, product_id, user_id)
-    
-    if discount:
-        discount_amount = (discount["percent"] / 100) * base_price
-        if discount["max_discount"] is not None:
-            discount_amount = min(discount_amount, discount["max_discount"])
-        discounted_price = base_price - discount_amount
-        discount_id = discount["id"]
+    discount = best_discount(
+        base_price,
+        get_applicable_discount(db, product_id, user_id),
+        code_discount if discount_applies_to_product(code_discount, product_id) else None
+    )
+    discounted_price = calculate_discounted_price(base_price, discount)
+    discount_id = discount["id"] if discount else None
     
     return discount_id, discounted_price
 
@@ -173,6 +186,7 @@ def create_order(db: Session, order: order_schemas.OrderCreate, user_id: int) ->
     
     Raises:
         HTTPException: If user, product, or stock issues occur
+        ValueError: If the discount code cannot be redeemed
     """
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
@@ -181,6 +195,26 @@ def create_order(db: Session, order: order_schemas.OrderCreate, user_id: int) ->
             detail="User not found"
         )
     
+    code_discount = None
+    if order.discount_code:
+        code_discount = get_redeemable_discount(db, order.discount_code, user_id)
+        if not any(discount_applies_to_product(code_discount, item.product_id) for item in order.items):
+            raise ValueError("Discount code does not apply to any product in this order")
+    
+    try:
+        db_order = _create_order_rows(db, order, user, code_discount)
+    except Exception:
+        db.rollback()
+        raise
+    
+    return get_order(db, db_order.id, user_id)
+
+def _create_order_rows(db: Session, order: order_schemas.OrderCreate, user: User, code_discount: Optional[dict]) -> Order:
+    """
+    Write the order, its items, stock updates and the discount code redemption.
+    Everything is flushed into the current transaction and committed once at the end.
+    """
+    user_id = user.id
     final_amount = 0.0
     
     # Create order with initial total_amount of 0.0
@@ -194,8 +228,7 @@ def create_order(db: Session, order: order_schemas.OrderCreate, user_id: int) ->
         phone_number=order.phone_number or user.phone_number,
     )
     db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
+    db.flush()
     
     used_discount_ids = set()
     
@@ -225,11 +258,12 @@ def create_order(db: Session, order: order_schemas.OrderCreate, user_id: int) ->
             db=db,
             product_id=item.product_id,
             user_id=user_id,
-            quantity=item.quantity
+            quantity=item.quantity,
+            code_discount=code_discount
         )
         
-        # Prevent duplicate discount usage
-        if discount_id and discount_id in used_discount_ids:
+        # Prevent duplicate discount usage (a redeemed code covers every matching item)
+        if discount_id and discount_id in used_discount_ids and not (code_discount and discount_id == code_discount["id"]):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="This discount can only be used once per order"
@@ -251,12 +285,15 @@ def create_order(db: Session, order: order_schemas.OrderCreate, user_id: int) ->
         product.stock -= item.quantity
         final_amount += discounted_price
     
+    # Consume the discount code atomically within the order transaction, unless no item used it
+    if code_discount and code_discount["id"] in used_discount_ids:
+        redeem_discount(db, code_discount["id"], user_id)
+    
     # Update order with final total
     db_order.total_amount = final_amount
     db.commit()
-    db.refresh(db_order)
     
-    return get_order(db, db_order.id, user_id)
+    return db_order
 
 def update_order(db: Session, order_id: int, order: order_schemas.OrderUpdate) -> Optional[Order]:
     """
@@ -0,0 +1,217 @@
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from sqlalchemy import or_
+from sqlalchemy.dialects import mysql, sqlite
+from models.option import Option
+from models.product import Product, ProductPriceTimeline
+from models.category import Category  # noqa: F401 - needed for the Product.category mapper
+from models.user import User  # noqa: F401 - needed for the Discount mappers
+from models.discount import Discount, DiscountStatus
+from crud.discount import get_applicable_discounts, calculate_discounted_price, discount_to_dict
+from typing import Dict, Iterable, Optional, Tuple
+from datetime import datetime
+from collections import defaultdict
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Option holding the time of the last discount change the price timeline hasn't picked up yet
+PRICE_TIMELINE_DIRTY_OPTION = "price_timeline_dirty"
+
+def apply_discount_schedule(db: Session, now: datetime = None) -> Dict[str, int]:
+    """
+    Activate scheduled discounts whose window has started and expire discounts whose
+    window has ended, with one bulk UPDATE each.
+    """
+    now = now or datetime.utcnow()
+    activated = db.query(Discount).filter(
+        Discount.status == DiscountStatus.SCHEDULED.value,
+        Discount.starts_at <= now,
+        or_(Discount.ends_at.is_(None), Discount.ends_at > now)
+    ).update({Discount.status: DiscountStatus.ACTIVE.value}, synchronize_session=False)
+    expired = db.query(Discount).filter(
+        Discount.status.in_([DiscountStatus.ACTIVE.value, DiscountStatus.SCHEDULED.value]),
+        Discount.ends_at <= now
+    ).update({Discount.status: DiscountStatus.EXPIRED.value}, synchronize_session=False)
+    db.commit()
+    if activated or expired:
+        logger.info(f"Discount schedule: {activated} activated, {expired} expired")
+    return {"activated": activated, "expired": expired}
+
+def _covers(discount: Discount, moment: datetime) -> bool:
+    """Check if a discount is in effect at the given moment according to its status and window."""
+    if discount.status == DiscountStatus.SCHEDULED.value and not discount.starts_at:
+        return False
+    if discount.starts_at and discount.starts_at > moment:
+        return False
+    if discount.ends_at and discount.ends_at <= moment:
+        return False
+    return True
+
+def _build_timeline(product_id: int, price: float, candidates: list, now: datetime) -> list:
+    """Compute the [valid_from, valid_until) price intervals of one product starting at now."""
+    points = {now}
+    for discount in candidates:
+        for bound in (discount.starts_at, discount.ends_at):
+            if bound and bound > now:
+                points.add(bound)
+    points = sorted(points)
+
+    rows = []
+    for index, start in enumerate(points):
+        end = points[index + 1] if index + 1 < len(points) else None
+        # Candidates are ordered product-specific first, then general, each by id
+        chosen = next((d for d in candidates if _covers(d, start)), None)
+        discount_id = chosen.id if chosen else None
+        if rows and rows[-1]["discount_id"] == discount_id:
+            rows[-1]["valid_until"] = end
+            continue
+        rows.append({
+            "product_id": product_id,
+            "valid_from": start,
+            "valid_until": end,
+            "price": calculate_discounted_price(price, discount_to_dict(chosen) if chosen else None),
+            "discount_id": discount_id
+        })
+    return rows
+
+def rebuild_price_timeline(db: Session, product_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute the effective price timeline for the given products (all products if None).
+    Only automatic discounts without a customer are precomputed; customer-specific discounts
+    are still resolved per request.
+    Returns the number of timeline rows written.
+    """
+    now = datetime.utcnow().replace(microsecond=0)
+    product_query = db.query(Product.id, Product.price)
+    discount_query = db.query(Discount).filter(
+        Discount.code.is_(None),
+        Discount.customer_id.is_(None),
+        Discount.status.in_([DiscountStatus.ACTIVE.value, DiscountStatus.SCHEDULED.value]),
+        or_(Discount.ends_at.is_(None), Discount.ends_at > now)
+    )
+    if product_ids is not None:
+        product_ids = set(product_ids)
+        if not product_ids:
+            return 0
+        product_query = product_query.filter(Product.id.in_(product_ids))
+        discount_query = discount_query.filter(
+            or_(Discount.product_id.in_(product_ids), Discount.product_id.is_(None))
+        )
+
+    general = []
+    by_product = defaultdict(list)
+    for discount in discount_query.order_by(Discount.id):
+        if discount.product_id is None:
+            general.append(discount)
+        else:
+            by_product[discount.product_id].append(discount)
+
+    rows = []
+    for product in product_query:
+        if product.price is None:
+            continue
+        rows.extend(_build_timeline(product.id, product.price, by_product[product.id] + general, now))
+
+    try:
+        delete_query = db.query(ProductPriceTimeline)
+        if product_ids is not None:
+            delete_query = delete_query.filter(ProductPriceTimeline.product_id.in_(product_ids))
+        delete_query.delete(synchronize_session=False)
+        if rows:
+            db.bulk_insert_mappings(ProductPriceTimeline, rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(rows)
+
+def rebuild_price_timeline_task(product_ids: Optional[Iterable[int]] = None):
+    """Background-task wrapper of rebuild_price_timeline using its own session."""
+    db = SessionLocal()
+    try:
+        rebuild_price_timeline(db, product_ids)
+    except Exception as e:
+        logger.error(f"Error rebuilding price timeline: {e}")
+    finally:
+        db.close()
+
+def mark_price_timeline_dirty(db: Session):
+    """
+    Flag the whole price timeline for a rebuild by the scheduler (see rebuild_dirty_price_timeline),
+    so discount changes never rebuild the catalog inside a request.
+    """
+    marked_at = datetime.utcnow().isoformat()
+    values = {"option_name": PRICE_TIMELINE_DIRTY_OPTION, "option_value": marked_at}
+    if db.get_bind().dialect.name == "sqlite":
+        stmt = sqlite.insert(Option).values(values).on_conflict_do_nothing()
+    else:
+        stmt = mysql.insert(Option).values(values).prefix_with("IGNORE")
+    db.execute(stmt)
+    db.query(Option).filter(Option.option_name == PRICE_TIMELINE_DIRTY_OPTION).update(
+        {Option.option_value: marked_at}, synchronize_session=False
+    )
+    db.commit()
+
+def rebuild_dirty_price_timeline(db: Session) -> int:
+    """
+    Rebuild the whole price timeline if it was flagged by mark_price_timeline_dirty, once for all
+    the changes flagged since the last run. Returns the number of timeline rows written.
+    """
+    marked_at = db.query(Option.option_value).filter(Option.option_name == PRICE_TIMELINE_DIRTY_OPTION).scalar()
+    if marked_at is None:
+        return 0
+    rows = rebuild_price_timeline(db)
+    # Changes flagged during the rebuild updated the value and keep the flag for the next run
+    db.query(Option).filter(
+        Option.option_name == PRICE_TIMELINE_DIRTY_OPTION,
+        Option.option_value == marked_at
+    ).delete(synchronize_session=False)
+    db.commit()
+    return rows
+
+def get_current_prices(db: Session, product_ids: Iterable[int]) -> Dict[int, Tuple[float, Optional[Dict]]]:
+    """
+    Read the precomputed effective price and discount of the given products at the current time
+    with one indexed query. Products without timeline rows are missing from the result.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    now = datetime.utcnow()
+    rows = (
+        db.query(ProductPriceTimeline.product_id, ProductPriceTimeline.price, Discount)
+        .outerjoin(Discount, Discount.id == ProductPriceTimeline.discount_id)
+        .filter(
+            ProductPriceTimeline.product_id.in_(product_ids),
+            ProductPriceTimeline.valid_from <= now,
+            or_(ProductPriceTimeline.valid_until.is_(None), ProductPriceTimeline.valid_until > now)
+        )
+        .all()
+    )
+    return {
+        row.product_id: (row.price, discount_to_dict(row.Discount) if row.Discount else None)
+        for row in rows
+    }
+
+def attach_pricing(db: Session, products: list, user_id: int = None) -> list:
+    """
+    Set `discount` and `effective_price` on product rows.
+    Anonymous requests read the precomputed timeline; signed-in users (who may have
+    customer-specific discounts) and products missing from the timeline use one bulk
+    discount lookup.
+    """
+    if not products:
+        return products
+    prices = {} if user_id else get_current_prices(db, [p.id for p in products])
+    missing = [p.id for p in products if p.id not in prices]
+    discounts = get_applicable_discounts(db, missing, user_id) if missing else {}
+    for product in products:
+        if product.id in prices:
+            product.effective_price, product.discount = prices[product.id]
+        else:
+            product.discount = discounts.get(product.id)
+            product.effective_price = (
+                calculate_discounted_price(product.price, product.discount) if product.price is not None else None
+            )
+    return products
@@ -4,7 +4,7 @@ from models.category import Category
 from models.discount import Discount, DiscountStatus
 import schemas.product as product_schemas
 from fastapi import HTTPException
-from crud.discount import get_applicable_discount  # New import
+from crud.pricing import attach_pricing
 
 def create_product(db: Session, product: product_schemas.ProductCreate, owner_id: int):
     if not db.query(Category).filter(Category.id == product.category_id).first():
@@ -18,27 +18,39 @@ def create_product(db: Session, product: product_schemas.ProductCreate, owner_id
 
 def get_product(db: Session, product_id: int, user_id: int = None):
     """
-    Retrieve a product by its ID, including the most specific applicable ACTIVE discount.
+    Retrieve a product by its ID, including the most specific applicable ACTIVE discount
+    and the resulting effective price.
     """
     product = db.query(Product).options(joinedload(Product.category)).filter(Product.id == product_id).first()
     if not product:
         return None
 
-    applicable_discount = get_applicable_discount(db, product.id, user_id)
-    product.discount = applicable_discount  # Already in correct dictionary format or None
+    attach_pricing(db, [product], user_id)  # Sets discount (dictionary or None) and effective_price
 
     return product
 
+def get_product_stock(db: Session, product_id: int):
+    """
+    Return only the stock of a product (None if the product does not exist).
+    Used by the cart paths, which don't need the category or discount lookups of get_product.
+    """
+    row = db.query(Product.stock).filter(Product.id == product_id).first()
+    return row.stock if row else None
+
+def get_product_stocks(db: Session, product_ids):
+    """Return a {product_id: stock} mapping for the given products with a single query."""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    return {row.id: row.stock for row in db.query(Product.id, Product.stock).filter(Product.id.in_(product_ids))}
+
 def get_products(db: Session, skip: int = 0, limit: int = 100, user_id: int = None):
     """
     Retrieve a list of products, including the most specific applicable ACTIVE discount.
     """
     products = db.query(Product).options(joinedload(Product.category)).offset(skip).limit(limit).all()
 
-    for product in products:
-        product.discount = get_applicable_discount(db, product.id, user_id)  # Already in correct format
-
-    return products
+    return attach_pricing(db, products, user_id)
 
 def update_product(db: Session, product_id: int, product: product_schemas.ProductUpdate):
     db_product = db.query(Product).filter(Product.id == product_id).first()
@@ -75,7 +87,4 @@ def search_products_by_name(db: Session, query: str, skip: int = 0, limit: int =
         Product.name.ilike(f"%{query}%")  # Case-insensitive search
     ).options(joinedload(Product.category)).offset(skip).limit(limit).all()
 
-    for product in products:
-        product.discount = get_applicable_discount(db, product.id, user_id)  # Already in correct format
-
-    return products
\ No newline at end of file
+    return attach_pricing(db, products, user_id)
\ No newline at end of file
@@ -1,13 +1,84 @@
-from sqlalchemy.orm import Session, joinedload
-from models.workflow import Workflow, WorkflowStep, WorkflowStepTemplate
+from sqlalchemy import DateTime, Integer, case, exists, func, literal, select, union_all
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload, undefer, with_expression
+from sqlalchemy.sql.expression import FunctionElement
+from models.workflow import (
+    Workflow, WorkflowStep, WorkflowStepTemplate, WorkflowStepEscalation, ParticipantRole,
+    workflow_viewers, workflow_responsible_users, workflow_step_responsible_users, workflow_participants,
+)
 from models.user import User, RoleEnum
 import schemas.workflow as workflow_schemas
+import crud.workflow_engine as workflow_engine
+import crud.audit as audit
+from crud.file import get_files_by_entries
 from datetime import datetime
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException
+from typing import Dict, List, Optional, Tuple
 import logging
+import os
+import time
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+
+# Seconds a workflow subtree is served from the worker's cache; changes made through this worker drop it at once
+SUBTREE_CACHE_SECONDS = float(os.getenv("WORKFLOW_SUBTREE_CACHE_SECONDS", "30"))
+# Subtrees cached per worker; the oldest is dropped first
+SUBTREE_CACHE_SIZE = int(os.getenv("WORKFLOW_SUBTREE_CACHE_SIZE", "256"))
+
+# (root workflow id, max depth) -> (cached at, ids of the workflows in the subtree, their rows)
+_subtrees: Dict[Tuple[int, int], Tuple[float, frozenset, List[dict]]] = {}
+
+def participant_rows(workflow_ids: list = None):
+    """SELECT of (workflow_id, user_id, role) for everyone taking part in the workflows (default: all)."""
+    def role(name: ParticipantRole):
+        return literal(name.value)
+    step_users = workflow_step_responsible_users
+    queries = [
+        (select(Workflow.id, Workflow.creator_id, role(ParticipantRole.creator)), Workflow.id),
+        (select(Workflow.id, Workflow.approver_id, role(ParticipantRole.approver)).where(Workflow.approver_id.isnot(None)), Workflow.id),
+        (select(workflow_viewers.c.workflow_id, workflow_viewers.c.user_id, role(ParticipantRole.viewer)), workflow_viewers.c.workflow_id),
+        (
+            select(workflow_responsible_users.c.workflow_id, workflow_responsible_users.c.user_id, role(ParticipantRole.responsible)),
+            workflow_responsible_users.c.workflow_id,
+        ),
+        (
+            select(WorkflowStep.workflow_id, step_users.c.user_id, role(ParticipantRole.step_responsible))
+            .join(step_users, step_users.c.workflow_step_id == WorkflowStep.id)
+            .distinct(),
+            WorkflowStep.workflow_id,
+        ),
+    ]
+    if workflow_ids is not None:
+        queries = [(query.where(column.in_(workflow_ids)), column) for query, column in queries]
+    return union_all(*(query for query, _ in queries))
+
+def sync_participants(db: Session, workflow_ids: list):
+    """
+    Rebuild the workflow_participants rows of the given workflows from their current creator, approver,
+    viewers and responsible users. Called by every mutation before its commit, so the index changes in
+    the same transaction.
+    """
+    db.flush()
+    db.execute(workflow_participants.delete().where(workflow_participants.c.workflow_id.in_(workflow_ids)))
+    db.execute(workflow_participants.insert().from_select(["workflow_id", "user_id", "role"], participant_rows(workflow_ids)))
+
+def is_participant(db: Session, workflow_id: int, user_id: int) -> bool:
+    """Single-row lookup on the workflow_participants primary key."""
+    return db.query(workflow_participants.c.workflow_id).filter(
+        workflow_participants.c.workflow_id == workflow_id,
+        workflow_participants.c.user_id == user_id
+    ).first() is not None
+
+def workflow_snapshot(db_workflow: Workflow) -> dict:
+    return audit.snapshot(
+        db_workflow,
+        viewer_ids=[user.id for user in db_workflow.viewers],
+        responsible_user_ids=[user.id for user in db_workflow.responsible_users]
+    )
+
+def step_snapshot(db_step: WorkflowStep) -> dict:
+    return audit.snapshot(db_step, responsible_user_ids=[user.id for user in db_step.responsible_users])
 def create_workflow(db: Session, workflow: workflow_schemas.WorkflowCreate, creator_id: int):
     """
     Create a standard workflow.
@@ -25,7 +96,11 @@ def create_workflow(db: Session, workflow: workflow_schemas.WorkflowCreate, crea
         responsible_users = db.query(User).filter(User.id.in_(workflow.responsible_user_ids)).all()
         db_workflow.responsible_users = responsible_users
     db.add(db_workflow)
+    db.flush()
+    audit.record(db, db_workflow.id, "workflow", db_workflow.id, "create", workflow_snapshot(db_workflow), user_id=creator_id)
+    sync_participants(db, [db_workflow.id])
     db.commit()
+    invalidate_subtrees(db_workflow.parent_workflow_id)
     db.refresh(db_workflow)
     return db_workflow
 
@@ -59,7 +134,8 @@ def create_workflow_from_template(db: Session, workflow: workflow_schemas.Workfl
         db_workflow.responsible_users = responsible_users
     
     db.add(db_workflow)
-    db.commit()
+    db.flush()
+    audit.record(db, db_workflow.id, "workflow", db_workflow.id, "create", workflow_snapshot(db_workflow), user_id=creator_id)
     
     # Copy template steps
     template_steps = db.query(WorkflowStepTemplate).filter(
@@ -68,60 +144,533 @@ def create_workflow_from_template(db: Session, workflow: workflow_schemas.Workfl
     
     step_overrides = {override.get('step_number'): override for override in workflow.step_overrides or []}
     
+    db_steps = []
     for template_step in template_steps:
         override = step_overrides.get(template_step.step_number, {})
-        db_step = WorkflowStep(
-            workflow_id=db_workflow.id,
-            step_number=template_step.step_number,
-            description=template_step.description,
-            is_mandatory=template_step.is_mandatory,
-            template_step_id=template_step.id,
-            expected_duration=override.get('expected_duration', template_step.default_expected_duration),
-            required_documents=override.get('required_documents', template_step.default_required_documents),
-            output=override.get('output', template_step.default_output),
-            escalation_contact_id=override.get('escalation_contact_id'),
-            status="Pending",
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow()
-        )
+        db_step = WorkflowStep(**template_step_values(template_step, override, db_workflow.id, datetime.utcnow()))
         if workflow.responsible_user_ids:
             db_step.responsible_users = db_workflow.responsible_users
         db.add(db_step)
+        db_steps.append(db_step)
     
+    sync_participants(db, [db_workflow.id])
+    for db_step in db_steps:
+        audit.record(db, db_workflow.id, "step", db_step.id, "create", step_snapshot(db_step), user_id=creator_id)
     db.commit()
+    invalidate_subtrees(db_workflow.parent_workflow_id)
     db.refresh(db_workflow)
     return db_workflow
 
+def template_step_values(template_step: WorkflowStepTemplate, override: dict, workflow_id: int, now: datetime) -> dict:
+    """Column values of the step a workflow gets from a template step, with its overrides applied."""
+    return dict(
+        workflow_id=workflow_id,
+        step_number=template_step.step_number,
+        description=template_step.description,
+        is_mandatory=template_step.is_mandatory,
+        template_step_id=template_step.id,
+        expected_duration=override.get('expected_duration', template_step.default_expected_duration),
+        required_documents=override.get('required_documents', template_step.default_required_documents),
+        output=override.get('output', template_step.default_output),
+        escalation_contact_id=override.get('escalation_contact_id'),
+        status="Pending",
+        created_at=now,
+        updated_at=now
+    )
+
+def create_workflows_from_template(db: Session, bulk: workflow_schemas.WorkflowBulkCreateFromTemplate, creator_id: int):
+    """
+    Create many workflows from one template, committing every batch_size workflows.
+
+    The template steps and the referenced users are read once. Per batch, the workflow rows are
+    flushed to get their ids, then the steps, their responsible users, viewers, responsible
+    users and audit entries go in with one executemany INSERT per table, and the participants
+    with one INSERT ... SELECT. Unknown user ids are skipped, as in create_workflow_from_template.
+    Returns the ids of the created workflows, or None if the template does not exist.
+    """
+    template_workflow = db.query(Workflow).filter(
+        Workflow.id == bulk.template_workflow_id,
+        Workflow.is_template == True
+    ).first()
+    if not template_workflow:
+        return None
+    template_steps = db.query(WorkflowStepTemplate).filter(
+        WorkflowStepTemplate.workflow_id == bulk.template_workflow_id
+    ).order_by(WorkflowStepTemplate.step_number).all()
+
+    requested_ids = {
+        user_id for instance in bulk.workflows
+        for user_id in (instance.viewer_ids or []) + (instance.responsible_user_ids or [])
+    }
+    known_ids = {row.id for row in db.query(User.id).filter(User.id.in_(requested_ids))} if requested_ids else set()
+
+    created_ids = []
+    for start in range(0, len(bulk.workflows), bulk.batch_size):
+        batch = bulk.workflows[start:start + bulk.batch_size]
+        now = datetime.utcnow()
+        try:
+            db_workflows = [
+                Workflow(
+                    title=instance.title,
+                    status=instance.status,
+                    approver_id=instance.approver_id,
+                    is_template=False,
+                    parent_workflow_id=instance.parent_workflow_id,
+                    uploaded_files=instance.uploaded_files,
+                    creator_id=creator_id,
+                    created_at=now,
+                    updated_at=now
+                )
+                for instance in batch
+            ]
+            db.add_all(db_workflows)
+            db.flush()
+            workflow_ids = [db_workflow.id for db_workflow in db_workflows]
+
+            viewer_rows, responsible_rows, step_rows, step_users = [], [], [], {}
+            for workflow_id, instance in zip(workflow_ids, batch):
+                responsible_ids = [user_id for user_id in dict.fromkeys(instance.responsible_user_ids or []) if user_id in known_ids]
+                viewer_rows.extend(
+                    {"workflow_id": workflow_id, "user_id": user_id}
+                    for user_id in dict.fromkeys(instance.viewer_ids or []) if user_id in known_ids
+                )
+                responsible_rows.extend({"workflow_id": workflow_id, "user_id": user_id} for user_id in responsible_ids)
+                if responsible_ids:
+                    step_users[workflow_id] = responsible_ids
+                step_overrides = {override.get('step_number'): override for override in instance.step_overrides or []}
+                for template_step in template_steps:
+                    values = template_step_values(template_step, step_overrides.get(template_step.step_number, {}), workflow_id, now)
+                    step_rows.append(dict(values, is_additional=False, uploaded_files=[], completed_at=None, completed_by=None))
+
+            if viewer_rows:
+                db.execute(workflow_viewers.insert(), viewer_rows)
+            if responsible_rows:
+                db.execute(workflow_responsible_users.insert(), responsible_rows)
+            if step_rows:
+                db.execute(WorkflowStep.__table__.insert(), step_rows)
+            # Each new step is identified by (workflow_id, template_step_id); one query returns their ids
+            step_ids = {
+                (row.workflow_id, row.template_step_id): row.id
+                for row in db.query(WorkflowStep.id, WorkflowStep.workflow_id, WorkflowStep.template_step_id).filter(
+                    WorkflowStep.workflow_id.in_(workflow_ids)
+                )
+            } if step_rows else {}
+            step_user_rows = [
+                {"workflow_step_id": step_id, "user_id": user_id}
+                for (workflow_id, _), step_id in step_ids.items() for user_id in step_users.get(workflow_id, [])
+            ]
+            if step_user_rows:
+                db.execute(workflow_step_responsible_users.insert(), step_user_rows)
+            sync_participants(db, workflow_ids)
+
+            entries = [
+                {
+                    "workflow_id": workflow_id, "entity": "workflow", "entity_id": workflow_id, "action": "create",
+                    "changes": dict(
+                        audit.snapshot(db_workflow),
+                        viewer_ids=[row["user_id"] for row in viewer_rows if row["workflow_id"] == workflow_id],
+                        responsible_user_ids=step_users.get(workflow_id, []),
+                    ),
+                }
+                for workflow_id, db_workflow in zip(workflow_ids, db_workflows)
+            ]
+            for row in step_rows:
+                step_id = step_ids[(row["workflow_id"], row["template_step_id"])]
+                changes = {key: audit.jsonable(value) for key, value in row.items() if key not in audit.IGNORED_FIELDS}
+                changes.update(id=step_id, responsible_user_ids=step_users.get(row["workflow_id"], []))
+                entries.append({"workflow_id": row["workflow_id"], "entity": "step", "entity_id": step_id, "action": "create", "changes": changes})
+            audit.record_many(db, entries, user_id=creator_id, now=now)
+            db.commit()
+            invalidate_subtrees(*(instance.parent_workflow_id for instance in batch))
+        except Exception:
+            db.rollback()
+            raise
+        # The workflow objects are not needed after their batch
+        for db_workflow in db_workflows:
+            db.expunge(db_workflow)
+        created_ids.extend(workflow_ids)
+        logger.info(f"Created {len(created_ids)}/{len(bulk.workflows)} workflows from template {bulk.template_workflow_id}")
+    return created_ids
+
+def workflow_relations():
+    """
+    Loader options for the workflow relationships: one SELECT ... WHERE id IN (...) per relationship
+    for all the workflows loaded, instead of joining them all into one cartesian result.
+    """
+    return [
+        selectinload(Workflow.steps).selectinload(WorkflowStep.responsible_users),
+        selectinload(Workflow.template_steps),
+        selectinload(Workflow.viewers),
+        selectinload(Workflow.responsible_users),
+        selectinload(Workflow.creator),
+        selectinload(Workflow.approver),
+    ]
+
 def get_workflow(db: Session, workflow_id: int):
     return (
         db.query(Workflow)
-        .options(
-            joinedload(Workflow.steps).joinedload(WorkflowStep.responsible_users),
-            joinedload(Workflow.template_steps),
-            joinedload(Workflow.viewers),
-            joinedload(Workflow.responsible_users),
-            joinedload(Workflow.creator),
-            joinedload(Workflow.approver)
-        )
+        .options(undefer(Workflow.uploaded_files), *workflow_relations())
         .filter(Workflow.id == workflow_id)
         .first()
     )
 
-def get_workflows(db: Session, skip: int = 0, limit: int = 100, creator_id: int = None):
-    query = db.query(Workflow).options(
-        joinedload(Workflow.steps),
-        joinedload(Workflow.template_steps),
-        joinedload(Workflow.viewers),
-        joinedload(Workflow.responsible_users)
+def attach_files(db: Session, items: list):
+    """
+    Set .files on workflows or steps for the detail schemas: their uploaded_files entries
+    resolved to FileUpload rows, with one query for all the items.
+    """
+    resolved = get_files_by_entries(db, [entry for item in items for entry in item.uploaded_files or []])
+    for item in items:
+        item.files = [resolved[entry] for entry in item.uploaded_files or [] if entry in resolved]
+        item.uploaded_files_count = len(item.uploaded_files or [])
+
+class json_length(FunctionElement):
+    """Number of elements of a JSON array, compiled for each dialect."""
+    type = Integer()
+    name = "json_length"
+    inherit_cache = True
+
+@compiles(json_length)
+def _json_length(element, compiler, **kw):
+    return f"json_array_length({compiler.process(element.clauses, **kw)})"
+
+@compiles(json_length, "mysql")
+def _json_length_mysql(element, compiler, **kw):
+    return f"JSON_LENGTH({compiler.process(element.clauses, **kw)})"
+
+def uploaded_files_count(model):
+    """Loader option filling model.uploaded_files_count in SQL, without loading the deferred uploaded_files."""
+    return with_expression(model.uploaded_files_count, func.coalesce(json_length(model.uploaded_files), 0))
+
+def participant_filter(user_id: int):
+    """Workflows the user takes part in (in any role), through the (user_id, workflow_id) participants index."""
+    return Workflow.id.in_(
+        select(workflow_participants.c.workflow_id).where(workflow_participants.c.user_id == user_id)
     )
+
+def get_workflows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    creator_id: int = None,
+    participant_id: int = None,
+    with_relations: bool = False
+):
+    """
+    List workflows ordered by id. The listing schema (WorkflowListItem) has no nested objects, so
+    relationships are only loaded with with_relations=True, in batches (see workflow_relations).
+    uploaded_files is deferred and not loaded; uploaded_files_count is computed in SQL instead.
+    """
+    query = db.query(Workflow).options(uploaded_files_count(Workflow))
+    if with_relations:
+        query = query.options(*workflow_relations())
     if creator_id:
         query = query.filter(Workflow.creator_id == creator_id)
-    return query.offset(skip).limit(limit).all()
+    if participant_id:
+        query = query.filter(participant_filter(participant_id))
+    return query.order_by(Workflow.id).offset(skip).limit(limit).all()
+
+class add_days(FunctionElement):
+    """A datetime plus a number of days, compiled for each dialect."""
+    type = DateTime()
+    name = "add_days"
+    inherit_cache = True
 
-def update_workflow(db: Session, workflow_id: int, workflow: workflow_schemas.WorkflowUpdate):
-    db_workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
+@compiles(add_days)
+def _add_days(element, compiler, **kw):
+    moment, days = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"({moment} + {days} * INTERVAL '1 day')"
+
+@compiles(add_days, "mysql")
+def _add_days_mysql(element, compiler, **kw):
+    moment, days = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"DATE_ADD({moment}, INTERVAL {days} DAY)"
+
+@compiles(add_days, "sqlite")
+def _add_days_sqlite(element, compiler, **kw):
+    moment, days = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"datetime({moment}, '+' || {days} || ' days')"
+
+def step_due_at(step=WorkflowStep):
+    """When a step is due: created_at plus expected_duration days (NULL without a duration)."""
+    return add_days(step.created_at, step.expected_duration)
+
+OPEN_STEP_STATUSES = workflow_engine.OPEN_STATUSES
+
+def refresh_step_deadlines(db: Session, now: datetime = None, batch_size: int = 500) -> dict:
+    """
+    Scheduler job: fill due_at on open steps that lack it, then escalate the open steps past
+    their due_at, batch_size at a time. The fill is one UPDATE over the open steps without a
+    due_at, through the (status, due_at) index; the overdue lookup is one range scan of the
+    (escalated_at, due_at) index. Each batch records its escalation events with one executemany
+    INSERT, marks the steps with one UPDATE and commits. Steps already overdue when due dates
+    were introduced were marked escalated by migration 0007, so they are not escalated here.
+    """
+    now = now or datetime.utcnow()
+    filled = db.query(WorkflowStep).filter(
+        WorkflowStep.status.in_(OPEN_STEP_STATUSES),
+        WorkflowStep.due_at.is_(None),
+        WorkflowStep.expected_duration.isnot(None)
+    ).update({WorkflowStep.due_at: step_due_at()}, synchronize_session=False)
+    db.commit()
+
+    escalated = 0
+    while True:
+        overdue = db.query(
+            WorkflowStep.id, WorkflowStep.workflow_id, WorkflowStep.escalation_contact_id, WorkflowStep.due_at
+        ).filter(
+            WorkflowStep.status.in_(OPEN_STEP_STATUSES),
+            WorkflowStep.due_at < now,
+            WorkflowStep.escalated_at.is_(None)
+        ).limit(batch_size).all()
+        if not overdue:
+            break
+        db.execute(WorkflowStepEscalation.__table__.insert(), [
+            {
+                "workflow_step_id": step.id, "workflow_id": step.workflow_id,
+                "escalation_contact_id": step.escalation_contact_id, "due_at": step.due_at, "created_at": now,
+            }
+            for step in overdue
+        ])
+        db.query(WorkflowStep).filter(WorkflowStep.id.in_([step.id for step in overdue])).update(
+            {WorkflowStep.escalated_at: now}, synchronize_session=False
+        )
+        db.commit()
+        escalated += len(overdue)
+        if len(overdue) < batch_size:
+            break
+    if filled or escalated:
+        logger.info(f"Step deadlines: {filled} due dates set, {escalated} overdue steps escalated")
+    return {"filled": filled, "escalated": escalated}
+
+def get_overdue_steps(db: Session, limit: int = 100, escalation_contact_id: int = None, visible_to: int = None, now: datetime = None):
+    """
+    Open steps past their due_at, most overdue first, with their workflow title.
+    A range scan of the (status, due_at) index; visible_to restricts them to that user's workflows.
+    """
+    now = now or datetime.utcnow()
+    query = db.query(
+        WorkflowStep.id,
+        WorkflowStep.workflow_id,
+        Workflow.title.label("workflow_title"),
+        WorkflowStep.step_number,
+        WorkflowStep.description,
+        WorkflowStep.status,
+        WorkflowStep.escalation_contact_id,
+        WorkflowStep.due_at,
+        WorkflowStep.escalated_at,
+    ).join(Workflow, Workflow.id == WorkflowStep.workflow_id).filter(
+        WorkflowStep.status.in_(OPEN_STEP_STATUSES),
+        WorkflowStep.due_at < now
+    )
+    if escalation_contact_id:
+        query = query.filter(WorkflowStep.escalation_contact_id == escalation_contact_id)
+    if visible_to:
+        query = query.filter(participant_filter(visible_to))
+    return [dict(row._mapping) for row in query.order_by(WorkflowStep.due_at, WorkflowStep.id).limit(limit)]
+
+def get_workflow_summaries(
+    db: Session,
+    after_id: int = None,
+    limit: int = 50,
+    status: str = None,
+    creator_id: int = None,
+    approver_id: int = None,
+    participant_id: int = None,
+    visible_to: int = None,
+    is_template: bool = False,
+    now: datetime = None
+) -> dict:
+    """
+    Dashboard summaries of the workflows after after_id (keyset pagination by id).
+    Step counts, overdue steps and the next due step come from aggregate SQL over the page,
+    assignees (the workflow's responsible users) from one batched query: three queries per page.
+    visible_to restricts the page to workflows that user takes part in.
+    """
+    now = now or datetime.utcnow()
+    page = db.query(Workflow.id).filter(Workflow.is_template == is_template)
+    if after_id:
+        page = page.filter(Workflow.id > after_id)
+    if status:
+        page = page.filter(Workflow.status == status)
+    if creator_id:
+        page = page.filter(Workflow.creator_id == creator_id)
+    if approver_id:
+        page = page.filter(Workflow.approver_id == approver_id)
+    for user_id in (participant_id, visible_to):
+        if user_id:
+            page = page.filter(participant_filter(user_id))
+    # One extra row tells whether there is a next page
+    page = page.order_by(Workflow.id).limit(limit + 1).subquery()
+
+    completed = func.coalesce(WorkflowStep.status, "") == "Completed"
+    next_step = aliased(WorkflowStep)
+    next_step_id = (
+        select(next_step.id)
+        .where(next_step.workflow_id == Workflow.id, func.coalesce(next_step.status, "") != "Completed")
+        .order_by(next_step.due_at.is_(None), next_step.due_at, next_step.step_number)
+        .limit(1)
+        .correlate(Workflow)
+        .scalar_subquery()
+    )
+    rows = (
+        db.query(
+            Workflow.id,
+            Workflow.title,
+            Workflow.status,
+            Workflow.creator_id,
+            Workflow.approver_id,
+            Workflow.updated_at,
+            func.count(WorkflowStep.id).label("steps_total"),
+            func.coalesce(func.sum(case((completed, 1), else_=0)), 0).label("steps_completed"),
+            func.coalesce(func.sum(case((~completed & (WorkflowStep.due_at < now), 1), else_=0)), 0).label("steps_overdue"),
+            next_step_id.label("next_step_id"),
+        )
+        .join(page, page.c.id == Workflow.id)
+        .outerjoin(WorkflowStep, WorkflowStep.workflow_id == Workflow.id)
+        .group_by(Workflow.id)
+        .order_by(Workflow.id)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    workflow_ids = [row.id for row in rows]
+
+    next_steps = {}
+    step_ids = [row.next_step_id for row in rows if row.next_step_id]
+    if step_ids:
+        for step in db.query(
+            WorkflowStep.id, WorkflowStep.step_number, WorkflowStep.description, WorkflowStep.status, WorkflowStep.due_at,
+        ).filter(WorkflowStep.id.in_(step_ids)):
+            next_steps[step.id] = dict(step._mapping)
+
+    assignees = {workflow_id: [] for workflow_id in workflow_ids}
+    if workflow_ids:
+        for workflow_id, user_id, username in (
+            db.query(workflow_responsible_users.c.workflow_id, User.id, User.username)
+            .join(User, User.id == workflow_responsible_users.c.user_id)
+            .filter(workflow_responsible_users.c.workflow_id.in_(workflow_ids))
+            .order_by(workflow_responsible_users.c.workflow_id, User.id)
+        ):
+            assignees[workflow_id].append({"id": user_id, "username": username})
+
+    items = []
+    for row in rows:
+        item = dict(row._mapping)
+        item["progress"] = round(row.steps_completed * 100 / row.steps_total, 1) if row.steps_total else 0.0
+        item["next_step"] = next_steps.get(item.pop("next_step_id"))
+        item["assignees"] = assignees[row.id]
+        items.append(item)
+    return {"items": items, "next_after_id": workflow_ids[-1] if has_more else None}
+
+def _percent(completed: int, total: int) -> float:
+    return round(completed * 100 / total, 1) if total else 0.0
+
+def _subtree_rows(db: Session, root_id: int, max_depth: int) -> List[dict]:
+    """The workflows of the subtree with their own step counts, parents before children (cached)."""
+    key = (root_id, max_depth)
+    cached = _subtrees.get(key)
+    if cached and time.monotonic() - cached[0] < SUBTREE_CACHE_SECONDS:
+        return cached[2]
+
+    tree = (
+        select(Workflow.id.label("id"), literal(0).label("depth"))
+        .where(Workflow.id == root_id)
+        .cte("workflow_tree", recursive=True)
+    )
+    child = aliased(Workflow)
+    tree = tree.union_all(
+        select(child.id, tree.c.depth + 1).where(child.parent_workflow_id == tree.c.id, tree.c.depth < max_depth)
+    )
+    below = aliased(Workflow)
+    has_children = exists().where(below.parent_workflow_id == Workflow.id)
+    completed = func.coalesce(WorkflowStep.status, "") == "Completed"
+    rows = (
+        db.query(
+            Workflow.id,
+            Workflow.title,
+            Workflow.status,
+            Workflow.is_template,
+            Workflow.parent_workflow_id,
+            tree.c.depth,
+            func.count(WorkflowStep.id).label("steps_total"),
+            func.coalesce(func.sum(case((completed, 1), else_=0)), 0).label("steps_completed"),
+            case((tree.c.depth == max_depth, has_children), else_=False).label("truncated"),
+        )
+        .join(tree, tree.c.id == Workflow.id)
+        .outerjoin(WorkflowStep, WorkflowStep.workflow_id == Workflow.id)
+        .group_by(Workflow.id, tree.c.depth)
+        .order_by(tree.c.depth, Workflow.id)
+        .all()
+    )
+    # Ordered by depth, so parents come before their children; a loop lists a workflow again deeper
+    nodes = {}
+    for row in rows:
+        if row.id not in nodes:
+            nodes[row.id] = dict(row._mapping, truncated=bool(row.truncated))
+    nodes = list(nodes.values())
+
+    if len(_subtrees) >= SUBTREE_CACHE_SIZE:
+        _subtrees.pop(next(iter(_subtrees), None), None)
+    _subtrees[key] = (time.monotonic(), frozenset(node["id"] for node in nodes), nodes)
+    return nodes
+
+def get_workflow_subtree(db: Session, root_id: int, max_depth: int = 5, visible_to: int = None) -> Optional[dict]:
+    """
+    A workflow and its sub-workflows (through parent_workflow_id) down to max_depth levels below it,
+    as nested dicts (see WorkflowTreeNode). The hierarchy and the step counts of every workflow in it
+    come from one query, a recursive CTE joined to the steps; progress is then rolled up from the
+    leaves. A parent link loop ends at max_depth, and each workflow is listed once.
+
+    With visible_to (a user id), only the workflows the user takes part in are listed: any other
+    sub-workflow is left out together with everything below it, and is not counted in the rolled-up
+    progress. Leave it out for admin and staff, who see every workflow.
+
+    The hierarchy is cached per (root, max_depth) for SUBTREE_CACHE_SECONDS, before visibility is
+    applied. Changes made through this module drop the cached trees containing the changed workflows;
+    changes made by other workers show once the entry expires. Returns None if the root does not
+    exist or is not visible.
+    """
+    rows = _subtree_rows(db, root_id, max_depth)
+    if visible_to is not None:
+        visible = set(db.execute(
+            select(workflow_participants.c.workflow_id).where(
+                workflow_participants.c.user_id == visible_to,
+                workflow_participants.c.workflow_id.in_([row["id"] for row in rows])
+            )
+        ).scalars())
+        rows = [row for row in rows if row["id"] in visible]
+
+    nodes = {}
+    for row in rows:
+        # A sub-workflow under a left-out one is left out too
+        if row["id"] != root_id and row["parent_workflow_id"] not in nodes:
+            continue
+        nodes[row["id"]] = dict(row, children=[])
+    if root_id not in nodes:
+        return None
+    for node in nodes.values():
+        if node["id"] != root_id:
+            nodes[node["parent_workflow_id"]]["children"].append(node)
+    for node in reversed(list(nodes.values())):
+        node["progress"] = _percent(node["steps_completed"], node["steps_total"])
+        node["subtree_steps_total"] = node["steps_total"] + sum(sub["subtree_steps_total"] for sub in node["children"])
+        node["subtree_steps_completed"] = node["steps_completed"] + sum(sub["subtree_steps_completed"] for sub in node["children"])
+        node["subtree_progress"] = _percent(node["subtree_steps_completed"], node["subtree_steps_total"])
+    return nodes[root_id]
+
+def invalidate_subtrees(*workflow_ids):
+    """Drop the cached subtrees containing any of the workflows."""
+    changed = {workflow_id for workflow_id in workflow_ids if workflow_id}
+    for key, (_, ids, _) in list(_subtrees.items()):
+        if ids & changed:
+            _subtrees.pop(key, None)
+
+def update_workflow(db: Session, workflow_id: int, workflow: workflow_schemas.WorkflowUpdate, user_id: int = None):
+    db_workflow = db.query(Workflow).options(undefer(Workflow.uploaded_files)).filter(Workflow.id == workflow_id).first()
     if not db_workflow:
         return None
+    before = workflow_snapshot(db_workflow)
     update_data = workflow.dict(exclude_unset=True, exclude={'viewer_ids', 'responsible_user_ids'})
     for key, value in update_data.items():
         setattr(db_workflow, key, value)
@@ -132,24 +681,41 @@ def update_workflow(db: Session, workflow_id: int, workflow: workflow_schemas.Wo
         responsible_users = db.query(User).filter(User.id.in_(workflow.responsible_user_ids)).all()
         db_workflow.responsible_users = responsible_users
         for step in db_workflow.steps:
+            step_before = [user.id for user in step.responsible_users]
             step.responsible_users = responsible_users
+            audit.record(db, workflow_id, "step", step.id, "update", audit.diff(
+                {"responsible_user_ids": step_before}, {"responsible_user_ids": [user.id for user in responsible_users]}
+            ), user_id=user_id)
     db_workflow.updated_at = datetime.utcnow()
+    audit.record(db, workflow_id, "workflow", workflow_id, "update", audit.diff(before, workflow_snapshot(db_workflow)), user_id=user_id)
+    sync_participants(db, [workflow_id])
     db.commit()
+    invalidate_subtrees(workflow_id, db_workflow.parent_workflow_id)
     db.refresh(db_workflow)
     return db_workflow
 
-def delete_workflow(db: Session, workflow_id: int):
-    db_workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
+def delete_workflow(db: Session, workflow_id: int, user_id: int = None):
+    db_workflow = db.query(Workflow).options(undefer(Workflow.uploaded_files)).filter(Workflow.id == workflow_id).first()
     if db_workflow:
+        audit.record(db, workflow_id, "workflow", workflow_id, "delete", workflow_snapshot(db_workflow), user_id=user_id)
+        db.execute(workflow_participants.delete().where(workflow_participants.c.workflow_id == workflow_id))
         db.delete(db_workflow)
         db.commit()
+        invalidate_subtrees(workflow_id)
 
-def create_workflow_step(db: Session, workflow_id: int, step: workflow_schemas.WorkflowStepCreate):
+def create_workflow_step(db: Session, workflow_id: int, step: workflow_schemas.WorkflowStepCreate, user_id: int = None):
     workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
     if not workflow:
         return None
+    status = workflow_engine.normalize_status(step.status)
+    if status is not None:
+        try:
+            workflow_engine.validate_status(status)
+        except workflow_engine.InvalidTransition as e:
+            raise HTTPException(status_code=400, detail=str(e))
     db_step = WorkflowStep(
-        **step.dict(exclude={'responsible_user_ids'}),
+        **step.dict(exclude={'responsible_user_ids', 'is_additional', 'status'}),
+        status=status,
         workflow_id=workflow_id,
         created_at=datetime.utcnow(),
         updated_at=datetime.utcnow(),
@@ -163,7 +729,10 @@ def create_workflow_step(db: Session, workflow_id: int, step: workflow_schemas.W
         db_step.responsible_users = workflow.responsible_users
     
     db.add(db_step)
+    sync_participants(db, [workflow_id])
+    audit.record(db, workflow_id, "step", db_step.id, "create", step_snapshot(db_step), user_id=user_id)
     db.commit()
+    invalidate_subtrees(workflow_id)
     db.refresh(db_step)
     return db_step
 
@@ -171,7 +740,7 @@ def get_workflow_steps(db: Session, workflow_id: int, skip: int = 0, limit: int
     return (
         db.query(WorkflowStep)
         .filter(WorkflowStep.workflow_id == workflow_id)
-        .options(joinedload(WorkflowStep.responsible_users))
+        .options(joinedload(WorkflowStep.responsible_users), uploaded_files_count(WorkflowStep))
         .offset(skip)
         .limit(limit)
         .all()
@@ -180,58 +749,65 @@ def get_workflow_steps(db: Session, workflow_id: int, skip: int = 0, limit: int
 def get_workflow_step(db: Session, step_id: int):
     return (
         db.query(WorkflowStep)
-        .options(joinedload(WorkflowStep.responsible_users), joinedload(WorkflowStep.workflow))
+        .options(undefer(WorkflowStep.uploaded_files), joinedload(WorkflowStep.responsible_users), joinedload(WorkflowStep.workflow))
         .filter(WorkflowStep.id == step_id)
         .first()
     )
 
-def update_workflow_step(db: Session, step_id: int, step: workflow_schemas.WorkflowStepUpdate):
-    db_step = db.query(WorkflowStep).filter(WorkflowStep.id == step_id).first()
+def update_workflow_step(db: Session, step_id: int, step: workflow_schemas.WorkflowStepUpdate, user_id: int = None):
+    db_step = db.query(WorkflowStep).options(undefer(WorkflowStep.uploaded_files)).filter(WorkflowStep.id == step_id).first()
     if not db_step:
         return None
+    before = step_snapshot(db_step)
     update_data = step.dict(exclude_unset=True, exclude={'responsible_user_ids'})
+    status = workflow_engine.normalize_status(update_data.pop('status', None))
+    if 'expected_duration' in update_data and update_data['expected_duration'] != db_step.expected_duration:
+        # The scheduler sets the new deadline
+        db_step.due_at = None
+        db_step.escalated_at = None
     for key, value in update_data.items():
         setattr(db_step, key, value)
     if step.responsible_user_ids is not None:
         responsible_users = db.query(User).filter(User.id.in_(step.responsible_user_ids)).all()
         db_step.responsible_users = responsible_users
     db_step.updated_at = datetime.utcnow()
-    
-    if db_step.status == "Completed" and db_step.template_step_id:
-        template_step = db.query(WorkflowStepTemplate).filter(WorkflowStepTemplate.id == db_step.template_step_id).first()
-        if template_step and template_step.next_step_on_success:
-            next_template_step = db.query(WorkflowStepTemplate).filter(
-                WorkflowStepTemplate.id == template_step.next_step_on_success
-            ).first()
-            if next_template_step:
-                next_step = WorkflowStep(
-                    workflow_id=db_step.workflow_id,
-                    step_number=next_template_step.step_number,
-                    description=next_template_step.description,
-                    is_mandatory=next_template_step.is_mandatory,
-                    template_step_id=next_template_step.id,
-                    expected_duration=next_template_step.default_expected_duration,
-                    required_documents=next_template_step.default_required_documents,
-                    output=next_template_step.default_output,
-                    status="Pending",
-                    created_at=datetime.utcnow(),
-                    updated_at=datetime.utcnow()
-                )
-                if db_step.workflow.responsible_users:
-                    next_step.responsible_users = db_step.workflow.responsible_users
-                db.add(next_step)
-    
+
+    if status is not None and status != workflow_engine.normalize_status(db_step.status):
+        try:
+            workflow_engine.transition(db, db_step, status, user_id=user_id)
+        except workflow_engine.InvalidTransition as e:
+            db.rollback()
+            raise HTTPException(status_code=400, detail=str(e))
+
+    audit.record(db, db_step.workflow_id, "step", step_id, "update", audit.diff(before, step_snapshot(db_step)), user_id=user_id)
+    sync_participants(db, [db_step.workflow_id])
     db.commit()
+    invalidate_subtrees(db_step.workflow_id)
     db.refresh(db_step)
     return db_step
 
-def delete_workflow_step(db: Session, step_id: int):
-    db_step = db.query(WorkflowStep).filter(WorkflowStep.id == step_id).first()
+def delete_workflow_step(db: Session, step_id: int, user_id: int = None):
+    db_step = db.query(WorkflowStep).options(undefer(WorkflowStep.uploaded_files)).filter(WorkflowStep.id == step_id).first()
     if db_step:
+        audit.record(db, db_step.workflow_id, "step", step_id, "delete", step_snapshot(db_step), user_id=user_id)
         db.delete(db_step)
+        sync_participants(db, [db_step.workflow_id])
         db.commit()
+        invalidate_subtrees(db_step.workflow_id)
+
+def check_template_graph(db: Session, template_id: int):
+    """
+    Validate the step graph of a template as it stands in this transaction (one query);
+    rolls back and raises a 400 listing the problems if a link dangles or success links loop.
+    """
+    db.flush()
+    graph = workflow_engine.load_template_graph(db, template_id)
+    if graph.errors:
+        db.rollback()
+        logger.error(f"Invalid step graph for template {template_id}: {'; '.join(graph.errors)}")
+        raise HTTPException(status_code=400, detail=f"Invalid template step links: {'; '.join(graph.errors)}")
 
-def create_workflow_step_template(db: Session, workflow_id: int, step_template: workflow_schemas.WorkflowStepTemplateCreate):
+def create_workflow_step_template(db: Session, workflow_id: int, step_template: workflow_schemas.WorkflowStepTemplateCreate, user_id: int = None):
     workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
     if not workflow or not workflow.is_template:
         return None
@@ -242,38 +818,33 @@ def create_workflow_step_template(db: Session, workflow_id: int, step_template:
         updated_at=datetime.utcnow()
     )
     db.add(db_step_template)
+    workflow_engine.touch_template(db, workflow)
+    check_template_graph(db, workflow_id)
+    audit.record(db, workflow_id, "step_template", db_step_template.id, "create", audit.snapshot(db_step_template), user_id=user_id)
     db.commit()
     db.refresh(db_step_template)
     return db_step_template
 
-def update_workflow_step_template(db: Session, step_template_id: int, step_template: workflow_schemas.WorkflowStepTemplateCreate):
+def update_workflow_step_template(db: Session, step_template_id: int, step_template: workflow_schemas.WorkflowStepTemplateCreate, user_id: int = None):
     db_step_template = db.query(WorkflowStepTemplate).filter(WorkflowStepTemplate.id == step_template_id).first()
     if not db_step_template:
         logger.warning(f"No WorkflowStepTemplate found with id {step_template_id}")
         return None
 
     update_data = step_template.dict(exclude_unset=True)
-    
-    # Validate next_step_on_success
-    if 'next_step_on_success' in update_data and update_data['next_step_on_success'] is not None:
-        next_step_id = update_data['next_step_on_success']
-        next_step = db.query(WorkflowStepTemplate).filter(WorkflowStepTemplate.id == next_step_id).first()
-        if not next_step:
-            logger.error(f"Invalid next_step_on_success: No WorkflowStepTemplate found with id {next_step_id}")
-            raise HTTPException(status_code=400, detail=f"Invalid next_step_on_success: No WorkflowStepTemplate found with id {next_step_id}")
-    
-    # Validate next_step_on_failure
-    if 'next_step_on_failure' in update_data and update_data['next_step_on_failure'] is not None:
-        next_step_id = update_data['next_step_on_failure']
-        next_step = db.query(WorkflowStepTemplate).filter(WorkflowStepTemplate.id == next_step_id).first()
-        if not next_step:
-            logger.error(f"Invalid next_step_on_failure: No WorkflowStepTemplate found with id {next_step_id}")
-            raise HTTPException(status_code=400, detail=f"Invalid next_step_on_failure: No WorkflowStepTemplate found with id {next_step_id}")
+    before = audit.snapshot(db_step_template)
 
     try:
         for key, value in update_data.items():
             setattr(db_step_template, key, value)
         db_step_template.updated_at = datetime.utcnow()
+        workflow_engine.touch_template(db, db_step_template.workflow)
+        # Links to missing steps, to other templates' steps and success cycles, over the whole template
+        check_template_graph(db, db_step_template.workflow_id)
+        audit.record(
+            db, db_step_template.workflow_id, "step_template", step_template_id, "update",
+            audit.diff(before, audit.snapshot(db_step_template)), user_id=user_id
+        )
         db.commit()
         db.refresh(db_step_template)
         logger.info(f"Updated WorkflowStepTemplate id {step_template_id}")
@@ -283,12 +854,36 @@ def update_workflow_step_template(db: Session, step_template_id: int, step_templ
         logger.error(f"IntegrityError updating WorkflowStepTemplate id {step_template_id}: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Database integrity error: {str(e)}")
 
-def delete_workflow_step_template(db: Session, step_template_id: int):
+def delete_workflow_step_template(db: Session, step_template_id: int, user_id: int = None):
     db_step_template = db.query(WorkflowStepTemplate).filter(WorkflowStepTemplate.id == step_template_id).first()
     if db_step_template:
+        audit.record(
+            db, db_step_template.workflow_id, "step_template", step_template_id, "delete",
+            audit.snapshot(db_step_template), user_id=user_id
+        )
+        # next_step_on_* links are cleared by their foreign keys; parallel branches are plain ids
+        for linked in db.query(WorkflowStepTemplate).filter(WorkflowStepTemplate.workflow_id == db_step_template.workflow_id):
+            if step_template_id in (linked.parallel_next_steps or []):
+                remaining = [step_id for step_id in linked.parallel_next_steps if step_id != step_template_id]
+                audit.record(
+                    db, linked.workflow_id, "step_template", linked.id, "update",
+                    {"parallel_next_steps": [linked.parallel_next_steps, remaining]}, user_id=user_id
+                )
+                linked.parallel_next_steps = remaining
+        workflow_engine.touch_template(db, db_step_template.workflow)
         db.delete(db_step_template)
         db.commit()
 
+def get_template_validation(db: Session, template_id: int) -> dict:
+    """Validation report of a template's step graph, from the cached compiled graph."""
+    graph = workflow_engine.template_graph(db, template_id)
+    return {
+        "template_workflow_id": template_id,
+        "valid": not graph.errors,
+        "errors": list(graph.errors),
+        "unreachable_step_ids": list(graph.unreachable),
+    }
+
 def get_workflow_step_templates(db: Session, workflow_id: int, skip: int = 0, limit: int = 100):
     """
     Retrieve all workflow step templates for a given workflow.
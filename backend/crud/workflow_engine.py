@@ -0,0 +1,279 @@
+from sqlalchemy.orm import Session
+from models.workflow import Workflow, WorkflowStep, WorkflowStepTemplate
+import crud.audit as audit
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+PENDING = "Pending"
+IN_PROGRESS = "InProgress"  # As the admin UI sends it
+COMPLETED = "Completed"
+FAILED = "Failed"
+
+# Other spellings accepted for a status, stored as the status itself
+STATUS_ALIASES = {"In Progress": IN_PROGRESS}
+
+# Steps still to be done, in every spelling a stored row may have
+OPEN_STATUSES = (PENDING, IN_PROGRESS) + tuple(alias for alias, status in STATUS_ALIASES.items() if status in (PENDING, IN_PROGRESS))
+
+# Allowed step status changes; Completed and Failed steps can only be reopened.
+# The keys are the statuses the step form of the admin UI offers (ui/src/pages/admin/AdminWorkflows.jsx).
+TRANSITIONS = {
+    PENDING: {IN_PROGRESS, COMPLETED, FAILED},
+    IN_PROGRESS: {PENDING, COMPLETED, FAILED},
+    COMPLETED: {PENDING, IN_PROGRESS},
+    FAILED: {PENDING, IN_PROGRESS},
+}
+
+class InvalidTransition(ValueError):
+    pass
+
+class TemplateNode(NamedTuple):
+    id: int
+    step_number: int
+    description: str
+    is_mandatory: bool
+    default_expected_duration: Optional[int]
+    default_required_documents: Optional[str]
+    default_output: Optional[str]
+    is_join: bool
+    on_success: Tuple[int, ...]
+    on_failure: Tuple[int, ...]
+
+class TemplateGraph(NamedTuple):
+    template_id: int
+    version: Optional[int]
+    nodes: Dict[int, TemplateNode]
+    # Template step id -> the steps leading to it on success (what a join waits for)
+    predecessors: Dict[int, Tuple[int, ...]]
+    # Dangling or cross-template links and success cycles; a template with errors is rejected on save
+    errors: Tuple[str, ...]
+    # Steps no link leads to from the first step; they only exist if created with the workflow
+    unreachable: Tuple[int, ...]
+
+# Template workflow id -> TemplateGraph, reloaded when the template's template_version changes
+_graphs: Dict[int, TemplateGraph] = {}
+
+def load_template_graph(db: Session, template_id: int, version: Optional[int] = None) -> TemplateGraph:
+    """Build the step graph of a template from its step templates, with one query."""
+    nodes, predecessors = {}, {}
+    for step in db.query(WorkflowStepTemplate).filter(WorkflowStepTemplate.workflow_id == template_id).all():
+        on_success = tuple(dict.fromkeys(
+            ([step.next_step_on_success] if step.next_step_on_success else []) + list(step.parallel_next_steps or [])
+        ))
+        nodes[step.id] = TemplateNode(
+            id=step.id,
+            step_number=step.step_number,
+            description=step.description,
+            is_mandatory=bool(step.is_mandatory),
+            default_expected_duration=step.default_expected_duration,
+            default_required_documents=step.default_required_documents,
+            default_output=step.default_output,
+            is_join=bool(step.is_join),
+            on_success=on_success,
+            on_failure=(step.next_step_on_failure,) if step.next_step_on_failure else (),
+        )
+        for target in on_success:
+            predecessors.setdefault(target, ())
+            predecessors[target] += (step.id,)
+    errors, unreachable = check_graph(nodes)
+    return TemplateGraph(
+        template_id=template_id, version=version, nodes=nodes, predecessors=predecessors,
+        errors=errors, unreachable=unreachable
+    )
+
+def check_graph(nodes: Dict[int, TemplateNode]) -> Tuple[Tuple[str, ...], Tuple[int, ...]]:
+    """
+    Problems of a template graph, in time linear in steps and links: links to steps outside the
+    template, cycles of success links (Kahn's algorithm), and the steps unreachable from the
+    first step. Failure links may point back to earlier steps: that is how rework loops are built.
+    """
+    errors = []
+    for node in nodes.values():
+        for field, targets in (("success", node.on_success), ("failure", node.on_failure)):
+            for target in targets:
+                if target not in nodes:
+                    errors.append(f"Step template {node.id} links on {field} to {target}, which is not a step of this template")
+
+    indegree = dict.fromkeys(nodes, 0)
+    for node in nodes.values():
+        for target in node.on_success:
+            if target in nodes:
+                indegree[target] += 1
+    ready = [step_id for step_id, degree in indegree.items() if degree == 0]
+    while ready:
+        for target in nodes[ready.pop()].on_success:
+            if target in nodes:
+                indegree[target] -= 1
+                if indegree[target] == 0:
+                    ready.append(target)
+    cyclic = sorted(step_id for step_id, degree in indegree.items() if degree > 0)
+    if cyclic:
+        errors.append(f"Step templates {cyclic} are on or after a cycle of success links")
+
+    reached = set()
+    if nodes:
+        first = min(nodes.values(), key=lambda node: (node.step_number, node.id)).id
+        reached.add(first)
+        pending = [first]
+        while pending:
+            node = nodes[pending.pop()]
+            for target in node.on_success + node.on_failure:
+                if target in nodes and target not in reached:
+                    reached.add(target)
+                    pending.append(target)
+    unreachable = tuple(sorted(set(nodes) - reached))
+    return tuple(errors), unreachable
+
+def template_graph(db: Session, template_id: int) -> TemplateGraph:
+    """
+    Graph of a template, cached per template and checked against the template's template_version,
+    so a cache hit costs a single-row query.
+    """
+    version = db.query(Workflow.template_version).filter(Workflow.id == template_id).scalar()
+    return _versioned_graph(db, template_id, version)
+
+def _versioned_graph(db: Session, template_id: int, version: Optional[int]) -> TemplateGraph:
+    graph = _graphs.get(template_id)
+    if graph is None or graph.version != version:
+        graph = _graphs[template_id] = load_template_graph(db, template_id, version)
+    return graph
+
+def get_template_graph(db: Session, template_step_id: int) -> Optional[TemplateGraph]:
+    """
+    Graph of the template a step template belongs to. The template and its template_version
+    are read with one single-row query, like template_graph.
+    """
+    row = (
+        db.query(WorkflowStepTemplate.workflow_id, Workflow.template_version)
+        .join(Workflow, Workflow.id == WorkflowStepTemplate.workflow_id)
+        .filter(WorkflowStepTemplate.id == template_step_id)
+        .first()
+    )
+    if row is None:
+        return None
+    return _versioned_graph(db, row.workflow_id, row.template_version)
+
+def invalidate_template(template_id: int):
+    """Drop the cached graph of a template after its steps changed."""
+    _graphs.pop(template_id, None)
+
+def touch_template(db: Session, template: Workflow):
+    """
+    Mark a template as changed: increments its template_version in SQL, which versions the cached
+    graphs of every worker (updated_at can't: two edits in the same second would share it on MySQL).
+    """
+    template.template_version = Workflow.template_version + 1
+    template.updated_at = datetime.utcnow()
+    invalidate_template(template.id)
+
+def normalize_status(status: Optional[str]) -> Optional[str]:
+    return STATUS_ALIASES.get(status, status)
+
+def validate_status(status: str):
+    if status not in TRANSITIONS:
+        raise InvalidTransition(f"Unknown step status '{status}', expected one of: {', '.join(TRANSITIONS)}")
+
+def validate_transition(current: Optional[str], status: str):
+    current, status = normalize_status(current), normalize_status(status)
+    validate_status(status)
+    # Steps saved with a status outside the state machine may move to any known status
+    if current in TRANSITIONS and status not in TRANSITIONS[current]:
+        raise InvalidTransition(f"A step cannot go from '{current}' to '{status}'")
+
+def _instantiate(step: WorkflowStep, node: TemplateNode, now: datetime) -> WorkflowStep:
+    next_step = WorkflowStep(
+        workflow_id=step.workflow_id,
+        step_number=node.step_number,
+        description=node.description,
+        is_mandatory=node.is_mandatory,
+        template_step_id=node.id,
+        expected_duration=node.default_expected_duration,
+        required_documents=node.default_required_documents,
+        output=node.default_output,
+        status=PENDING,
+        created_at=now,
+        updated_at=now
+    )
+    if step.workflow.responsible_users:
+        next_step.responsible_users = list(step.workflow.responsible_users)
+    return next_step
+
+def transition(db: Session, step: WorkflowStep, status: str, now: datetime = None, user_id: int = None) -> List[WorkflowStep]:
+    """
+    Move a step to a new status and open the steps its template routes to:
+    next_step_on_success and the parallel branches when it completes, next_step_on_failure
+    when it fails. A join step is only created once every step leading to it on success
+    has completed. Steps reached again are reopened when they failed, or when they
+    completed and are reached on failure (rework loops); open steps are left as they are.
+
+    Changes are added to the session without committing, so the caller commits the
+    transition and the steps it opened in one transaction; the steps reopened or created
+    are written to the audit log in it too. Returns the steps created.
+    """
+    now = now or datetime.utcnow()
+    status = normalize_status(status)
+    validate_transition(step.status, status)
+    step.status = status
+    if status == COMPLETED:
+        step.completed_at = step.completed_at or now
+    else:
+        step.completed_at = None
+    step.updated_at = now
+
+    if status not in (COMPLETED, FAILED) or not step.template_step_id:
+        return []
+    graph = get_template_graph(db, step.template_step_id)
+    node = graph.nodes.get(step.template_step_id) if graph else None
+    if node is None:
+        return []
+    targets = [target for target in (node.on_success if status == COMPLETED else node.on_failure) if target in graph.nodes]
+    if not targets:
+        return []
+
+    # Existing instances of the targets and of everything the joins among them wait for, in one query
+    involved = set(targets)
+    for target in targets:
+        if graph.nodes[target].is_join:
+            involved.update(graph.predecessors.get(target, ()))
+    instances = {
+        instance.template_step_id: instance
+        for instance in db.query(WorkflowStep).filter(
+            WorkflowStep.workflow_id == step.workflow_id,
+            WorkflowStep.template_step_id.in_(involved)
+        )
+    }
+    instances[step.template_step_id] = step
+
+    created = []
+    for target in targets:
+        instance = instances.get(target)
+        if instance is not None:
+            if instance.status == FAILED or (status == FAILED and instance.status == COMPLETED):
+                audit.record(db, instance.workflow_id, "step", instance.id, "update", {
+                    "status": [instance.status, PENDING], "completed_at": [audit.jsonable(instance.completed_at), None],
+                }, user_id=user_id, now=now)
+                instance.status = PENDING
+                instance.completed_at = None
+                instance.updated_at = now
+            continue
+        target_node = graph.nodes[target]
+        if target_node.is_join and any(
+            instances.get(predecessor) is None or instances[predecessor].status != COMPLETED
+            for predecessor in graph.predecessors.get(target, ())
+        ):
+            continue
+        next_step = _instantiate(step, target_node, now)
+        db.add(next_step)
+        instances[target] = next_step
+        created.append(next_step)
+    if created:
+        db.flush()
+        for next_step in created:
+            audit.record(db, next_step.workflow_id, "step", next_step.id, "create", audit.snapshot(
+                next_step, responsible_user_ids=[user.id for user in next_step.responsible_users]
+            ), user_id=user_id, now=now)
+        logger.info(f"Step {step.id} {status}: opened template steps {[s.template_step_id for s in created]} in workflow {step.workflow_id}")
+    return created
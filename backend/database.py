@@ -1,7 +1,16 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text, DateTime
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from fastapi import Request
+from datetime import datetime
+from typing import Optional
+import logging
 import os
+import random
+import time
+from metrics import InstrumentedQueuePool, instrument_pool
+
+logger = logging.getLogger(__name__)
 
 # Load MySQL credentials from .env
 MYSQL_USER = os.getenv("MYSQL_USER")
@@ -9,21 +18,140 @@ MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD")
 MYSQL_DATABASE = os.getenv("MYSQL_DATABASE")
 MYSQL_HOST = "db"  # Use the service name from docker-compose.yml
 
-# MySQL database URL
-SQLALCHEMY_DATABASE_URL = f"mysql+mysqldb://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:3306/{MYSQL_DATABASE}"
-#SQLALCHEMY_DATABASE_URL = "sqlite:///./database.db"
+# MySQL database URL (DATABASE_URL overrides it, e.g. "sqlite:///./database.db" for local runs)
+SQLALCHEMY_DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"mysql+mysqldb://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:3306/{MYSQL_DATABASE}"
+)
+# Read replicas, comma-separated URLs; read-only endpoints use them when set
+REPLICA_DATABASE_URLS = [url.strip() for url in os.getenv("REPLICA_DATABASE_URLS", "").split(",") if url.strip()]
+# Seconds after a write during which the client keeps reading from the primary
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+# Replicas whose replicated heartbeat is older than this are skipped
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "10"))
+# Seconds a measured replica lag is reused before reading the heartbeat again
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "2"))
+# Cookie holding the time until which the client reads from the primary
+PRIMARY_STICKY_COOKIE = "db_primary_until"
+
+def _connect_args(url: str) -> dict:
+    # SQLite connections are shared between FastAPI's worker threads
+    return {"check_same_thread": False} if url.startswith("sqlite") else {}
+
+# Connection pool of each uvicorn worker; with 5 workers the defaults allow up to
+# 5 * (5 + 10) = 75 MySQL connections, below MySQL's default max_connections of 151
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10"))
+# Seconds to wait for a free connection before failing the request
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Reconnect before MySQL's wait_timeout closes idle connections server-side
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Test connections on checkout and transparently replace dead ones
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
 # Create the engine
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args=_connect_args(SQLALCHEMY_DATABASE_URL),
+    poolclass=InstrumentedQueuePool,
+    pool_size=POOL_SIZE,
+    max_overflow=POOL_MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
+    pool_recycle=POOL_RECYCLE,
+    pool_pre_ping=POOL_PRE_PING,
+)
+instrument_pool(engine)
+
+def warm_up_pool(connections: int):
+    """Open the given number of pooled connections at once so the first requests don't pay for connecting."""
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = engine.connect()
+            opened.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            connection.close()
 
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, expire_on_commit=False)
 
+class Replica:
+    """A read replica with its own engine and its last measured replication lag."""
+
+    def __init__(self, url: str, name: str):
+        self.url = url
+        self.engine = create_engine(
+            url,
+            connect_args=_connect_args(url),
+            poolclass=InstrumentedQueuePool,
+            pool_size=POOL_SIZE,
+            max_overflow=POOL_MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+            pool_recycle=POOL_RECYCLE,
+            pool_pre_ping=POOL_PRE_PING,
+        )
+        instrument_pool(self.engine, database=name)
+        self.session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine, expire_on_commit=False)
+        self.lag = None
+        self.checked_at = float("-inf")
+
+    def current_lag(self) -> Optional[float]:
+        """
+        Seconds since the last heartbeat the primary wrote (see crud.heartbeat) that reached this
+        replica, or None if it can't be read. Measured at most every REPLICA_LAG_CHECK_SECONDS.
+        """
+        now = time.monotonic()
+        if now - self.checked_at >= REPLICA_LAG_CHECK_SECONDS:
+            self.checked_at = now
+            try:
+                with self.engine.connect() as connection:
+                    beat_at = connection.execute(
+                        text("SELECT beat_at FROM replication_heartbeat WHERE id = 1").columns(beat_at=DateTime)
+                    ).scalar()
+                self.lag = (datetime.utcnow() - beat_at).total_seconds() if beat_at else None
+            except Exception as e:
+                logger.warning(f"Could not read the replication heartbeat of a replica: {e}")
+                self.lag = None
+        return self.lag
+
+# Pool metrics label replicas by their position in REPLICA_DATABASE_URLS, which keeps credentials out of them
+replicas = [Replica(url, f"replica{index}") for index, url in enumerate(REPLICA_DATABASE_URLS, start=1)]
+
+def reads_from_primary(request: Request) -> bool:
+    """Check if the client wrote recently and must read its own writes from the primary."""
+    try:
+        return float(request.cookies.get(PRIMARY_STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def mark_primary_reads(response):
+    """Keep the client on the primary for REPLICA_STICKY_SECONDS after a write."""
+    until = time.time() + REPLICA_STICKY_SECONDS
+    response.set_cookie(PRIMARY_STICKY_COOKIE, f"{until:.3f}", max_age=int(REPLICA_STICKY_SECONDS) + 1, httponly=True, samesite="lax")
+
 # Base class for models
 Base = declarative_base()
 
 # Dependency to get the database session
 def get_db():
     db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Dependency to get a session for read-only endpoints
+def get_read_db(request: Request):
+    """
+    Session on a random replica within REPLICA_MAX_LAG_SECONDS; the primary when no replica
+    is configured or healthy, or when the client wrote within the last REPLICA_STICKY_SECONDS.
+    """
+    healthy = []
+    if replicas and not reads_from_primary(request):
+        healthy = [r for r in replicas if (lag := r.current_lag()) is not None and lag <= REPLICA_MAX_LAG_SECONDS]
+    db = random.choice(healthy).session() if healthy else SessionLocal()
     try:
         yield db
     finally:
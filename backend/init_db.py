@@ -1,8 +1,10 @@
 import logging
 import os
-from database import Base, engine, SessionLocal
+import sys
+from database import engine, SessionLocal
 from crud.user import get_user_by_username, create_user
 from schemas.user import UserCreate
+from migrations.runner import upgrade as upgrade_schema
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -12,11 +14,12 @@ INIT_FLAG = "/app/.init_done"
 def initialize_app():
     logger.info("Initializing application...")
     try:
-        Base.metadata.create_all(bind=engine, checkfirst=True)
-        logger.info("Database tables checked/created successfully")
+        applied = upgrade_schema(engine)
+        logger.info(f"Applied migrations: {', '.join(applied) or 'none'}")
     except Exception as e:
-        logger.error(f"Error during table creation: {e}")
-        return
+        logger.error(f"Error during schema migration: {e}")
+        # Fail the start: the API must not serve a partly migrated schema
+        sys.exit(1)
     if os.path.exists(INIT_FLAG):
         logger.info("Application already initialized, skipping setup")
         return
@@ -1,4 +1,5 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.gzip import GZipMiddleware
 import uvicorn
 from routes.user import router as user_router
@@ -13,18 +14,33 @@ from routes.event import router as event_router
 from routes.files import router as file_router
 from routes.option import router as option_router
 from routes.workflow import router as workflow_router
+from routes.health import router as health_router, start_warm_up
+from routes.metrics import router as metrics_router
 from fastapi.middleware.cors import CORSMiddleware
 import logging
-from database import Base,engine
+from database import replicas, mark_primary_reads
+from profiler import profile_queries
+from metrics import PrometheusMiddleware, ResponseSizeMiddleware, remove_dead_workers
+from responses import FastJSONResponse
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # /health/ready turns 200 once the connection pool is warm
+    start_warm_up()
+    remove_dead_workers()
+    yield
+
 app = FastAPI(
     title="api",
     version="0.1",
     root_path="/api",  # For reverse proxy
     openapi_url="/openapi.json",  # Explicit OpenAPI schema path
     docs_url="/",  # Explicit Swagger UI path
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,  # orjson for responses without a response_model
     license_info={
         "name": "Apache 2.0",
         "url": "https://www.apache.org/licenses/LICENSE-2.0.html",
@@ -37,7 +53,23 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Uncompressed response sizes, for the gzip savings in /metrics
+app.add_middleware(ResponseSizeMiddleware)
 app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    """After a successful write, read from the primary for a short while (see database.get_read_db)."""
+    response = await call_next(request)
+    if replicas and request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        mark_primary_reads(response)
+    return response
+
+# Per-request SQL statement counts, Server-Timing headers and the slow-query log
+app.middleware("http")(profile_queries)
+# Outermost, so it also sees errors raised by the other middleware
+app.add_middleware(PrometheusMiddleware)
+
 app.include_router(user_router)
 app.include_router(product_router)
 app.include_router(cart_router)
@@ -50,8 +82,11 @@ app.include_router(event_router)
 app.include_router(file_router)
 app.include_router(option_router)
 app.include_router(workflow_router)
+app.include_router(health_router)
+app.include_router(metrics_router)
 
-Base.metadata.create_all(bind=engine)
+# The schema is managed by the migrations (python -m migrations upgrade), run once by init_db.py
+# before the workers start instead of at every worker import.
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
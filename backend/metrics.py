@@ -0,0 +1,244 @@
+"""
+Prometheus metrics, served at /metrics.
+
+With PROMETHEUS_MULTIPROC_DIR set (see Dockerfile), every uvicorn worker writes its
+samples to that directory and /metrics aggregates all workers: counters and histograms
+are summed, per-worker gauges keep their `worker` label (the process id). Without it,
+/metrics shows the worker that served the scrape.
+"""
+import glob
+import os
+import re
+import resource
+import time
+
+# prometheus_client turns multiprocess mode on when either variable is set, even to an empty value,
+# and then writes its sample files to the working directory: keep the setting only if it names a
+# directory, and create that directory for local runs (the Dockerfile creates it at start)
+_multiprocess_dirs = [os.environ.pop(name, "") for name in ("PROMETHEUS_MULTIPROC_DIR", "prometheus_multiproc_dir")]
+_multiprocess_dir = next((directory for directory in _multiprocess_dirs if directory), None)
+if _multiprocess_dir:
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = os.path.abspath(_multiprocess_dir)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+POOL_SIZE = Gauge("db_pool_size", "Configured number of persistent connections in the pool", ["worker", "database"], multiprocess_mode="livesum")
+POOL_MAX_OVERFLOW = Gauge(
+    "db_pool_max_overflow", "Configured number of extra connections allowed above the pool size", ["worker", "database"],
+    multiprocess_mode="livesum",
+)
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently checked out of the pool", ["worker", "database"], multiprocess_mode="livesum")
+POOL_OVERFLOW = Gauge("db_pool_overflow", "Overflow connections currently open above the pool size", ["worker", "database"], multiprocess_mode="livesum")
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection (including connecting a new one)",
+    ["worker", "database"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+POOL_CHECKOUT_TIMEOUTS = Counter("db_pool_checkout_timeouts_total", "Checkouts that gave up after the pool timeout", ["worker", "database"])
+POOL_INVALIDATIONS = Counter(
+    "db_pool_invalidations_total",
+    "Connections discarded as dead (e.g. closed by MySQL's wait_timeout and caught by pre-ping)",
+    ["worker", "database"],
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests handled", ["method", "route", "status"])
+HTTP_EXCEPTIONS = Counter("http_exceptions_total", "Unhandled exceptions raised while handling requests", ["method", "route", "exception"])
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "Time to handle a request", ["method", "route"], buckets=LATENCY_BUCKETS)
+HTTP_IN_PROGRESS = Gauge("http_requests_in_progress", "Requests being handled", ["method"], multiprocess_mode="livesum")
+HTTP_DB_TIME = Histogram("http_request_db_seconds", "Time spent in SQL statements per request", ["method", "route"], buckets=LATENCY_BUCKETS)
+HTTP_QUERIES = Histogram(
+    "http_request_queries",
+    "SQL statements run per request",
+    ["method", "route"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+GZIP_ORIGINAL_BYTES = Counter("http_gzip_original_bytes_total", "Response body bytes of gzip-compressed responses before compression", ["route"])
+GZIP_SAVED_BYTES = Counter("http_gzip_saved_bytes_total", "Response body bytes saved by gzip compression", ["route"])
+WORKER_RSS = Gauge("worker_resident_memory_bytes", "Resident memory of the worker process", ["worker"], multiprocess_mode="livesum")
+WORKER_CPU = Gauge("worker_cpu_seconds", "User and system CPU time used by the worker process", ["worker"], multiprocess_mode="livesum")
+
+# Seconds between two updates of the worker process gauges
+PROCESS_METRICS_INTERVAL = float(os.getenv("PROCESS_METRICS_INTERVAL", "5"))
+_process_metrics_at = float("-inf")
+
+def worker_label() -> str:
+    return str(os.getpid())
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool recording how long checkouts wait for a connection and how many time out."""
+
+    # Value of the "database" label, set by instrument_pool
+    database_label = "primary"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_CHECKOUT_TIMEOUTS.labels(worker=worker_label(), database=self.database_label).inc()
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.labels(worker=worker_label(), database=self.database_label).observe(time.perf_counter() - start)
+
+    def recreate(self):
+        # Pools are recreated on dispose() and fork; keep the label on the new one
+        pool = super().recreate()
+        pool.database_label = self.database_label
+        return pool
+
+def _update_pool_gauges(pool: QueuePool, database: str, checked_out: int):
+    worker = worker_label()
+    POOL_CHECKED_OUT.labels(worker=worker, database=database).set(checked_out)
+    # Overflow connections are closed when returned, so they match checkouts beyond the pool size
+    POOL_OVERFLOW.labels(worker=worker, database=database).set(max(checked_out - pool.size(), 0))
+
+def instrument_pool(engine, database: str = "primary"):
+    """Keep the pool gauges of this worker up to date through pool events, labelled with the database name."""
+    engine.pool.database_label = database
+    worker = worker_label()
+    POOL_SIZE.labels(worker=worker, database=database).set(engine.pool.size())
+    POOL_MAX_OVERFLOW.labels(worker=worker, database=database).set(engine.pool._max_overflow)
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        _update_pool_gauges(engine.pool, database, engine.pool.checkedout())
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        # Fired before the connection is back in the pool
+        _update_pool_gauges(engine.pool, database, engine.pool.checkedout() - 1)
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        POOL_INVALIDATIONS.labels(worker=worker_label(), database=database).inc()
+
+def update_process_metrics(force: bool = False):
+    """Refresh the RSS and CPU gauges of this worker, at most every PROCESS_METRICS_INTERVAL unless forced."""
+    global _process_metrics_at
+    now = time.monotonic()
+    if not force and now - _process_metrics_at < PROCESS_METRICS_INTERVAL:
+        return
+    _process_metrics_at = now
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        rss = usage.ru_maxrss * 1024  # Peak RSS in KiB where /proc is missing
+    worker = worker_label()
+    WORKER_RSS.labels(worker=worker).set(rss)
+    WORKER_CPU.labels(worker=worker).set(usage.ru_utime + usage.ru_stime)
+
+def _route_label(scope) -> str:
+    # Route templates keep the label cardinality bounded
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    # Plain (non-API) routes such as /openapi.json only leave their endpoint; their paths are fixed
+    if "endpoint" in scope:
+        return scope["path"]
+    return "unmatched"
+
+class PrometheusMiddleware:
+    """
+    ASGI middleware recording, per route template: latency, status codes, unhandled exceptions,
+    in-flight requests, SQL statements and time (collected by profiler.profile_queries) and the
+    bytes saved by gzip (measured with ResponseSizeMiddleware inside GZipMiddleware).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        method = scope["method"]
+        response = {"status": 500, "gzip": False, "sent": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["gzip"] = any(
+                    name.lower() == b"content-encoding" and value == b"gzip" for name, value in message.get("headers", [])
+                )
+            elif message["type"] == "http.response.body":
+                response["sent"] += len(message.get("body", b""))
+            await send(message)
+
+        in_progress = HTTP_IN_PROGRESS.labels(method=method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            HTTP_EXCEPTIONS.labels(method=method, route=_route_label(scope), exception=type(e).__name__).inc()
+            raise
+        finally:
+            in_progress.dec()
+            route = _route_label(scope)
+            HTTP_LATENCY.labels(method=method, route=route).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(method=method, route=route, status=str(response["status"])).inc()
+            stats = scope.get("query_stats")
+            if stats is not None:
+                HTTP_DB_TIME.labels(method=method, route=route).observe(stats.duration)
+                HTTP_QUERIES.labels(method=method, route=route).observe(stats.count)
+            original = scope.get("response_body_bytes")
+            if response["gzip"] and original is not None:
+                GZIP_ORIGINAL_BYTES.labels(route=route).inc(original)
+                GZIP_SAVED_BYTES.labels(route=route).inc(max(original - response["sent"], 0))
+            update_process_metrics()
+
+class ResponseSizeMiddleware:
+    """ASGI middleware placed inside GZipMiddleware that counts the uncompressed response body bytes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        scope["response_body_bytes"] = 0
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.body":
+                scope["response_body_bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+def multiprocess_dir():
+    return os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+def remove_dead_workers():
+    """Drop the live gauges left behind by exited worker processes. Called when a worker starts."""
+    directory = multiprocess_dir()
+    if not directory:
+        return
+    pids = set()
+    for path in glob.glob(os.path.join(directory, "gauge_live*.db")):
+        match = re.search(r"_(\d+)\.db$", path)
+        if match:
+            pids.add(int(match.group(1)))
+    for pid in pids:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            multiprocess.mark_process_dead(pid, directory)
+        except PermissionError:
+            pass
+
+def render_metrics() -> bytes:
+    """Metrics in the Prometheus text format, aggregated over all workers in multiprocess mode."""
+    update_process_metrics(force=True)
+    if multiprocess_dir():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -0,0 +1,52 @@
+"""
+Command line for the schema migrations, run from the backend directory:
+
+    python -m migrations upgrade [revision] [--dry-run]
+    python -m migrations downgrade <revision> [--dry-run]
+    python -m migrations current
+    python -m migrations history
+
+--dry-run prints the DDL that would run (with MySQL online index options) without changing the database.
+"""
+import argparse
+import logging
+import sys
+from database import engine
+from migrations import runner
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m migrations", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = commands.add_parser("upgrade", help="apply pending revisions")
+    upgrade_parser.add_argument("revision", nargs="?", help="stop after this revision (default: latest)")
+    upgrade_parser.add_argument("--dry-run", action="store_true", help="print the DDL instead of running it")
+    downgrade_parser = commands.add_parser("downgrade", help="revert revisions newer than the given one")
+    downgrade_parser.add_argument("revision", help="revision to go back to ('base' reverts everything)")
+    downgrade_parser.add_argument("--dry-run", action="store_true", help="print the DDL instead of running it")
+    commands.add_parser("current", help="show the applied revisions")
+    commands.add_parser("history", help="show all revisions")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING if getattr(args, "dry_run", False) else logging.INFO)
+
+    if args.command == "upgrade":
+        applied = runner.upgrade(engine, args.revision, dry_run=args.dry_run)
+        if not args.dry_run:
+            print(f"Applied: {', '.join(applied) or 'nothing, already up to date'}")
+    elif args.command == "downgrade":
+        target = None if args.revision == "base" else args.revision
+        reverted = runner.downgrade(engine, target, dry_run=args.dry_run)
+        if not args.dry_run:
+            print(f"Reverted: {', '.join(reverted) or 'nothing'}")
+    elif args.command == "current":
+        applied = runner.current(engine)
+        print(applied[-1] if applied else "base (no revisions applied)")
+    else:
+        applied = set(runner.current(engine))
+        for module in runner.load_revisions():
+            marker = "*" if module.revision in applied else " "
+            print(f"{marker} {module.revision}  {(module.__doc__ or '').strip()}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""
+Versioned schema migrations.
+
+Each module in migrations/versions/ defines a `revision`, the `down_revision` it builds on,
+and `upgrade(op)` / `downgrade(op)` functions, like Alembic revisions. Applied revisions
+are recorded in the schema_migrations table, so every revision runs exactly once per
+database. Operations are idempotent, which lets databases created by the old create_all
+startup be brought under version control safely.
+
+On MySQL, indexes are built online (ALGORITHM=INPLACE, LOCK=NONE) so migrations can run
+while the API keeps serving. With dry_run=True nothing is changed and the DDL is printed.
+"""
+import importlib
+import logging
+import os
+from datetime import datetime
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateIndex, CreateTable, DropTable
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_DIR = os.path.join(os.path.dirname(__file__), "versions")
+
+# Model modules used by the application (models.iatf and models.form are not wired in)
+MODEL_MODULES = [
+    "models.user",
+    "models.category",
+    "models.product",
+    "models.cart",
+    "models.discount",
+    "models.order",
+    "models.page",
+    "models.payment",
+    "models.event",
+    "models.file",
+    "models.option",
+    "models.workflow",
+    "models.heartbeat",
+    "models.audit",
+]
+
+_version_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _version_metadata,
+    Column("revision", String(100), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+def load_models():
+    """Import every application model so Base.metadata is complete."""
+    for module in MODEL_MODULES:
+        importlib.import_module(module)
+
+class Operations:
+    """Schema operations passed to revision upgrade/downgrade functions."""
+
+    def __init__(self, connection: Connection, dry_run: bool = False, echo=print):
+        self.connection = connection
+        self.dialect = connection.dialect.name
+        self.dry_run = dry_run
+        self.echo = echo
+        # Tables/indexes/columns created earlier in a dry run, which the database doesn't have yet
+        self._planned = set()
+
+    def _inspector(self):
+        return inspect(self.connection)
+
+    def has_table(self, table_name: str) -> bool:
+        return ("table", table_name) in self._planned or self._inspector().has_table(table_name)
+
+    def in_database(self, table_name: str) -> bool:
+        """Whether the table exists in the database itself, not only in this dry run's plan."""
+        return self._inspector().has_table(table_name)
+
+    def has_column(self, table_name: str, column_name: str) -> bool:
+        if ("column", table_name, column_name) in self._planned:
+            return True
+        if not self._inspector().has_table(table_name):
+            return False
+        return any(c["name"] == column_name for c in self._inspector().get_columns(table_name))
+
+    def has_index(self, table_name: str, index_name: str) -> bool:
+        if ("index", table_name, index_name) in self._planned:
+            return True
+        inspector = self._inspector()
+        if not inspector.has_table(table_name):
+            return False
+        names = {i["name"] for i in inspector.get_indexes(table_name)}
+        names |= {c["name"] for c in inspector.get_unique_constraints(table_name)}
+        return index_name in names
+
+    def query(self, statement, parameters=None):
+        """Run a read-only statement; also executed in dry runs, so check in_database() first."""
+        if isinstance(statement, str):
+            statement = text(statement)
+        return self.connection.execute(statement, parameters or {})
+
+    def execute(self, statement, parameters=None):
+        """Run a DDL/DML statement, or print it in dry runs."""
+        if isinstance(statement, str):
+            statement = text(statement)
+        if self.dry_run:
+            compiled = statement.compile(dialect=self.connection.dialect, compile_kwargs={"literal_binds": True})
+            self.echo(f"{str(compiled).strip()};")
+            return None
+        return self.connection.execute(statement, parameters or {})
+
+    def create_table(self, table: Table):
+        """Create a table (with its indexes) if it does not exist."""
+        if self.has_table(table.name):
+            return
+        logger.info(f"Creating table {table.name}")
+        self.execute(CreateTable(table))
+        for index in table.indexes:
+            self.execute(CreateIndex(index))
+        self._planned.add(("table", table.name))
+
+    def drop_table(self, table: Table):
+        if self.has_table(table.name):
+            logger.info(f"Dropping table {table.name}")
+            self.execute(DropTable(table))
+
+    def add_column(self, table_name: str, column: Column):
+        """Add a column if it does not exist."""
+        if self.has_column(table_name, column.name):
+            return
+        column_type = column.type.compile(dialect=self.connection.dialect)
+        ddl = f"ALTER TABLE {table_name} ADD COLUMN {column.name} {column_type}"
+        if column.server_default is not None:
+            ddl += f" DEFAULT {column.server_default.arg}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+        logger.info(f"Adding column {table_name}.{column.name}")
+        self.execute(ddl)
+        self._planned.add(("column", table_name, column.name))
+
+    def drop_column(self, table_name: str, column_name: str):
+        if self.has_column(table_name, column_name):
+            logger.info(f"Dropping column {table_name}.{column_name}")
+            self.execute(f"ALTER TABLE {table_name} DROP COLUMN {column_name}")
+
+    def create_index(self, table_name: str, index_name: str, columns: list, unique: bool = False):
+        """Create an index if it does not exist; built online on MySQL."""
+        if self.has_index(table_name, index_name):
+            return
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        logger.info(f"Creating {kind.lower()} {index_name} on {table_name}")
+        if self.dialect == "mysql":
+            self.execute(
+                f"ALTER TABLE {table_name} ADD {kind} {index_name} ({', '.join(columns)}), "
+                f"ALGORITHM=INPLACE, LOCK=NONE"
+            )
+        else:
+            self.execute(f"CREATE {kind} {index_name} ON {table_name} ({', '.join(columns)})")
+        self._planned.add(("index", table_name, index_name))
+
+    def drop_index(self, table_name: str, index_name: str):
+        if not self.has_index(table_name, index_name):
+            return
+        logger.info(f"Dropping index {index_name} on {table_name}")
+        if self.dialect == "mysql":
+            self.execute(f"ALTER TABLE {table_name} DROP INDEX {index_name}, ALGORITHM=INPLACE, LOCK=NONE")
+        elif self.dialect == "sqlite" and index_name not in {i["name"] for i in self._inspector().get_indexes(table_name)}:
+            # Table-level UNIQUE constraints cannot be dropped on SQLite without rebuilding the table
+            logger.warning(f"Keeping constraint {index_name} on {table_name}: SQLite cannot drop it in place")
+        else:
+            self.execute(f"DROP INDEX {index_name}")
+
+def load_revisions() -> list:
+    """Load the revision modules ordered along their down_revision chain."""
+    modules = {}
+    for filename in sorted(os.listdir(VERSIONS_DIR)):
+        if filename.endswith(".py") and not filename.startswith("_"):
+            module = importlib.import_module(f"migrations.versions.{filename[:-3]}")
+            modules[module.revision] = module
+    children = {module.down_revision: module for module in modules.values()}
+    if len(children) != len(modules):
+        raise RuntimeError("Migration history has branches: several revisions share a down_revision")
+    ordered = []
+    current = children.get(None)
+    while current:
+        ordered.append(current)
+        current = children.get(current.revision)
+    if len(ordered) != len(modules):
+        raise RuntimeError("Migration history is broken: some revisions are not reachable from the base")
+    return ordered
+
+def applied_revisions(connection: Connection) -> set:
+    if not inspect(connection).has_table(schema_migrations.name):
+        return set()
+    return {row.revision for row in connection.execute(schema_migrations.select())}
+
+def _record(op: Operations, revision: str, applied: bool):
+    if applied:
+        op.execute(schema_migrations.insert().values(revision=revision, applied_at=datetime.utcnow()))
+    else:
+        op.execute(schema_migrations.delete().where(schema_migrations.c.revision == revision))
+
+def upgrade(engine: Engine, target: str = None, dry_run: bool = False, echo=print) -> list:
+    """
+    Apply pending revisions in order up to target (default: latest).
+    Each revision runs in its own transaction. With dry_run the DDL is printed instead.
+    """
+    applied = []
+    with engine.connect() as connection:
+        done = applied_revisions(connection)
+        if not dry_run:
+            _version_metadata.create_all(bind=connection, checkfirst=True)
+            connection.commit()
+        op = Operations(connection, dry_run=True, echo=echo) if dry_run else None
+        if op and not inspect(connection).has_table(schema_migrations.name):
+            op.execute(CreateTable(schema_migrations))
+        for module in load_revisions():
+            if module.revision not in done:
+                logger.info(f"Applying migration {module.revision}")
+                if dry_run:
+                    echo(f"-- {module.revision}")
+                    module.upgrade(op)
+                    _record(op, module.revision, True)
+                else:
+                    with engine.begin() as revision_connection:
+                        revision_op = Operations(revision_connection)
+                        module.upgrade(revision_op)
+                        _record(revision_op, module.revision, True)
+                applied.append(module.revision)
+            if module.revision == target:
+                break
+    return applied
+
+def downgrade(engine: Engine, target: str = None, dry_run: bool = False, echo=print) -> list:
+    """Revert applied revisions newest first, down to (but not including) target."""
+    reverted = []
+    with engine.connect() as connection:
+        done = applied_revisions(connection)
+        op = Operations(connection, dry_run=True, echo=echo) if dry_run else None
+        for module in reversed(load_revisions()):
+            if module.revision == target:
+                break
+            if module.revision not in done:
+                continue
+            logger.info(f"Reverting migration {module.revision}")
+            if dry_run:
+                echo(f"-- {module.revision}")
+                module.downgrade(op)
+                _record(op, module.revision, False)
+            else:
+                with engine.begin() as revision_connection:
+                    revision_op = Operations(revision_connection)
+                    module.downgrade(revision_op)
+                    _record(revision_op, module.revision, False)
+            reverted.append(module.revision)
+    return reverted
+
+def current(engine: Engine) -> list:
+    """Return the applied revisions in history order."""
+    with engine.connect() as connection:
+        done = applied_revisions(connection)
+    return [module.revision for module in load_revisions() if module.revision in done]
@@ -0,0 +1,267 @@
+"""
+Baseline: the schema the application had before versioned migrations, which the old create_all
+startup built. Tables that already exist are left as they are, so databases created by create_all
+are taken over unchanged. The tables are written out here, not read from the models, so this
+revision keeps creating the same schema when the models change.
+"""
+from sqlalchemy import Boolean, Column, Date, DateTime, Enum, Float, ForeignKey, Integer, JSON, MetaData, String, Table, Text, func
+
+revision = "0001_initial_schema"
+down_revision = None
+
+metadata = MetaData()
+
+categories = Table(
+    "categories",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String(100), unique=True, index=True),
+    Column("description", Text),
+    Column("parent_id", Integer, ForeignKey("categories.id")),
+    Column("image_url", String(255)),
+)
+
+options = Table(
+    "options",
+    metadata,
+    Column("option_id", Integer, primary_key=True, index=True),
+    Column("option_name", String(255), nullable=False, unique=True, index=True),
+    Column("option_value", Text, nullable=False),
+)
+
+pages = Table(
+    "pages",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String(100), unique=True, index=True),
+    Column("body", Text),
+    Column("is_in_menu", Boolean),
+)
+
+users = Table(
+    "users",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("username", String(50), unique=True, index=True),
+    Column("email", String(100), unique=True, index=True),
+    Column("hashed_password", String(255)),
+    Column("name", String(100)),
+    Column("last_name", String(100)),
+    Column("is_active", Boolean),
+    Column("role", Enum("customer", "admin", "staff", name="roleenum")),
+    Column("national_id", String(20), unique=True, index=True),
+    Column("address", String(255)),
+    Column("state", String(50)),
+    Column("city", String(50)),
+    Column("phone_number", String(20)),
+    Column("reset_token", String(255)),
+    Column("reset_token_expires", DateTime),
+)
+
+events = Table(
+    "events",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("subject", String(200), nullable=False),
+    Column("priority", Integer, nullable=False),
+    Column("admin_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("date", DateTime, nullable=False),
+    Column("deadline", Date),
+    Column("status", Boolean, nullable=False),
+    Column("special", Text),
+    Column("attach", String(255)),
+)
+
+file_uploads = Table(
+    "file_uploads",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("filename", String(255), nullable=False),
+    Column("original_filename", String(255), nullable=False),
+    Column("content_type", String(100), nullable=False),
+    Column("size", Integer, nullable=False),
+    Column("path", String(512), nullable=False),
+    Column("upload_date", DateTime),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("public", Boolean),
+)
+
+orders = Table(
+    "orders",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("total_amount", Float, nullable=False),
+    Column("status", String(50)),
+    Column("state", String(50)),
+    Column("city", String(50)),
+    Column("address", String(255)),
+    Column("phone_number", String(20)),
+    Column("created_at", DateTime),
+)
+
+products = Table(
+    "products",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String(100), index=True),
+    Column("description", String(500)),
+    Column("price", Float),
+    Column("stock", Integer),
+    Column("owner_id", Integer, ForeignKey("users.id")),
+    Column("image", String(255)),
+    Column("category_id", Integer, ForeignKey("categories.id")),
+    Column("minimum_order", Integer),
+    Column("rate", Float),
+)
+
+workflows = Table(
+    "workflows",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("title", String(255), nullable=False, index=True),
+    Column("creator_id", Integer, ForeignKey("users.id", ondelete="RESTRICT"), nullable=False, index=True),
+    Column("approver_id", Integer, ForeignKey("users.id", ondelete="SET NULL"), index=True),
+    Column("status", String(50), index=True),
+    Column("is_template", Boolean),
+    Column("parent_workflow_id", Integer, ForeignKey("workflows.id", ondelete="SET NULL"), index=True),
+    Column("uploaded_files", JSON),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+carts = Table(
+    "carts",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id")),
+    Column("product_id", Integer, ForeignKey("products.id")),
+    Column("quantity", Integer),
+)
+
+discounts = Table(
+    "discounts",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("code", String(50), unique=True, index=True),
+    Column("percent", Float),
+    Column("max_discount", Float),
+    Column("product_id", Integer, ForeignKey("products.id")),
+    Column("customer_id", Integer, ForeignKey("users.id")),
+    Column("submitted_by_user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("submission_date", DateTime),
+    Column("status", String(20)),
+)
+
+event_activities = Table(
+    "event_activities",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("event_id", Integer, ForeignKey("events.id"), nullable=False),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("date", DateTime, nullable=False),
+    Column("content", Text, nullable=False),
+    Column("attach", String(255)),
+    Column("important", Boolean, nullable=False),
+)
+
+event_staff = Table(
+    "event_staff",
+    metadata,
+    Column("event_id", Integer, ForeignKey("events.id")),
+    Column("user_id", Integer, ForeignKey("users.id")),
+)
+
+event_viewers = Table(
+    "event_viewers",
+    metadata,
+    Column("event_id", Integer, ForeignKey("events.id")),
+    Column("user_id", Integer, ForeignKey("users.id")),
+)
+
+payments = Table(
+    "payments",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("payment_date", DateTime),
+    Column("order_id", Integer, ForeignKey("orders.id")),
+    Column("payment_method", Enum("cash", "check", name="paymentmethod")),
+)
+
+workflow_responsible_users = Table(
+    "workflow_responsible_users",
+    metadata,
+    Column("workflow_id", Integer, ForeignKey("workflows.id", ondelete="CASCADE"), primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+)
+
+workflow_step_templates = Table(
+    "workflow_step_templates",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("workflow_id", Integer, ForeignKey("workflows.id", ondelete="CASCADE"), nullable=False, index=True),
+    Column("step_number", Integer, nullable=False, index=True),
+    Column("description", String(1000), nullable=False),
+    Column("is_mandatory", Boolean),
+    Column("default_expected_duration", Integer),
+    Column("default_required_documents", String(500)),
+    Column("default_output", String(500)),
+    Column("next_step_on_success", Integer, ForeignKey("workflow_step_templates.id", ondelete="SET NULL"), index=True),
+    Column("next_step_on_failure", Integer, ForeignKey("workflow_step_templates.id", ondelete="SET NULL"), index=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+workflow_viewers = Table(
+    "workflow_viewers",
+    metadata,
+    Column("workflow_id", Integer, ForeignKey("workflows.id", ondelete="CASCADE"), primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+)
+
+order_product = Table(
+    "order_product",
+    metadata,
+    Column("order_id", Integer, ForeignKey("orders.id"), primary_key=True),
+    Column("product_id", Integer, ForeignKey("products.id"), primary_key=True),
+    Column("quantity", Integer, nullable=False),
+    Column("discount_id", Integer, ForeignKey("discounts.id")),
+    Column("discounted_price", Float),
+)
+
+workflow_steps = Table(
+    "workflow_steps",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("workflow_id", Integer, ForeignKey("workflows.id", ondelete="CASCADE"), nullable=False, index=True),
+    Column("step_number", Integer, nullable=False, index=True),
+    Column("description", String(1000), nullable=False),
+    Column("status", String(50), index=True),
+    Column("is_mandatory", Boolean),
+    Column("is_additional", Boolean),
+    Column("template_step_id", Integer, ForeignKey("workflow_step_templates.id", ondelete="SET NULL"), index=True),
+    Column("expected_duration", Integer),
+    Column("required_documents", String(500)),
+    Column("output", String(500)),
+    Column("escalation_contact_id", Integer, ForeignKey("users.id", ondelete="SET NULL"), index=True),
+    Column("uploaded_files", JSON),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+    Column("completed_at", DateTime(timezone=True)),
+    Column("completed_by", String(100)),
+)
+
+workflow_step_responsible_users = Table(
+    "workflow_step_responsible_users",
+    metadata,
+    Column("workflow_step_id", Integer, ForeignKey("workflow_steps.id", ondelete="CASCADE"), primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+)
+
+def upgrade(op):
+    for table in metadata.sorted_tables:
+        op.create_table(table)
+
+def downgrade(op):
+    for table in reversed(metadata.sorted_tables):
+        op.drop_table(table)
@@ -0,0 +1,76 @@
+"""Cart (user_id, product_id) uniqueness, discount redemption counters and discount windows."""
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, Table, column, func, select, table
+
+revision = "0002_cart_and_discount_columns"
+down_revision = "0001_initial_schema"
+
+metadata = MetaData()
+
+# Tables referenced by foreign keys below, with only their primary key
+for referenced in ("discounts", "products", "users"):
+    Table(referenced, metadata, Column("id", Integer, primary_key=True))
+
+discount_columns = [
+    Column("usage_limit", Integer),
+    Column("usage_count", Integer, nullable=False, server_default="0"),
+    Column("per_customer_limit", Integer),
+    Column("starts_at", DateTime),
+    Column("ends_at", DateTime),
+]
+
+discount_usages = Table(
+    "discount_usages",
+    metadata,
+    Column("discount_id", Integer, ForeignKey("discounts.id", ondelete="CASCADE"), primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    Column("uses", Integer, nullable=False, server_default="0"),
+    Column("last_used_at", DateTime),
+)
+
+product_price_timeline = Table(
+    "product_price_timeline",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("product_id", Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False),
+    Column("valid_from", DateTime, nullable=False),
+    Column("valid_until", DateTime),
+    Column("price", Float, nullable=False),
+    Column("discount_id", Integer, ForeignKey("discounts.id", ondelete="SET NULL")),
+    Index("ix_price_timeline_product_window", "product_id", "valid_from"),
+)
+
+carts = table("carts", column("id"), column("user_id"), column("product_id"), column("quantity"))
+
+def _merge_duplicate_cart_rows(op):
+    """Fold duplicate (user_id, product_id) cart rows into the oldest one before adding the unique index."""
+    if not op.in_database("carts"):
+        # Only planned by this dry run: there are no rows to merge yet
+        return
+    duplicates = op.query(
+        select(carts.c.user_id, carts.c.product_id, func.min(carts.c.id).label("keep_id"), func.sum(carts.c.quantity).label("quantity"))
+        .group_by(carts.c.user_id, carts.c.product_id)
+        .having(func.count() > 1)
+    ).fetchall()
+    for row in duplicates:
+        op.execute(carts.update().where(carts.c.id == row.keep_id).values(quantity=row.quantity))
+        op.execute(carts.delete().where(
+            carts.c.user_id == row.user_id,
+            carts.c.product_id == row.product_id,
+            carts.c.id != row.keep_id
+        ))
+
+def upgrade(op):
+    _merge_duplicate_cart_rows(op)
+    op.create_index("carts", "uq_carts_user_product", ["user_id", "product_id"], unique=True)
+
+    for discount_column in discount_columns:
+        op.add_column("discounts", discount_column)
+    op.create_table(discount_usages)
+    op.create_table(product_price_timeline)
+
+def downgrade(op):
+    op.drop_table(product_price_timeline)
+    op.drop_table(discount_usages)
+    for discount_column in reversed(discount_columns):
+        op.drop_column("discounts", discount_column.name)
+    op.drop_index("carts", "uq_carts_user_product")
@@ -0,0 +1,14 @@
+"""Composite indexes for the discount precedence lookups."""
+
+revision = "0003_discount_resolution_indexes"
+down_revision = "0002_cart_and_discount_columns"
+
+def upgrade(op):
+    # (customer, product), (NULL, product) and (NULL, NULL) lookups
+    op.create_index("discounts", "ix_discounts_status_product_customer", ["status", "product_id", "customer_id"])
+    # (customer, NULL) lookup and the customer side of the bulk resolver
+    op.create_index("discounts", "ix_discounts_status_customer_product", ["status", "customer_id", "product_id"])
+
+def downgrade(op):
+    op.drop_index("discounts", "ix_discounts_status_customer_product")
+    op.drop_index("discounts", "ix_discounts_status_product_customer")
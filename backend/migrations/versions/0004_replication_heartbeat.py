@@ -0,0 +1,18 @@
+"""Heartbeat table used to measure read replica lag."""
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table
+
+revision = "0004_replication_heartbeat"
+down_revision = "0003_discount_resolution_indexes"
+
+replication_heartbeat = Table(
+    "replication_heartbeat",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("beat_at", DateTime, nullable=False),
+)
+
+def upgrade(op):
+    op.create_table(replication_heartbeat)
+
+def downgrade(op):
+    op.drop_table(replication_heartbeat)
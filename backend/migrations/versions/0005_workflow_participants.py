@@ -0,0 +1,37 @@
+"""workflow_participants: one row per (workflow, user, role), backfilled from the existing workflows."""
+from sqlalchemy import Column, ForeignKey, Index, Integer, MetaData, String, Table
+
+revision = "0005_workflow_participants"
+down_revision = "0004_replication_heartbeat"
+
+metadata = MetaData()
+
+# Tables referenced by foreign keys below, with only their primary key
+for referenced in ("workflows", "users"):
+    Table(referenced, metadata, Column("id", Integer, primary_key=True))
+
+workflow_participants = Table(
+    "workflow_participants",
+    metadata,
+    Column("workflow_id", Integer, ForeignKey("workflows.id", ondelete="CASCADE"), primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    Column("role", String(20), primary_key=True),
+    Index("ix_workflow_participants_user_workflow", "user_id", "workflow_id"),
+)
+
+def upgrade(op):
+    op.create_table(workflow_participants)
+    # Refilled from scratch, so a table that already exists ends up matching the workflows too
+    op.execute(workflow_participants.delete())
+    op.execute(
+        "INSERT INTO workflow_participants (workflow_id, user_id, role) "
+        "SELECT id, creator_id, 'creator' FROM workflows "
+        "UNION ALL SELECT id, approver_id, 'approver' FROM workflows WHERE approver_id IS NOT NULL "
+        "UNION ALL SELECT workflow_id, user_id, 'viewer' FROM workflow_viewers "
+        "UNION ALL SELECT workflow_id, user_id, 'responsible' FROM workflow_responsible_users "
+        "UNION ALL SELECT DISTINCT workflow_steps.workflow_id, wsru.user_id, 'step_responsible' "
+        "FROM workflow_steps JOIN workflow_step_responsible_users wsru ON wsru.workflow_step_id = workflow_steps.id"
+    )
+
+def downgrade(op):
+    op.drop_table(workflow_participants)
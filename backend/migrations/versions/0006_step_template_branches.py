@@ -0,0 +1,18 @@
+"""Parallel branches and joins on workflow step templates."""
+from sqlalchemy import JSON, Boolean, Column
+
+revision = "0006_step_template_branches"
+down_revision = "0005_workflow_participants"
+
+template_columns = [
+    Column("parallel_next_steps", JSON),
+    Column("is_join", Boolean, nullable=False, server_default="0"),
+]
+
+def upgrade(op):
+    for column in template_columns:
+        op.add_column("workflow_step_templates", column)
+
+def downgrade(op):
+    for column in reversed(template_columns):
+        op.drop_column("workflow_step_templates", column.name)
@@ -0,0 +1,52 @@
+"""Step due dates, escalation marks and the escalation events table."""
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, MetaData, Table, column, func, table
+
+revision = "0007_step_deadlines"
+down_revision = "0006_step_template_branches"
+
+metadata = MetaData()
+
+# Tables referenced by foreign keys below, with only their primary key
+for referenced in ("workflow_steps", "workflows", "users"):
+    Table(referenced, metadata, Column("id", Integer, primary_key=True))
+
+step_columns = [
+    Column("due_at", DateTime(timezone=True)),
+    Column("escalated_at", DateTime(timezone=True)),
+]
+
+workflow_step_escalations = Table(
+    "workflow_step_escalations",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("workflow_step_id", Integer, ForeignKey("workflow_steps.id", ondelete="CASCADE"), nullable=False, index=True),
+    Column("workflow_id", Integer, ForeignKey("workflows.id", ondelete="CASCADE"), nullable=False, index=True),
+    Column("escalation_contact_id", Integer, ForeignKey("users.id", ondelete="SET NULL"), index=True),
+    Column("due_at", DateTime(timezone=True), nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+# created_at + expected_duration days, per dialect
+DUE_AT = {
+    "mysql": "DATE_ADD(created_at, INTERVAL expected_duration DAY)",
+    "sqlite": "datetime(created_at, '+' || expected_duration || ' days')",
+}
+
+def upgrade(op):
+    for step_column in step_columns:
+        op.add_column("workflow_steps", step_column)
+    due_at = DUE_AT.get(op.dialect, "(created_at + expected_duration * INTERVAL '1 day')")
+    op.execute(f"UPDATE workflow_steps SET due_at = {due_at} WHERE expected_duration IS NOT NULL")
+    # Steps already overdue now count as escalated, or the first scheduler run escalates all of history
+    steps = table("workflow_steps", column("due_at", DateTime), column("escalated_at", DateTime))
+    now = datetime.utcnow()
+    op.execute(steps.update().where(steps.c.due_at < now, steps.c.escalated_at.is_(None)).values(escalated_at=now))
+    op.create_index("workflow_steps", "ix_workflow_steps_status_due_at", ["status", "due_at"])
+    op.create_table(workflow_step_escalations)
+
+def downgrade(op):
+    op.drop_table(workflow_step_escalations)
+    op.drop_index("workflow_steps", "ix_workflow_steps_status_due_at")
+    for step_column in reversed(step_columns):
+        op.drop_column("workflow_steps", step_column.name)
@@ -0,0 +1,47 @@
+"""
+Append-only workflow audit log.
+
+On MySQL the table is range-partitioned by month on created_at: the primary key becomes
+(id, created_at), since every unique key of a partitioned table must include the partition
+column, and the scheduler's audit_partitions job keeps splitting new months off p_future.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import JSON, BigInteger, Column, DateTime, Index, Integer, MetaData, String, Table
+
+revision = "0008_workflow_audit_log"
+down_revision = "0007_step_deadlines"
+
+workflow_audit_log = Table(
+    "workflow_audit_log",
+    MetaData(),
+    Column("id", BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("workflow_id", Integer, nullable=False),
+    Column("entity", String(20), nullable=False),
+    Column("entity_id", Integer, nullable=False),
+    Column("action", String(10), nullable=False),
+    Column("user_id", Integer),
+    Column("changes", JSON, nullable=False),
+    Index("ix_workflow_audit_log_workflow_created", "workflow_id", "created_at"),
+)
+
+def _partitioned(op) -> bool:
+    return op.query(
+        "SELECT COUNT(*) FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'workflow_audit_log' AND PARTITION_NAME IS NOT NULL"
+    ).scalar() > 0
+
+def upgrade(op):
+    op.create_table(workflow_audit_log)
+    if op.dialect == "mysql" and not _partitioned(op):
+        month = datetime.utcnow().date().replace(day=1)
+        next_month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+        op.execute("ALTER TABLE workflow_audit_log DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)")
+        op.execute(
+            "ALTER TABLE workflow_audit_log PARTITION BY RANGE (TO_DAYS(created_at)) ("
+            f"PARTITION p{month:%Y%m} VALUES LESS THAN (TO_DAYS('{next_month:%Y-%m-%d}')), "
+            "PARTITION p_future VALUES LESS THAN MAXVALUE)"
+        )
+
+def downgrade(op):
+    op.drop_table(workflow_audit_log)
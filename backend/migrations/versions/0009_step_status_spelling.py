@@ -0,0 +1,11 @@
+"""Store the In Progress step status as the admin UI spells it ("InProgress")."""
+
+revision = "0009_step_status_spelling"
+down_revision = "0008_workflow_audit_log"
+
+def upgrade(op):
+    op.execute("UPDATE workflow_steps SET status = 'InProgress' WHERE status = 'In Progress'")
+
+def downgrade(op):
+    # Both spellings were in use before; the steps keep the one the application writes
+    pass
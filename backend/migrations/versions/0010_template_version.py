@@ -0,0 +1,11 @@
+"""Version counter of workflow templates, for the cached step graphs of every worker."""
+from sqlalchemy import Column, Integer
+
+revision = "0010_template_version"
+down_revision = "0009_step_status_spelling"
+
+def upgrade(op):
+    op.add_column("workflows", Column("template_version", Integer, nullable=False, server_default="0"))
+
+def downgrade(op):
+    op.drop_column("workflows", "template_version")
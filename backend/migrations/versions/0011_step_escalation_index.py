@@ -0,0 +1,10 @@
+"""Index for the scheduler's lookup of overdue steps that were not escalated yet."""
+
+revision = "0011_step_escalation_index"
+down_revision = "0010_template_version"
+
+def upgrade(op):
+    op.create_index("workflow_steps", "ix_workflow_steps_escalated_at_due_at", ["escalated_at", "due_at"])
+
+def downgrade(op):
+    op.drop_index("workflow_steps", "ix_workflow_steps_escalated_at_due_at")
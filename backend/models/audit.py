@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Index, JSON
+from database import Base
+
+class WorkflowAuditEntry(Base):
+    """
+    Append-only history of workflow, step and step template changes. Rows are only ever inserted.
+    There are no foreign keys, so history outlives deleted workflows and the table can be
+    range-partitioned by month on created_at (see migration 0008_workflow_audit_log).
+    """
+    __tablename__ = "workflow_audit_log"
+    __table_args__ = (
+        Index("ix_workflow_audit_log_workflow_created", "workflow_id", "created_at"),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    created_at = Column(DateTime, nullable=False)
+    workflow_id = Column(Integer, nullable=False)
+    entity = Column(String(20), nullable=False)  # workflow, step, step_template
+    entity_id = Column(Integer, nullable=False)
+    action = Column(String(10), nullable=False)  # create, update, delete
+    user_id = Column(Integer)  # None for scheduler and system changes
+    changes = Column(JSON, nullable=False)  # update: {field: [old, new]}; create/delete: the non-null fields
\ No newline at end of file
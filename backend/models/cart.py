@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from database import Base
 
 class Cart(Base):
     __tablename__ = "carts"
+    __table_args__ = (
+        # One row per product in a user's cart; also backs the bulk upsert
+        UniqueConstraint("user_id", "product_id", name="uq_carts_user_product"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
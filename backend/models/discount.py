@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database import Base
@@ -9,9 +9,15 @@ class DiscountStatus(PyEnum):
     EXPIRED = "expired"
     USED = "used"
     DISABLED = "disabled"
+    SCHEDULED = "scheduled"  # Waiting for starts_at
 
 class Discount(Base):
     __tablename__ = "discounts"
+    __table_args__ = (
+        # Cover the four precedence lookups of get_applicable_discount
+        Index("ix_discounts_status_product_customer", "status", "product_id", "customer_id"),
+        Index("ix_discounts_status_customer_product", "status", "customer_id", "product_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     code = Column(String(50), unique=True, index=True, nullable=True)
@@ -22,8 +28,22 @@ class Discount(Base):
     submitted_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # Renamed to avoid conflict
     submission_date = Column(DateTime, default=func.now())
     status = Column(String(20), default=DiscountStatus.ACTIVE.value)
+    usage_limit = Column(Integer, nullable=True)  # Total redemptions allowed, None = unlimited
+    usage_count = Column(Integer, nullable=False, default=0, server_default="0")
+    per_customer_limit = Column(Integer, nullable=True)  # Redemptions allowed per customer, None = unlimited
+    starts_at = Column(DateTime, nullable=True)  # Window start (UTC), None = immediately
+    ends_at = Column(DateTime, nullable=True)  # Window end (UTC), None = open-ended
     
     # Relationships
     product = relationship("Product")
     customer = relationship("User", foreign_keys=[customer_id])
-    submitter = relationship("User", foreign_keys=[submitted_by_user_id])  # Renamed to 'submitter'
\ No newline at end of file
+    submitter = relationship("User", foreign_keys=[submitted_by_user_id])  # Renamed to 'submitter'
+
+class DiscountUsage(Base):
+    """Per-customer redemption counter of a discount code."""
+    __tablename__ = "discount_usages"
+
+    discount_id = Column(Integer, ForeignKey("discounts.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    uses = Column(Integer, nullable=False, default=0, server_default="0")
+    last_used_at = Column(DateTime, nullable=True)
\ No newline at end of file
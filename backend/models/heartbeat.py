@@ -0,0 +1,9 @@
+from sqlalchemy import Column, Integer, DateTime
+from database import Base
+
+class ReplicationHeartbeat(Base):
+    """Single row the primary refreshes periodically; its age on a replica is the replication lag."""
+    __tablename__ = "replication_heartbeat"
+
+    id = Column(Integer, primary_key=True)
+    beat_at = Column(DateTime, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -16,4 +16,20 @@ class Product(Base):
     category = relationship("Category")  # Define relationship here
     minimum_order = Column(Integer, default=1)  # Added minimum order with default value of 1
     rate = Column(Float, nullable=True)  # Added rate, allowing null values
-    
\ No newline at end of file
+
+class ProductPriceTimeline(Base):
+    """
+    Precomputed effective price of a product over time for automatic, non customer-specific discounts.
+    Rows are contiguous [valid_from, valid_until) intervals; valid_until NULL means open-ended.
+    """
+    __tablename__ = "product_price_timeline"
+    __table_args__ = (
+        Index("ix_price_timeline_product_window", "product_id", "valid_from"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    valid_from = Column(DateTime, nullable=False)
+    valid_until = Column(DateTime, nullable=True)
+    price = Column(Float, nullable=False)
+    discount_id = Column(Integer, ForeignKey("discounts.id", ondelete="SET NULL"), nullable=True)
\ No newline at end of file
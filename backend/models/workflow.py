@@ -1,6 +1,7 @@
 # models/workflow.py
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Table, JSON
-from sqlalchemy.orm import relationship
+import enum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, Table, JSON
+from sqlalchemy.orm import deferred, query_expression, relationship
 from sqlalchemy.sql import func
 from database import Base
 from typing import List
@@ -27,6 +28,24 @@ workflow_step_responsible_users = Table(
     Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
 )
 
+class ParticipantRole(str, enum.Enum):
+    creator = "creator"
+    approver = "approver"
+    viewer = "viewer"
+    responsible = "responsible"
+    step_responsible = "step_responsible"
+
+# Everyone taking part in a workflow, one row per role. Derived from the columns and association
+# tables above and kept in sync by crud.workflow.sync_participants; used for visibility checks.
+workflow_participants = Table(
+    'workflow_participants',
+    Base.metadata,
+    Column('workflow_id', Integer, ForeignKey('workflows.id', ondelete='CASCADE'), primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+    Column('role', String(20), primary_key=True),
+    Index('ix_workflow_participants_user_workflow', 'user_id', 'workflow_id')
+)
+
 class Workflow(Base):
     __tablename__ = "workflows"
     
@@ -37,9 +56,14 @@ class Workflow(Base):
     status = Column(String(50), default="Draft", index=True)
     is_template = Column(Boolean, default=False)
     parent_workflow_id = Column(Integer, ForeignKey("workflows.id", ondelete="SET NULL"), index=True)
-    uploaded_files = Column(JSON, default=list)  # Removed server_default='[]'
+    # Deferred: only the detail endpoints load it (see crud.workflow.attach_files)
+    uploaded_files = deferred(Column(JSON, default=list))  # Removed server_default='[]'
+    # Entries in uploaded_files, for the listings (see crud.workflow.uploaded_files_count)
+    uploaded_files_count = query_expression()
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Bumped on every change to a template's steps; versions the cached step graphs (crud.workflow_engine)
+    template_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationships
     creator = relationship("User", foreign_keys=[creator_id], backref="created_workflows")
@@ -62,6 +86,12 @@ class Workflow(Base):
 
 class WorkflowStep(Base):
     __tablename__ = "workflow_steps"
+    __table_args__ = (
+        # Overdue open steps are one range scan per open status
+        Index("ix_workflow_steps_status_due_at", "status", "due_at"),
+        # Overdue steps not escalated yet: one range scan for the scheduler
+        Index("ix_workflow_steps_escalated_at_due_at", "escalated_at", "due_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     workflow_id = Column(Integer, ForeignKey("workflows.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -75,11 +105,16 @@ class WorkflowStep(Base):
     required_documents = Column(String(500))
     output = Column(String(500))
     escalation_contact_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), index=True)
-    uploaded_files = Column(JSON, default=list)  # Removed server_default='[]'
+    # Deferred: only the detail endpoints load it (see crud.workflow.attach_files)
+    uploaded_files = deferred(Column(JSON, default=list))  # Removed server_default='[]'
+    # Entries in uploaded_files, for the listings (see crud.workflow.uploaded_files_count)
+    uploaded_files_count = query_expression()
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     completed_at = Column(DateTime(timezone=True))
     completed_by = Column(String(100))
+    due_at = Column(DateTime(timezone=True))  # created_at + expected_duration days, filled by the scheduler
+    escalated_at = Column(DateTime(timezone=True))  # Set when the overdue step was escalated
 
     # Relationships
     workflow = relationship("Workflow", back_populates="steps")
@@ -110,6 +145,8 @@ class WorkflowStepTemplate(Base):
     default_output = Column(String(500))
     next_step_on_success = Column(Integer, ForeignKey("workflow_step_templates.id", ondelete="SET NULL"), index=True)
     next_step_on_failure = Column(Integer, ForeignKey("workflow_step_templates.id", ondelete="SET NULL"), index=True)
+    parallel_next_steps = Column(JSON, default=list)  # Started alongside next_step_on_success
+    is_join = Column(Boolean, nullable=False, default=False, server_default="0")  # Waits for every step leading to it on success
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -128,4 +165,18 @@ class WorkflowStepTemplate(Base):
         backref="previous_step_on_failure",
         remote_side=[id],
         uselist=False
-    )
\ No newline at end of file
+    )
+
+class WorkflowStepEscalation(Base):
+    __tablename__ = "workflow_step_escalations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    workflow_step_id = Column(Integer, ForeignKey("workflow_steps.id", ondelete="CASCADE"), nullable=False, index=True)
+    workflow_id = Column(Integer, ForeignKey("workflows.id", ondelete="CASCADE"), nullable=False, index=True)
+    escalation_contact_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), index=True)
+    due_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    step = relationship("WorkflowStep")
+    escalation_contact = relationship("User", foreign_keys=[escalation_contact_id])
\ No newline at end of file
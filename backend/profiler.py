@@ -0,0 +1,138 @@
+"""
+Request-scoped SQL profiling.
+
+SQLAlchemy cursor events count the statements and database time of the current request,
+which the middleware reports in the Server-Timing and X-Query-Count response headers.
+Slow statements and statements repeated many times in one request (N+1 patterns) are
+logged with their normalized SQL.
+
+QUERY_BUDGET sets the maximum number of statements per request. Exceeding it is logged;
+with QUERY_BUDGET_ENFORCE=1 (meant for test runs) the response is replaced by a 500 so
+the offending endpoint fails its tests.
+"""
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+PROFILE_QUERIES = os.getenv("QUERY_PROFILER", "true").lower() in ("1", "true", "yes")
+# Statements slower than this are logged with their normalized SQL
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# The same normalized statement run more often than this in one request is logged as a likely N+1
+REPEATED_QUERY_THRESHOLD = int(os.getenv("REPEATED_QUERY_THRESHOLD", "10"))
+# Maximum statements per request (0 disables the budget)
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "0"))
+QUERY_BUDGET_ENFORCE = os.getenv("QUERY_BUDGET_ENFORCE", "false").lower() in ("1", "true", "yes")
+
+class QueryStats:
+    """Statements run while handling one request."""
+
+    def __init__(self, budget: int = QUERY_BUDGET):
+        self.count = 0
+        self.duration = 0.0
+        self.budget = budget
+        self.statements = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.statements[normalize_sql(statement)] += 1
+
+    def repeated(self, threshold: int = REPEATED_QUERY_THRESHOLD) -> list:
+        return [(sql, count) for sql, count in self.statements.most_common() if count > threshold]
+
+    @property
+    def over_budget(self) -> bool:
+        return bool(self.budget) and self.count > self.budget
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|:\w+|\?")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_sql(statement: str) -> str:
+    """Replace literals and bind parameters by ? and collapse IN/VALUES lists, so equal query shapes compare equal."""
+    sql = _STRING.sub("?", statement)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _VALUES_LIST.sub(r"\1, ...", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+def current_stats() -> Optional[QueryStats]:
+    """Stats of the request being handled, or None outside of a request."""
+    return _current.get()
+
+def set_query_budget(budget: int):
+    """Override the query budget of the current request (e.g. from a route dependency)."""
+    stats = _current.get()
+    if stats is not None:
+        stats.budget = budget
+
+def query_budget(budget: int):
+    """Route dependency giving an endpoint its own query budget: dependencies=[Depends(query_budget(5))]."""
+    def dependency():
+        set_query_budget(budget)
+    return dependency
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    if duration * 1000 >= SLOW_QUERY_MS:
+        logger.warning(f"Slow query ({duration * 1000:.1f} ms): {normalize_sql(statement)}")
+
+def _server_timing(stats: QueryStats, total: float) -> str:
+    return (
+        f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries", '
+        f"app;dur={max(total - stats.duration, 0) * 1000:.1f}, "
+        f"total;dur={total * 1000:.1f}"
+    )
+
+async def profile_queries(request: Request, call_next):
+    """HTTP middleware collecting the SQL statements of each request."""
+    if not PROFILE_QUERIES:
+        return await call_next(request)
+    stats = QueryStats()
+    # Also kept in the scope for metrics.PrometheusMiddleware
+    request.scope["query_stats"] = stats
+    token = _current.set(stats)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _current.reset(token)
+    total = time.perf_counter() - start
+
+    route = f"{request.method} {request.url.path}"
+    for sql, count in stats.repeated():
+        logger.warning(f"{route} ran the same query {count} times (possible N+1): {sql}")
+    if stats.over_budget:
+        logger.warning(f"{route} ran {stats.count} queries, over its budget of {stats.budget}")
+        if QUERY_BUDGET_ENFORCE:
+            response = JSONResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                content={"detail": f"Query budget exceeded: {stats.count} queries, budget {stats.budget}"},
+            )
+    response.headers["Server-Timing"] = _server_timing(stats, total)
+    response.headers["X-Query-Count"] = str(stats.count)
+    return response
@@ -0,0 +1,106 @@
+"""
+JSON responses encoded with orjson.
+
+FastJSONResponse is the application's default response class. Routes with a response_model
+keep FastAPI's fast path (Pydantic validates the result and writes the JSON bytes itself);
+FastJSONResponse encodes everything else, i.e. routes returning plain dicts and lists, with
+orjson instead of the standard library. Besides the types orjson handles natively (datetime,
+date, Enum, UUID, dataclasses) it encodes Decimal, Pydantic models and URLs.
+
+For hot list routes, orm_response() skips the response_model validation: the ORM rows are
+read field by field following the schema and encoded straight away. Validation from ORM
+attributes costs several times more than encoding, and rows built by our own CRUD functions
+already match the schema. Routes keep their response_model for the OpenAPI docs.
+"""
+import types
+from decimal import Decimal
+from typing import Any, Union, get_args, get_origin
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined, Url
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, Url):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+# X | Y annotations (Python 3.10+)
+_UnionType = getattr(types, "UnionType", Union)
+
+# Per schema: (field name, default, nested shape) for every field
+_plans = {}
+
+def _shape(annotation):
+    """(many, model) when the annotation holds a nested schema (optionally in a list), else None."""
+    origin = get_origin(annotation)
+    if origin is Union or origin is _UnionType:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return _shape(args[0]) if len(args) == 1 else None
+    if origin in (list, tuple, set):
+        args = get_args(annotation)
+        inner = _shape(args[0]) if args else None
+        return (True, inner[1]) if inner and not inner[0] else None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return (False, annotation)
+    return None
+
+def _plan(model) -> list:
+    plan = _plans.get(model)
+    if plan is None:
+        # Registered before filling so self-referencing schemas (Category.subcategories) terminate
+        plan = _plans[model] = []
+        for name, field in model.model_fields.items():
+            default = field.get_default(call_default_factory=True)
+            plan.append((name, None if default is PydanticUndefined else default, _shape(field.annotation)))
+    return plan
+
+def _dump(obj, model):
+    if obj is None:
+        return None
+    # Loaded ORM attributes live in the instance __dict__; reading it skips the attribute
+    # descriptors. Anything else (unloaded relationships, properties) goes through getattr.
+    loaded = obj if isinstance(obj, dict) else getattr(obj, "__dict__", {})
+    data = {}
+    for name, default, shape in _plan(model):
+        if name in loaded:
+            value = loaded[name]
+        elif loaded is obj:
+            value = default
+        else:
+            value = getattr(obj, name, default)
+        if shape is not None and value is not None:
+            many, nested = shape
+            value = [_dump(item, nested) for item in value] if many else _dump(value, nested)
+        data[name] = value
+    return data
+
+def to_jsonable(content, response_model) -> Any:
+    """Plain data for content shaped by response_model (a schema or List[schema]), without validation."""
+    shape = _shape(response_model)
+    if shape is None:
+        raise TypeError(f"{response_model} is not a schema or a list of schemas")
+    many, model = shape
+    return [_dump(item, model) for item in content] if many else _dump(content, model)
+
+def orm_response(content, response_model, status_code: int = 200) -> FastJSONResponse:
+    """
+    Response for ORM rows matching response_model, skipping its validation.
+    Only for rows produced by our own models and CRUD functions.
+    """
+    return FastJSONResponse(to_jsonable(content, response_model), status_code=status_code)
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Union
 import crud.cart as cart_crud
 import schemas.cart as cart_schemas
+import schemas.order as order_schemas
 import schemas.user as user_schemas
 import auth
 from database import get_db
@@ -23,15 +24,58 @@ def add_to_cart(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/", response_model=List[cart_schemas.Cart])
+@router.post("/bulk", response_model=List[cart_schemas.Cart])
+def add_many_to_cart(
+    items: List[cart_schemas.CartCreate],
+    current_user: user_schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Add or merge several items into the cart (e.g. a guest cart after login) in one request."""
+    try:
+        return cart_crud.add_cart_items(db=db, user_id=current_user.id, items=items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/", response_model=Union[List[cart_schemas.Cart], cart_schemas.CartView])
 def read_cart(
     skip: int = 0,
     limit: int = 100,
+    expand: bool = False,
     current_user: user_schemas.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
+    """
+    Get the cart of the authenticated user.
+    With expand=true every line includes its product, category and discount plus line and cart totals.
+    """
+    if expand:
+        return cart_crud.get_cart_view(db=db, user_id=current_user.id, skip=skip, limit=limit)
     return cart_crud.get_cart_items(db=db, user_id=current_user.id, skip=skip, limit=limit)
 
+@router.post("/checkout", response_model=order_schemas.Order, status_code=status.HTTP_201_CREATED)
+def checkout_cart(
+    checkout: Optional[cart_schemas.CartCheckout] = None,
+    current_user: user_schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Create an order from the current cart and empty the cart in the same transaction."""
+    try:
+        return cart_crud.checkout_cart(db=db, user_id=current_user.id, checkout=checkout)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.put("/", response_model=List[cart_schemas.Cart])
+def replace_cart(
+    items: List[cart_schemas.CartCreate],
+    current_user: user_schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Replace the whole cart in one request; products missing from the body are removed."""
+    try:
+        return cart_crud.replace_cart(db=db, user_id=current_user.id, items=items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.put("/{cart_id}", response_model=cart_schemas.Cart)
 def update_cart(
     cart_id: int,
@@ -5,7 +5,7 @@ import crud.category as category_crud
 import schemas.category as category_schemas
 import schemas.user as user_schemas
 import auth
-from database import get_db
+from database import get_db, get_read_db
 from models.category import Category
 from pydantic import HttpUrl
 
@@ -43,7 +43,7 @@ def create_category(
 def read_categories(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get paginated list of categories with their subcategories
@@ -55,7 +55,7 @@ def read_categories(
 @router.get("/{category_id}", response_model=category_schemas.Category)
 def read_category(
     category_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get a single category by ID with its image URL and subcategories
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
-from database import get_db
+from database import get_db, get_read_db
 from schemas.discount import Discount, DiscountCreate, DiscountUpdate, DiscountStatus
 import schemas.user as user_schemas
 from crud.discount import (
@@ -13,6 +13,7 @@ from crud.discount import (
     update_discount, 
     delete_discount
 )
+from crud.pricing import mark_price_timeline_dirty
 import auth
 
 router = APIRouter(
@@ -27,6 +28,14 @@ def create_new_discount(
     db: Session = Depends(get_db),
     current_user: user_schemas.User = Depends(auth.get_current_admin_user)
 ):
+    """
+    Create a discount. Without a code it applies automatically to the products and customers
+    it covers. With a code it only applies to orders and checkouts that redeem the code (see
+    discount_code), where the better of the code and the automatic discount is used.
+
+    Coded discounts used to apply automatically as well; existing coded discounts that should
+    keep doing so need their code cleared (PUT with "code": null).
+    """
     # Auto-set submitted_by_user_id to current admin
     discount.submitted_by_user_id = current_user.id
     
@@ -35,7 +44,9 @@ def create_new_discount(
         if existing_discount:
             raise HTTPException(status_code=400, detail="Discount code already exists")
     
-    return create_discount(db=db, discount=discount)
+    db_discount = create_discount(db=db, discount=discount)
+    mark_price_timeline_dirty(db)
+    return db_discount
 
 # Get all discounts with filters
 @router.get("/", response_model=List[Discount])
@@ -45,7 +56,7 @@ def read_discounts(
     status: Optional[DiscountStatus] = Query(None),
     submitted_by_user_id: Optional[int] = Query(None),
     code: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: user_schemas.User = Depends(auth.get_current_user)
 ):
     """
@@ -71,7 +82,7 @@ def read_discounts(
 @router.get("/{discount_id}", response_model=Discount)
 def read_discount(
     discount_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: user_schemas.User = Depends(auth.get_current_user)
 ):
     discount = get_discount(db=db, discount_id=discount_id)
@@ -83,7 +94,7 @@ def read_discount(
 @router.get("/code/{code}", response_model=Discount)
 def read_discount_by_code(
     code: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: user_schemas.User = Depends(auth.get_current_user)
 ):
     discount = get_discount_by_code(db=db, code=code)
@@ -107,6 +118,10 @@ def update_existing_discount(
     db: Session = Depends(get_db),
     current_user: user_schemas.User = Depends(auth.get_current_admin_user)
 ):
+    """
+    Update a discount. Setting or clearing the code switches it between redeemed-only and
+    automatic (see create_new_discount).
+    """
     db_discount = get_discount(db=db, discount_id=discount_id)
     if not db_discount:
         raise HTTPException(status_code=404, detail="Discount not found")
@@ -116,7 +131,9 @@ def update_existing_discount(
         if existing:
             raise HTTPException(status_code=400, detail="Discount code already exists")
 
-    return update_discount(db=db, discount_id=discount_id, discount=discount)
+    updated_discount = update_discount(db=db, discount_id=discount_id, discount=discount)
+    mark_price_timeline_dirty(db)
+    return updated_discount
 
 # Delete discount - Admin only
 @router.delete("/{discount_id}", response_model=Discount)
@@ -128,4 +145,5 @@ def delete_existing_discount(
     discount = delete_discount(db=db, discount_id=discount_id)
     if not discount:
         raise HTTPException(status_code=404, detail="Discount not found")
+    mark_price_timeline_dirty(db)
     return discount
\ No newline at end of file
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from database import engine, warm_up_pool, POOL_SIZE
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/health",
+    tags=["health"],
+)
+
+# Connections opened before the worker reports ready (defaults to the pool size)
+POOL_WARM_CONNECTIONS = int(os.getenv("POOL_WARM_CONNECTIONS", POOL_SIZE))
+# Seconds between warm-up attempts while the database is unreachable
+WARM_UP_RETRY_SECONDS = float(os.getenv("WARM_UP_RETRY_SECONDS", "1"))
+
+_ready = threading.Event()
+
+def warm_up():
+    """Warm the connection pool, retrying until the database answers, then mark the worker ready."""
+    while not _ready.is_set():
+        try:
+            warm_up_pool(POOL_WARM_CONNECTIONS)
+            _ready.set()
+            logger.info(f"Connection pool warmed up with {POOL_WARM_CONNECTIONS} connections")
+        except Exception as e:
+            logger.warning(f"Connection pool warm-up failed, retrying: {e}")
+            time.sleep(WARM_UP_RETRY_SECONDS)
+
+def start_warm_up():
+    """Warm the pool in the background so the worker accepts (liveness) requests immediately."""
+    threading.Thread(target=warm_up, name="pool-warm-up", daemon=True).start()
+
+@router.get(
+    "/live",
+    status_code=status.HTTP_200_OK,
+    summary="Liveness",
+)
+def liveness():
+    """The worker process is up and serving requests."""
+    return {"status": "ok"}
+
+@router.get(
+    "/ready",
+    status_code=status.HTTP_200_OK,
+    summary="Readiness",
+    responses={503: {"description": "Pool not warmed up yet or database unreachable"}},
+)
+def readiness():
+    """The connection pool is warmed up and the database answers."""
+    if not _ready.is_set():
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"status": "starting"})
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except Exception as e:
+        logger.error(f"Readiness check failed: {e}")
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"status": "database unavailable"})
+    return {"status": "ready"}
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Response
+from metrics import render_metrics  # Before prometheus_client, which reads PROMETHEUS_MULTIPROC_DIR on import
+from prometheus_client import CONTENT_TYPE_LATEST
+
+router = APIRouter(
+    tags=["metrics"],
+)
+
+@router.get(
+    "/metrics",
+    summary="Prometheus Metrics",
+    response_class=Response,
+)
+def read_metrics():
+    """Metrics in the Prometheus text format, aggregated over all workers (see metrics.py)."""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -4,7 +4,7 @@ from typing import List
 
 import crud.option as option_crud
 import schemas.option as option_schemas
-from database import get_db
+from database import get_db, get_read_db
 from models.user import User
 import schemas.user as user_schemas
 import auth
@@ -37,7 +37,7 @@ def create_option(
 def read_options(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Retrieve a list of options."""
     options = option_crud.get_options(db, skip=skip, limit=limit)
@@ -51,7 +51,7 @@ def read_options(
 )
 def read_option(
     option_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Retrieve a specific option by ID."""
     option = option_crud.get_option(db, option_id=option_id)
@@ -101,7 +101,7 @@ def delete_option(
 )
 def read_option_by_name(
     option_name: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Retrieve a specific option by name."""
     option = option_crud.get_option_by_name(db, option_name=option_name)
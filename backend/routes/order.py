@@ -6,7 +6,8 @@ import crud.order as order_crud
 import schemas.order as order_schemas
 import schemas.user as user_schemas
 import auth
-from database import get_db
+from database import get_db, get_read_db
+from responses import orm_response
 
 router = APIRouter(
     prefix="/orders",
@@ -35,7 +36,7 @@ def read_orders(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     current_user: user_schemas.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get list of orders for the authenticated user.
@@ -50,7 +51,7 @@ def read_orders(
         start_date=start_date,
         end_date=end_date
     )
-    return orders
+    return orm_response(orders, List[order_schemas.Order])
 
 @router.get("/all", response_model=List[order_schemas.Order])
 def read_all_orders(
@@ -60,7 +61,7 @@ def read_all_orders(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     current_user: user_schemas.User = Depends(auth.get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get list of all orders (admin only).
@@ -81,7 +82,7 @@ def read_all_orders(
 def read_order(
     order_id: int,
     current_user: user_schemas.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get order details for the authenticated user.
@@ -6,7 +6,7 @@ import crud.page as page_crud
 import schemas.page as page_schemas
 import schemas.user as user_schemas
 import auth
-from database import get_db
+from database import get_db, get_read_db
 
 router = APIRouter(
     prefix="/pages",
@@ -36,7 +36,7 @@ def create_page(
 def read_pages(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Retrieve a list of pages."""
     pages = page_crud.get_pages(db, skip=skip, limit=limit)
@@ -50,7 +50,7 @@ def read_pages(
 )
 def read_page(
     page_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Retrieve a specific page by ID."""
     page = page_crud.get_page(db, page_id=page_id)
@@ -102,7 +102,7 @@ def search_pages(
     query: str,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Search pages by name."""
     pages = page_crud.search_pages_by_name(db, query=query, skip=skip, limit=limit)
@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import crud.product as product_crud
+from crud.pricing import rebuild_price_timeline_task
 import schemas.product as product_schemas
 import schemas.user as user_schemas
 import auth
-from database import get_db
+from database import get_db, get_read_db
 from models.discount import DiscountStatus
+from responses import orm_response
 
 router = APIRouter(
     prefix="/products",
@@ -17,11 +19,14 @@ router = APIRouter(
             description="Only admin users can create products.")
 def create_product(
     product: product_schemas.ProductCreate,
+    background_tasks: BackgroundTasks,
     current_user: user_schemas.User = Depends(auth.get_current_admin_user),
     db: Session = Depends(get_db),
 ):
     try:
-        return product_crud.create_product(db=db, product=product, owner_id=current_user.id)
+        db_product = product_crud.create_product(db=db, product=product, owner_id=current_user.id)
+        background_tasks.add_task(rebuild_price_timeline_task, [db_product.id])
+        return db_product
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -35,7 +40,7 @@ def read_products(
     max_price: Optional[float] = Query(None),
     has_discount: Optional[bool] = Query(None),
     current_user: Optional[user_schemas.User] = Depends(auth.get_current_user_optional),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     user_id = current_user.id if current_user else None
     products = product_crud.get_products(db, skip=skip, limit=limit, user_id=user_id)
@@ -53,14 +58,14 @@ def read_products(
         else:
             products = [p for p in products if p.discount is None]
     
-    return products
+    return orm_response(products, List[product_schemas.Product])
 
 @router.get("/{product_id}", response_model=product_schemas.Product,
            description="Get product details with applicable active discount.")
 def read_product(
     product_id: int,
     current_user: Optional[user_schemas.User] = Depends(auth.get_current_user_optional),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     user_id = current_user.id if current_user else None
     product = product_crud.get_product(db, product_id=product_id, user_id=user_id)
@@ -78,6 +83,7 @@ def read_product(
 def update_product(
     product_id: int,
     product: product_schemas.ProductUpdate,
+    background_tasks: BackgroundTasks,
     current_user: user_schemas.User = Depends(auth.get_current_admin_user),
     db: Session = Depends(get_db)
 ):
@@ -85,6 +91,8 @@ def update_product(
         updated_product = product_crud.update_product(db, product_id=product_id, product=product)
         if updated_product is None:
             raise HTTPException(status_code=404, detail="Product not found")
+        if product.price is not None:
+            background_tasks.add_task(rebuild_price_timeline_task, [product_id])
         return updated_product
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -107,7 +115,7 @@ def search_products(
     limit: int = 100,
     only_discounted: Optional[bool] = Query(False),
     current_user: Optional[user_schemas.User] = Depends(auth.get_current_user_optional),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     user_id = current_user.id if current_user else None
     products = product_crud.search_products_by_name(db, query=query, skip=skip, limit=limit, user_id=user_id)
@@ -115,4 +123,4 @@ def search_products(
     if only_discounted:
         products = [p for p in products if p.discount is not None]
     
-    return products
\ No newline at end of file
+    return orm_response(products, List[product_schemas.Product])
\ No newline at end of file
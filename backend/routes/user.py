@@ -7,7 +7,7 @@ from datetime import timedelta
 import crud.user as user_crud
 import schemas.user as user_schemas
 import auth
-from database import get_db
+from database import get_db, get_read_db
 from models.user import RoleEnum
 
 router = APIRouter(
@@ -80,7 +80,7 @@ async def read_users_me(current_user: user_schemas.User = Depends(auth.get_curre
 
 @router.get("/all", response_model=List[user_schemas.User])
 def read_all_users(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: user_schemas.User = Depends(auth.get_current_admin_user)
 ):
     return db.query(user_crud.User).all()
@@ -157,7 +157,7 @@ async def edit_user(
 @router.get("/search-by-id/", response_model=user_schemas.User)
 def get_usr_by_id(
     id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: user_schemas.User = Depends(auth.get_current_admin_user),
 ):
     user = user_crud.get_user_by_id(db,user_id=id)
@@ -168,7 +168,7 @@ def search_users_by_role(
     role: RoleEnum,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: user_schemas.User = Depends(auth.get_current_admin_user)
 ):
     """Search users by their role."""
@@ -180,7 +180,7 @@ def search_users_by_username(
     username: str,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: user_schemas.User = Depends(auth.get_current_admin_user)
 ):
     """Search users by username (partial match)."""
@@ -192,7 +192,7 @@ def search_users_by_email(
     email: str,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: user_schemas.User = Depends(auth.get_current_admin_user)
 ):
     """Search users by email (partial match)."""
@@ -204,7 +204,7 @@ def search_users_by_national_id(
     national_id: str,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: user_schemas.User = Depends(auth.get_current_admin_user)
 ):
     """Search users by national ID (partial match)."""
@@ -216,7 +216,7 @@ def search_users_by_name(
     name: str,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: user_schemas.User = Depends(auth.get_current_admin_user)
 ):
     """Search users by name or last name (partial match)."""
@@ -228,7 +228,7 @@ def search_users_by_phone_number(
     phone_number: str,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: user_schemas.User = Depends(auth.get_current_admin_user)
 ):
     """Search users by phone number (partial match)."""
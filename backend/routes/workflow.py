@@ -1,30 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
-from typing import List
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import List, Optional
 import crud.workflow as workflow_crud
+import crud.audit as audit_crud
 import schemas.workflow as workflow_schemas
 import schemas.user as user_schemas
 import auth
-from database import get_db
+from database import get_db, get_read_db
 from models.workflow import Workflow, WorkflowStep, WorkflowStepTemplate
-from models.user import User, RoleEnum
+from models.user import RoleEnum
+from responses import dumps, orm_response, to_jsonable
 
 router = APIRouter(
     prefix="/workflows",
     tags=["workflows"]
 )
 
-def check_admin_or_participant(workflow: Workflow, user: user_schemas.User):
-    if user.role == RoleEnum.admin:
+def check_admin_or_participant(db: Session, workflow_id: int, user: user_schemas.User):
+    if user.role in (RoleEnum.admin, RoleEnum.staff):
         return
-    step_responsible = any(user.id in [u.id for u in step.responsible_users] for step in workflow.steps)
-    workflow_responsible = user.id in [u.id for u in workflow.responsible_users]
-    if (user.role != RoleEnum.staff and 
-        user.id != workflow.creator_id and 
-        user.id != workflow.approver_id and 
-        user not in workflow.viewers and 
-        not step_responsible and 
-        not workflow_responsible):
+    if not workflow_crud.is_participant(db, workflow_id=workflow_id, user_id=user.id):
         raise HTTPException(status_code=403, detail="Not authorized for this workflow")
 
 @router.post("/", response_model=workflow_schemas.WorkflowInDB)
@@ -40,7 +37,9 @@ def create_workflow(
     existing_workflow = db.query(Workflow).filter(Workflow.title == workflow.title).first()
     if existing_workflow:
         raise HTTPException(status_code=400, detail="Workflow with this title already exists")
-    return workflow_crud.create_workflow(db=db, workflow=workflow, creator_id=current_user.id)
+    created_workflow = workflow_crud.create_workflow(db=db, workflow=workflow, creator_id=current_user.id)
+    workflow_crud.attach_files(db, [created_workflow])
+    return created_workflow
 
 @router.post("/from-template/", response_model=workflow_schemas.WorkflowInDB)
 def create_workflow_from_template(
@@ -53,39 +52,106 @@ def create_workflow_from_template(
     created_workflow = workflow_crud.create_workflow_from_template(db=db, workflow=workflow, creator_id=current_user.id)
     if not created_workflow:
         raise HTTPException(status_code=404, detail="Template workflow not found")
+    workflow_crud.attach_files(db, [created_workflow])
     return created_workflow
 
-@router.get("/", response_model=List[workflow_schemas.WorkflowInDB])
+@router.post("/from-template/bulk", response_model=workflow_schemas.WorkflowBulkCreateResult)
+def create_workflows_from_template(
+    bulk: workflow_schemas.WorkflowBulkCreateFromTemplate,
+    current_user: user_schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    if current_user.role != RoleEnum.admin:
+        raise HTTPException(status_code=403, detail="Only admin can create workflows from templates")
+    workflow_ids = workflow_crud.create_workflows_from_template(db=db, bulk=bulk, creator_id=current_user.id)
+    if workflow_ids is None:
+        raise HTTPException(status_code=404, detail="Template workflow not found")
+    return {"template_workflow_id": bulk.template_workflow_id, "created": len(workflow_ids), "workflow_ids": workflow_ids}
+
+@router.get("/", response_model=List[workflow_schemas.WorkflowListItem])
 def read_workflows(
     skip: int = 0,
     limit: int = 100,
     current_user: user_schemas.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    if current_user.role == RoleEnum.admin:
-        return workflow_crud.get_workflows(db, skip=skip, limit=limit)
-    workflows = (
-        db.query(Workflow)
-        .options(
-            joinedload(Workflow.creator),
-            joinedload(Workflow.approver),
-            joinedload(Workflow.viewers),
-            joinedload(Workflow.responsible_users),
-            joinedload(Workflow.steps).joinedload(WorkflowStep.responsible_users),
-            joinedload(Workflow.template_steps)
-        )
-        .filter(
-            (Workflow.viewers.any(User.id == current_user.id)) |
-            (Workflow.creator_id == current_user.id) |
-            (Workflow.approver_id == current_user.id) |
-            (Workflow.responsible_users.any(User.id == current_user.id)) |
-            (Workflow.steps.any(WorkflowStep.responsible_users.any(User.id == current_user.id)))
-        )
-        .offset(skip)
-        .limit(limit)
-        .all()
+    participant_id = None if current_user.role == RoleEnum.admin else current_user.id
+    workflows = workflow_crud.get_workflows(db, skip=skip, limit=limit, participant_id=participant_id)
+    return orm_response(workflows, List[workflow_schemas.WorkflowListItem])
+
+@router.get("/summary", response_model=workflow_schemas.WorkflowSummaryPage)
+def read_workflow_summaries(
+    after_id: Optional[int] = Query(None, description="Last id of the previous page"),
+    limit: int = Query(50, ge=1, le=500),
+    status: Optional[str] = None,
+    creator_id: Optional[int] = None,
+    approver_id: Optional[int] = None,
+    participant_id: Optional[int] = None,
+    is_template: bool = False,
+    current_user: user_schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Dashboard view: title, status, progress, overdue steps, next due step and assignees, without the
+    step rows. Pages are ordered by id; pass next_after_id as after_id for the next page. The full
+    workflow is fetched per workflow from GET /workflows/{id}. Non-admins only see workflows they
+    take part in.
+    """
+    summaries = workflow_crud.get_workflow_summaries(
+        db,
+        after_id=after_id,
+        limit=limit,
+        status=status,
+        creator_id=creator_id,
+        approver_id=approver_id,
+        participant_id=participant_id,
+        visible_to=None if current_user.role == RoleEnum.admin else current_user.id,
+        is_template=is_template,
     )
-    return workflows
+    return orm_response(summaries, workflow_schemas.WorkflowSummaryPage)
+
+@router.get("/overdue", response_model=List[workflow_schemas.OverdueStep])
+def read_overdue_steps(
+    limit: int = Query(100, ge=1, le=500),
+    escalation_contact_id: Optional[int] = None,
+    current_user: user_schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Open steps past their due date, most overdue first. Due dates and escalations are
+    maintained by the scheduler's step_deadlines job. Non-admins only see steps of workflows
+    they take part in.
+    """
+    visible_to = None if current_user.role == RoleEnum.admin else current_user.id
+    steps = workflow_crud.get_overdue_steps(db, limit=limit, escalation_contact_id=escalation_contact_id, visible_to=visible_to)
+    return orm_response(steps, List[workflow_schemas.OverdueStep])
+
+@router.get("/audit/export")
+def export_audit_log(
+    workflow_id: Optional[int] = None,
+    since: Optional[datetime] = Query(None, description="Entries created at or after"),
+    until: Optional[datetime] = Query(None, description="Entries created before"),
+    current_user: user_schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Stream the audit log as newline-delimited JSON, oldest first. Read in batches from the
+    audit table only, so exports of any size never touch the workflow tables.
+    """
+    if current_user.role != RoleEnum.admin:
+        raise HTTPException(status_code=403, detail="Only admin can export the audit log")
+
+    def lines():
+        chunk = []
+        for entry in audit_crud.iter_audit_log(db, workflow_id=workflow_id, since=since, until=until):
+            chunk.append(dumps(to_jsonable(entry, workflow_schemas.WorkflowAuditEntry)))
+            if len(chunk) == 500:
+                yield b"\n".join(chunk) + b"\n"
+                chunk = []
+        if chunk:
+            yield b"\n".join(chunk) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 @router.get("/{workflow_id}", response_model=workflow_schemas.WorkflowInDB)
 def read_workflow(
@@ -96,7 +162,8 @@ def read_workflow(
     workflow = workflow_crud.get_workflow(db, workflow_id=workflow_id)
     if workflow is None:
         raise HTTPException(status_code=404, detail="Workflow not found")
-    check_admin_or_participant(workflow, current_user)
+    check_admin_or_participant(db, workflow_id, current_user)
+    workflow_crud.attach_files(db, [workflow])
     return workflow
 
 @router.put("/{workflow_id}", response_model=workflow_schemas.WorkflowInDB)
@@ -121,9 +188,10 @@ def update_workflow(
         ).first()
         if existing_workflow:
             raise HTTPException(status_code=400, detail="Workflow with this title already exists")
-    updated_workflow = workflow_crud.update_workflow(db, workflow_id=workflow_id, workflow=workflow)
+    updated_workflow = workflow_crud.update_workflow(db, workflow_id=workflow_id, workflow=workflow, user_id=current_user.id)
     if not updated_workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
+    workflow_crud.attach_files(db, [updated_workflow])
     return updated_workflow
 
 @router.delete("/{workflow_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -143,9 +211,42 @@ def delete_workflow(
             status_code=400,
             detail="Cannot delete workflow with existing steps"
         )
-    workflow_crud.delete_workflow(db, workflow_id=workflow_id)
+    workflow_crud.delete_workflow(db, workflow_id=workflow_id, user_id=current_user.id)
     return None
 
+@router.get("/{workflow_id}/audit", response_model=List[workflow_schemas.WorkflowAuditEntry])
+def read_workflow_audit_log(
+    workflow_id: int,
+    after_id: Optional[int] = Query(None, description="Last id of the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: user_schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    """History of a workflow, its steps and step templates, oldest first."""
+    check_admin_or_participant(db, workflow_id, current_user)
+    entries = audit_crud.get_audit_log(db, workflow_id=workflow_id, after_id=after_id, limit=limit)
+    return orm_response(entries, List[workflow_schemas.WorkflowAuditEntry])
+
+@router.get("/{workflow_id}/subtree", response_model=workflow_schemas.WorkflowTreeNode)
+def read_workflow_subtree(
+    workflow_id: int,
+    max_depth: int = Query(5, ge=0, le=20, description="Levels of sub-workflows to include below the workflow"),
+    current_user: user_schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    The workflow with its sub-workflows nested under it (through parent_workflow_id), each with
+    its own step progress and the progress rolled up over the sub-workflows below it. Nodes at
+    max_depth with further sub-workflows are marked truncated; fetch their own subtree for more.
+    Users other than admin and staff only get the sub-workflows they take part in.
+    """
+    check_admin_or_participant(db, workflow_id, current_user)
+    visible_to = None if current_user.role in (RoleEnum.admin, RoleEnum.staff) else current_user.id
+    subtree = workflow_crud.get_workflow_subtree(db, root_id=workflow_id, max_depth=max_depth, visible_to=visible_to)
+    if subtree is None:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    return orm_response(subtree, workflow_schemas.WorkflowTreeNode)
+
 @router.post("/{workflow_id}/steps/", response_model=workflow_schemas.WorkflowStepInDB)
 def create_workflow_step(
     workflow_id: int,
@@ -174,9 +275,11 @@ def create_workflow_step(
     if current_user.role != RoleEnum.admin and step.responsible_user_ids:
         raise HTTPException(status_code=403, detail="Only admin can assign responsible users to steps")
     
-    return workflow_crud.create_workflow_step(db=db, workflow_id=workflow_id, step=step)
+    created_step = workflow_crud.create_workflow_step(db=db, workflow_id=workflow_id, step=step, user_id=current_user.id)
+    workflow_crud.attach_files(db, [created_step])
+    return created_step
 
-@router.get("/{workflow_id}/steps/", response_model=List[workflow_schemas.WorkflowStepInDB])
+@router.get("/{workflow_id}/steps/", response_model=List[workflow_schemas.WorkflowStepListItem])
 def read_workflow_steps(
     workflow_id: int,
     skip: int = 0,
@@ -187,7 +290,7 @@ def read_workflow_steps(
     workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
-    check_admin_or_participant(workflow, current_user)
+    check_admin_or_participant(db, workflow_id, current_user)
     return workflow_crud.get_workflow_steps(db, workflow_id=workflow_id, skip=skip, limit=limit)
 
 @router.get("/{workflow_id}/steps/{step_id}", response_model=workflow_schemas.WorkflowStepInDB)
@@ -200,7 +303,8 @@ def read_workflow_step(
     step = workflow_crud.get_workflow_step(db, step_id=step_id)
     if not step or step.workflow_id != workflow_id:
         raise HTTPException(status_code=404, detail="Step not found")
-    check_admin_or_participant(step.workflow, current_user)
+    check_admin_or_participant(db, workflow_id, current_user)
+    workflow_crud.attach_files(db, [step])
     return step
 
 @router.put("/{workflow_id}/steps/{step_id}", response_model=workflow_schemas.WorkflowStepInDB)
@@ -221,9 +325,10 @@ def update_workflow_step(
             raise HTTPException(status_code=403, detail="Not authorized to update step")
         if step.responsible_user_ids:
             raise HTTPException(status_code=403, detail="Only admin can assign responsible users")
-    updated_step = workflow_crud.update_workflow_step(db, step_id=step_id, step=step)
+    updated_step = workflow_crud.update_workflow_step(db, step_id=step_id, step=step, user_id=current_user.id)
     if not updated_step:
         raise HTTPException(status_code=404, detail="Step not found")
+    workflow_crud.attach_files(db, [updated_step])
     return updated_step
 
 @router.delete("/{workflow_id}/steps/{step_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -238,7 +343,7 @@ def delete_workflow_step(
         raise HTTPException(status_code=404, detail="Step not found")
     if current_user.role != RoleEnum.admin:
         raise HTTPException(status_code=403, detail="Only admin can delete steps")
-    workflow_crud.delete_workflow_step(db, step_id=step_id)
+    workflow_crud.delete_workflow_step(db, step_id=step_id, user_id=current_user.id)
     return None
 
 @router.post("/{workflow_id}/template-steps/", response_model=workflow_schemas.WorkflowStepTemplateInDB)
@@ -255,7 +360,9 @@ def create_workflow_step_template(
         raise HTTPException(status_code=400, detail="Workflow is not a template")
     if current_user.role != RoleEnum.admin:
         raise HTTPException(status_code=403, detail="Only admin can create template steps")
-    return workflow_crud.create_workflow_step_template(db=db, workflow_id=workflow_id, step_template=step_template)
+    return workflow_crud.create_workflow_step_template(
+        db=db, workflow_id=workflow_id, step_template=step_template, user_id=current_user.id
+    )
 
 @router.get("/{workflow_id}/template-steps/", response_model=List[workflow_schemas.WorkflowStepTemplateInDB])
 def read_workflow_step_templates(
@@ -268,9 +375,24 @@ def read_workflow_step_templates(
     workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
-    check_admin_or_participant(workflow, current_user)
+    check_admin_or_participant(db, workflow_id, current_user)
     return workflow_crud.get_workflow_step_templates(db, workflow_id=workflow_id, skip=skip, limit=limit)
 
+@router.get("/{workflow_id}/template-steps/validation", response_model=workflow_schemas.TemplateValidation)
+def validate_workflow_step_templates(
+    workflow_id: int,
+    current_user: user_schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Check the template's step links: dangling links, success cycles and unreachable steps."""
+    workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    if not workflow.is_template:
+        raise HTTPException(status_code=400, detail="Workflow is not a template")
+    check_admin_or_participant(db, workflow_id, current_user)
+    return workflow_crud.get_template_validation(db, template_id=workflow_id)
+
 @router.get("/{workflow_id}/template-steps/{step_template_id}", response_model=workflow_schemas.WorkflowStepTemplateInDB)
 def read_workflow_step_template(
     workflow_id: int,
@@ -281,7 +403,7 @@ def read_workflow_step_template(
     step_template = workflow_crud.get_workflow_step_template(db, step_template_id=step_template_id)
     if not step_template or step_template.workflow_id != workflow_id:
         raise HTTPException(status_code=404, detail="Step template not found")
-    check_admin_or_participant(step_template.workflow, current_user)
+    check_admin_or_participant(db, workflow_id, current_user)
     return step_template
 
 @router.put("/{workflow_id}/template-steps/{step_template_id}", response_model=workflow_schemas.WorkflowStepTemplateInDB)
@@ -301,7 +423,7 @@ def update_workflow_step_template(
     if current_user.role != RoleEnum.admin:
         raise HTTPException(status_code=403, detail="Only admin can update template steps")
     updated_step_template = workflow_crud.update_workflow_step_template(
-        db, step_template_id=step_template_id, step_template=step_template
+        db, step_template_id=step_template_id, step_template=step_template, user_id=current_user.id
     )
     if not updated_step_template:
         raise HTTPException(status_code=404, detail="Step template not found")
@@ -322,5 +444,5 @@ def delete_workflow_step_template(
         raise HTTPException(status_code=404, detail="Step template not found")
     if current_user.role != RoleEnum.admin:
         raise HTTPException(status_code=403, detail="Only admin can delete template steps")
-    workflow_crud.delete_workflow_step_template(db, step_template_id=step_template_id)
+    workflow_crud.delete_workflow_step_template(db, step_template_id=step_template_id, user_id=current_user.id)
     return None
\ No newline at end of file
@@ -0,0 +1,87 @@
+import logging
+import os
+import time
+from database import SessionLocal, REPLICA_DATABASE_URLS, engine
+import crud.pricing as pricing_crud
+import crud.heartbeat as heartbeat_crud
+import crud.workflow as workflow_crud
+import crud.audit as audit_crud
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds between two scheduler ticks
+TICK_SECONDS = float(os.getenv("SCHEDULER_TICK_SECONDS", "1"))
+
+# Registered periodic jobs: name -> (interval in seconds, function taking a db session)
+JOBS = {}
+
+def register_job(name: str, interval: float, func):
+    """Register a periodic job. The function receives a fresh database session."""
+    JOBS[name] = (interval, func)
+
+register_job(
+    "discount_schedule",
+    float(os.getenv("DISCOUNT_SCHEDULE_INTERVAL", "60")),
+    pricing_crud.apply_discount_schedule
+)
+register_job(
+    "price_timeline",
+    float(os.getenv("PRICE_TIMELINE_INTERVAL", "3600")),
+    pricing_crud.rebuild_price_timeline
+)
+# Discount changes only flag the timeline (see crud.pricing.mark_price_timeline_dirty); until this
+# job picks them up, anonymous product listings show the previous prices
+register_job(
+    "price_timeline_dirty",
+    float(os.getenv("PRICE_TIMELINE_DIRTY_INTERVAL", "15")),
+    pricing_crud.rebuild_dirty_price_timeline
+)
+register_job(
+    "step_deadlines",
+    float(os.getenv("STEP_DEADLINE_INTERVAL", "60")),
+    workflow_crud.refresh_step_deadlines
+)
+if engine.dialect.name == "mysql":
+    # The audit log is partitioned by month on MySQL (migration 0008)
+    register_job(
+        "audit_partitions",
+        float(os.getenv("AUDIT_PARTITION_INTERVAL", "86400")),
+        audit_crud.ensure_audit_partitions
+    )
+if REPLICA_DATABASE_URLS:
+    # Replicas older than REPLICA_MAX_LAG_SECONDS are skipped, so beat well within it
+    register_job(
+        "replication_heartbeat",
+        float(os.getenv("REPLICATION_HEARTBEAT_INTERVAL", "1")),
+        heartbeat_crud.write_heartbeat
+    )
+
+def run_job(name: str, func):
+    db = SessionLocal()
+    try:
+        func(db)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Scheduler job {name} failed: {e}")
+    finally:
+        db.close()
+
+def run_forever():
+    """
+    Run the registered jobs at their intervals.
+    Started once per deployment next to the API workers (see Dockerfile), so jobs never run
+    once per worker.
+    """
+    logger.info(f"Scheduler started with jobs: {', '.join(JOBS)}")
+    last_run = {}
+    while True:
+        now = time.monotonic()
+        for name, (interval, func) in JOBS.items():
+            if now - last_run.get(name, float("-inf")) >= interval:
+                last_run[name] = now
+                run_job(name, func)
+        time.sleep(TICK_SECONDS)
+
+if __name__ == "__main__":
+    run_forever()
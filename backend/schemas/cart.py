@@ -1,4 +1,6 @@
 from pydantic import BaseModel
+from typing import Optional, List
+from schemas.product import Product
 
 class CartBase(BaseModel):
     product_id: int
@@ -12,4 +14,23 @@ class Cart(CartBase):
     user_id: int
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class CartLine(Cart):
+    product: Product
+    unit_price: float
+    line_total: float
+    discounted_line_total: float
+
+class CartView(BaseModel):
+    items: List[CartLine] = []
+    subtotal: float = 0.0
+    total: float = 0.0
+
+class CartCheckout(BaseModel):
+    """Shipping details for checkout; missing fields fall back to the user's profile."""
+    state: Optional[str] = None
+    city: Optional[str] = None
+    address: Optional[str] = None
+    phone_number: Optional[str] = None
+    discount_code: Optional[str] = None
@@ -8,15 +8,20 @@ class DiscountStatus(str, Enum):
     EXPIRED = "expired"
     USED = "used"
     DISABLED = "disabled"
+    SCHEDULED = "scheduled"
 
 class DiscountBase(BaseModel):
-    code: Optional[str] = None
+    code: Optional[str] = None  # Set: applies only when redeemed with the code; None: applies automatically
     percent: float
     max_discount: Optional[float] = None
     product_id: Optional[int] = None
     customer_id: Optional[int] = None
     submitted_by_user_id: int  # Added (required on creation)
     status: Optional[DiscountStatus] = DiscountStatus.ACTIVE  # Optional with default
+    usage_limit: Optional[int] = None  # Total redemptions allowed, None = unlimited
+    per_customer_limit: Optional[int] = None  # Redemptions allowed per customer, None = unlimited
+    starts_at: Optional[datetime] = None  # Scheduled window start (UTC)
+    ends_at: Optional[datetime] = None  # Scheduled window end (UTC)
 
 class DiscountCreate(DiscountBase):
     pass
@@ -28,10 +33,15 @@ class DiscountUpdate(BaseModel):
     product_id: Optional[int] = None
     customer_id: Optional[int] = None
     status: Optional[DiscountStatus] = None  # Allow status updates
+    usage_limit: Optional[int] = None
+    per_customer_limit: Optional[int] = None
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
 
 class Discount(DiscountBase):
     id: int
     submission_date: datetime  # Added
+    usage_count: int = 0
 
     class Config:
         from_attributes = True
\ No newline at end of file
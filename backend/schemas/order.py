@@ -34,6 +34,7 @@ class OrderBase(BaseModel):
 class OrderCreate(OrderBase):
     user_id: int
     items: List[OrderItemCreate]
+    discount_code: Optional[str] = None
 
 class OrderUpdate(OrderBase):
     status: Optional[str] = None
@@ -36,6 +36,7 @@ class Product(ProductBase):
     owner_id: int
     category: Category
     discount: Optional[DiscountInfo] = None  # Already optional
+    effective_price: Optional[float] = None  # Price after the applicable discount
 
     class Config:
         from_attributes = True
\ No newline at end of file
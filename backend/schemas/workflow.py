@@ -1,17 +1,18 @@
 # schemas/workflow.py
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
+from schemas.file import FileResponse
 
 class WorkflowBase(BaseModel):
     title: str
     status: Optional[str] = "Draft"
     approver_id: Optional[int]
     is_template: Optional[bool] = False
-    uploaded_files: Optional[List[str]] = []
     parent_workflow_id: Optional[int]
 
 class WorkflowCreate(WorkflowBase):
+    uploaded_files: Optional[List[str]] = []
     viewer_ids: Optional[List[int]] = []
     responsible_user_ids: Optional[List[int]] = []
 
@@ -26,19 +27,46 @@ class WorkflowCreateFromTemplate(BaseModel):
     responsible_user_ids: Optional[List[int]] = []
     step_overrides: Optional[List[dict]] = []  # Overrides for expected_duration, etc.
 
+class WorkflowInstance(BaseModel):
+    title: str
+    status: Optional[str] = "Draft"
+    approver_id: Optional[int]
+    uploaded_files: Optional[List[str]] = []
+    parent_workflow_id: Optional[int]
+    viewer_ids: Optional[List[int]] = []
+    responsible_user_ids: Optional[List[int]] = []
+    step_overrides: Optional[List[dict]] = []
+
+class WorkflowBulkCreateFromTemplate(BaseModel):
+    template_workflow_id: int
+    workflows: List[WorkflowInstance] = Field(..., min_length=1, max_length=5000)
+    batch_size: int = Field(200, ge=1, le=1000, description="Workflows created per transaction")
+
+class WorkflowBulkCreateResult(BaseModel):
+    template_workflow_id: int
+    created: int
+    workflow_ids: List[int]
+
 class WorkflowUpdate(WorkflowBase):
+    uploaded_files: Optional[List[str]] = []
     viewer_ids: Optional[List[int]]
     responsible_user_ids: Optional[List[int]]
 
-class WorkflowInDB(WorkflowBase):
+class WorkflowListItem(WorkflowBase):
+    """Workflow as listed; uploaded files are only returned by GET /workflows/{id}."""
     id: int
     creator_id: int
     created_at: datetime
     updated_at: datetime
+    uploaded_files_count: int = 0
 
     class Config:
         from_attributes = True
 
+class WorkflowInDB(WorkflowListItem):
+    uploaded_files: Optional[List[str]] = []
+    files: List[FileResponse] = []  # The uploaded_files entries that resolve to an uploaded file
+
 class WorkflowStepBase(BaseModel):
     step_number: int
     description: str
@@ -50,25 +78,43 @@ class WorkflowStepBase(BaseModel):
     required_documents: Optional[str]
     output: Optional[str]
     escalation_contact_id: Optional[int]
-    uploaded_files: Optional[List[str]] = []
     completed_at: Optional[datetime]
     completed_by: Optional[str]
 
 class WorkflowStepCreate(WorkflowStepBase):
+    uploaded_files: Optional[List[str]] = []
     responsible_user_ids: Optional[List[int]] = []
 
 class WorkflowStepUpdate(WorkflowStepBase):
+    uploaded_files: Optional[List[str]] = []
     responsible_user_ids: Optional[List[int]]
 
-class WorkflowStepInDB(WorkflowStepBase):
+class WorkflowStepListItem(WorkflowStepBase):
+    """Step as listed; uploaded files are only returned by GET /workflows/{id}/steps/{step_id}."""
     id: int
     workflow_id: int
     created_at: datetime
     updated_at: datetime
+    uploaded_files_count: int = 0
 
     class Config:
         from_attributes = True
 
+class WorkflowStepInDB(WorkflowStepListItem):
+    uploaded_files: Optional[List[str]] = []
+    files: List[FileResponse] = []  # The uploaded_files entries that resolve to an uploaded file
+
+class OverdueStep(BaseModel):
+    id: int
+    workflow_id: int
+    workflow_title: str
+    step_number: int
+    description: str
+    status: Optional[str]
+    escalation_contact_id: Optional[int]
+    due_at: datetime
+    escalated_at: Optional[datetime]
+
 class WorkflowStepTemplateBase(BaseModel):
     step_number: int
     description: str
@@ -78,6 +124,8 @@ class WorkflowStepTemplateBase(BaseModel):
     default_output: Optional[str]
     next_step_on_success: Optional[int]
     next_step_on_failure: Optional[int]
+    parallel_next_steps: Optional[List[int]] = []
+    is_join: Optional[bool] = False
 
 class WorkflowStepTemplateCreate(WorkflowStepTemplateBase):
     pass
@@ -89,4 +137,72 @@ class WorkflowStepTemplateInDB(WorkflowStepTemplateBase):
     updated_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class TemplateValidation(BaseModel):
+    template_workflow_id: int
+    valid: bool
+    errors: List[str]
+    unreachable_step_ids: List[int]  # Not reached by any link from the first step
+
+class WorkflowAuditEntry(BaseModel):
+    id: int
+    created_at: datetime
+    workflow_id: int
+    entity: str
+    entity_id: int
+    action: str
+    user_id: Optional[int]
+    changes: dict
+
+    class Config:
+        from_attributes = True
+
+class WorkflowAssignee(BaseModel):
+    id: int
+    username: str
+
+class WorkflowNextStep(BaseModel):
+    id: int
+    step_number: int
+    description: str
+    status: Optional[str]
+    due_at: Optional[datetime]
+
+class WorkflowSummary(BaseModel):
+    """Dashboard projection of a workflow; the full workflow is at GET /workflows/{id}."""
+    id: int
+    title: str
+    status: Optional[str]
+    creator_id: int
+    approver_id: Optional[int]
+    updated_at: datetime
+    steps_total: int
+    steps_completed: int
+    steps_overdue: int
+    progress: float  # Completed steps in percent
+    next_step: Optional[WorkflowNextStep] = None
+    assignees: List[WorkflowAssignee] = []
+
+class WorkflowTreeNode(BaseModel):
+    """A workflow with its sub-workflows (through parent_workflow_id) nested in children."""
+    id: int
+    title: str
+    status: Optional[str]
+    is_template: Optional[bool]
+    parent_workflow_id: Optional[int]
+    depth: int  # Levels below the requested root
+    steps_total: int
+    steps_completed: int
+    progress: float  # Completed steps of this workflow in percent
+    subtree_steps_total: int
+    subtree_steps_completed: int
+    subtree_progress: float  # Completed steps of this workflow and the sub-workflows below it in percent
+    truncated: bool = False  # Has sub-workflows below the depth limit, left out
+    children: List["WorkflowTreeNode"] = []
+
+WorkflowTreeNode.model_rebuild()
+
+class WorkflowSummaryPage(BaseModel):
+    items: List[WorkflowSummary]
+    next_after_id: Optional[int] = None  # Pass as after_id to get the next page; None on the last page
\ No newline at end of file
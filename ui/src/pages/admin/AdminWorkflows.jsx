@@ -6,6 +6,7 @@ import { Tree, TreeNode } from 'react-organizational-chart';
 import Navbar from '../../components/Navbar';
 import {
   getWorkflows,
+  getWorkflow,
   createWorkflow,
   updateWorkflow,
   deleteWorkflow,
@@ -13,6 +14,7 @@ import {
   searchUsersByName,
   createWorkflowStep,
   getWorkflowSteps,
+  getWorkflowStep,
   uploadFile,
 } from '../../api/api';
 import { isAuthenticated } from '../../api/auth';
@@ -230,13 +232,21 @@ const AdminWorkflows = () => {
     }
   };
 
-  const handleEditWorkflow = (workflow) => {
+  const handleEditWorkflow = async (workflow) => {
+    // The list does not include uploaded files; load them from the workflow itself
+    let uploadedFiles;
+    try {
+      uploadedFiles = (await getWorkflow(workflow.id)).uploaded_files || [];
+    } catch (err) {
+      handleError(err);
+      return;
+    }
     setFormData({
       title: workflow.title,
       status: workflow.status,
       approver_id: workflow.approver_id?.toString() || '',
       is_template: false,
-      uploaded_files: workflow.uploaded_files || [],
+      uploaded_files: uploadedFiles,
       parent_workflow_id: workflow.parent_workflow_id?.toString() || '',
       viewer_ids: workflow.viewers ? workflow.viewers.map((v) => v.id) : [],
       responsible_user_ids: workflow.responsible_users ? workflow.responsible_users.map((r) => r.id) : [],
@@ -312,9 +322,13 @@ const AdminWorkflows = () => {
     }
   };
 
-  const handleViewStep = (step) => {
-    setSelectedStep(step);
-    setShowStepDetails(true);
+  const handleViewStep = async (step) => {
+    try {
+      setSelectedStep(await getWorkflowStep(step.workflow_id, step.id));
+      setShowStepDetails(true);
+    } catch (err) {
+      handleError(err);
+    }
   };
 
   const handleError = (err) => {
@@ -149,13 +149,15 @@ const WorkflowTemplates = () => {
     try {
       const template = templates.find((t) => t.id === templateId);
       if (!template) throw new Error('الگو یافت نشد');
+      // The list does not include uploaded files; load them from the template itself
+      const { uploaded_files: uploadedFiles } = await getWorkflow(templateId);
 
       const workflowData = {
         title: `گردش کار: ${template.title}`,
         status: 'Draft',
         approver_id: template.approver_id ? parseInt(template.approver_id) : null,
         is_template: false,
-        uploaded_files: template.uploaded_files || [],
+        uploaded_files: uploadedFiles || [],
         parent_workflow_id: template.id,
         viewer_ids: template.viewers ? template.viewers.map((v) => v.id) : [],
         responsible_user_ids: template.responsible_users ? template.responsible_users.map((r) => r.id) : [],
@@ -168,13 +170,20 @@ const WorkflowTemplates = () => {
     }
   };
 
-  const handleEditTemplate = (template, addSteps = false) => {
+  const handleEditTemplate = async (template, addSteps = false) => {
+    let uploadedFiles;
+    try {
+      uploadedFiles = (await getWorkflow(template.id)).uploaded_files || [];
+    } catch (err) {
+      handleError(err);
+      return;
+    }
     setFormData({
       title: template.title,
       status: template.status,
       approver_id: template.approver_id || '',
       is_template: true,
-      uploaded_files: template.uploaded_files || [],
+      uploaded_files: uploadedFiles,
       parent_workflow_id: template.parent_workflow_id || '',
       viewer_ids: template.viewers ? template.viewers.map((v) => v.id) : [],
       responsible_user_ids: template.responsible_users ? template.responsible_users.map((r) => r.id) : [],